@@ -0,0 +1,79 @@
+"""
+pytest-benchmark suite for project generation.
+
+Generates 1, 100 and 1000 projects per round with Project.run into a tmpfs
+(/dev/shm where available), so disk speed does not hide changes to the
+generator, and renders the same projects into a MemorySink to separate
+rendering from file I/O.
+
+Usage: python -m pytest benchmarks/bench_generate.py [--benchmark-autosave]
+       python -m pytest benchmarks/bench_generate.py --benchmark-compare --benchmark-compare-fail=mean:5%
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+import pytest
+from pycorn_maker.project import Project
+from pycorn_maker.sinks import MemorySink
+
+
+pytest.importorskip('pytest_benchmark')
+
+TMPFS = Path('/dev/shm')
+COUNTS = (1, 100, 1000)
+# Fewer rounds for the big batches keep the suite under a minute
+ROUNDS = {1: 50, 100: 5, 1000: 3}
+
+
+@pytest.fixture
+def output_root():
+	"""A scratch directory on tmpfs, removed after the benchmark."""
+	base = TMPFS if TMPFS.is_dir() and os.access(TMPFS, os.W_OK) else None
+	root = Path(tempfile.mkdtemp(prefix='corn-bench-', dir=base))
+	yield root
+	shutil.rmtree(root, ignore_errors=True)
+
+
+def run_projects(output_dir: Path, count: int):
+	"""Generates count projects into output_dir."""
+	for index in range(count):
+		Project(f'project_{index}', '17', '3.14', [], output_dir).run()
+
+
+def render_projects(count: int) -> int:
+	"""Renders count projects in memory and returns the bytes rendered."""
+	rendered = 0
+
+	for index in range(count):
+		sink = MemorySink()
+		Project(f'project_{index}', '17', '3.14', [], Path('.')).write(sink)
+		rendered += sum(len(data) for data in sink.files.values())
+
+	return rendered
+
+
+@pytest.mark.parametrize('count', COUNTS)
+def test_run(benchmark, output_root, count):
+	"""Project.run: render and write to tmpfs."""
+	output_dir = output_root / 'run'
+
+	def setup():
+		# Every round creates the projects instead of overwriting them
+		shutil.rmtree(output_dir, ignore_errors=True)
+		return (output_dir, count), {}
+
+	benchmark.pedantic(run_projects, setup=setup, rounds=ROUNDS[count])
+
+	files = sum(1 for _, _, names in os.walk(output_dir) for _ in names)
+	benchmark.extra_info['files'] = files
+	assert files >= count
+
+
+@pytest.mark.parametrize('count', COUNTS)
+def test_render(benchmark, count):
+	"""Project.write into a MemorySink: rendering without file I/O."""
+	rendered = benchmark.pedantic(render_projects, args=(count,), rounds=ROUNDS[count])
+
+	benchmark.extra_info['bytes'] = rendered
+	assert rendered > 0
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the corn CLI.
+
+Runs `python -m pycorn_maker <args>` several times and reports the best wall
+time next to a bare interpreter start. One extra `-X importtime` run lists
+the slowest imports (cumulative) and whether any of the modules that must
+stay lazy were loaded.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--budget-ms MS] [-- ARGS...]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+LAZY_MODULES = (
+	'rich',
+	'pycorn_maker.templates',
+	'pycorn_maker.cmake_modules',
+	'pycorn_maker.project',
+	'concurrent.futures',
+	'tarfile',
+	'zipfile',
+	'shutil',
+)
+DEFAULT_BUDGET_MS = 50.0
+
+
+def parse_importtime(stderr: str):
+	"""Parses `-X importtime` output into (module, self_us, cumulative_us) rows."""
+	rows = []
+
+	for line in stderr.splitlines():
+		if not line.startswith('import time:') or 'self [us]' in line:
+			continue
+
+		self_us, cumulative_us, module = line[len('import time:'):].split('|')
+		rows.append((module.strip(), int(self_us), int(cumulative_us)))
+
+	return rows
+
+
+def best_wall_time(command, runs):
+	"""Runs a command several times and returns the best wall time in seconds."""
+	timings = []
+
+	for _ in range(runs):
+		start = time.perf_counter()
+		subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+		timings.append(time.perf_counter() - start)
+
+	return min(timings)
+
+
+def import_profile(cli_args):
+	"""Runs the CLI once under `-X importtime` and returns the parsed rows."""
+	command = [sys.executable, '-X', 'importtime', '-m', 'pycorn_maker'] + cli_args
+	result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, env=os.environ.copy())
+
+	return parse_importtime(result.stderr)
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument('--runs', type=int, default=10, help='number of runs, the best one is reported')
+	parser.add_argument('--top', type=int, default=10, help='number of slowest imports to show')
+	parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS, help='fail when the best wall time exceeds this')
+	parser.add_argument('cli_args', nargs='*', default=['--help'], help='arguments passed to corn (default: --help)')
+	args = parser.parse_args()
+
+	interpreter_time = best_wall_time([sys.executable, '-c', 'pass'], args.runs)
+	best_time = best_wall_time([sys.executable, '-m', 'pycorn_maker'] + args.cli_args, args.runs)
+	rows = import_profile(args.cli_args)
+	modules = {module for module, _, _ in rows}
+
+	print(f"corn {' '.join(args.cli_args)}: best {best_time * 1000:.1f} ms of {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+	print(f'bare interpreter: {interpreter_time * 1000:.1f} ms, {len(rows)} modules imported\n')
+	print(f"{'cumulative [ms]':>16} {'self [ms]':>10}  module")
+
+	for module, self_us, cumulative_us in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+		print(f'{cumulative_us / 1000:16.2f} {self_us / 1000:10.2f}  {module}')
+
+	leaked = [module for module in LAZY_MODULES if module in modules]
+	if leaked:
+		print(f"\nEagerly imported (should be lazy): {', '.join(leaked)}")
+
+	if best_time * 1000 > args.budget_ms:
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
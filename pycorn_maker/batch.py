@@ -0,0 +1,117 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+from pycorn_maker.manifest import ManifestEntry
+from pycorn_maker.project import Project
+
+
+EXECUTORS = {
+	'process': ProcessPoolExecutor,
+	'thread': ThreadPoolExecutor,
+}
+
+
+class BatchResult(NamedTuple):
+	"""
+	The outcome of generating one project of a batch.
+	"""
+
+	name: str
+	files: int
+	error: Optional[str]
+
+
+class BatchSummary(NamedTuple):
+	"""
+	The outcome of a whole batch.
+	"""
+
+	results: List[BatchResult]
+	elapsed: float
+
+	@property
+	def succeeded(self) -> List[BatchResult]:
+		return [result for result in self.results if result.error is None]
+
+	@property
+	def failed(self) -> List[BatchResult]:
+		return [result for result in self.results if result.error is not None]
+
+	@property
+	def files(self) -> int:
+		return sum(result.files for result in self.succeeded)
+
+	@property
+	def projects_per_second(self) -> float:
+		return len(self.succeeded) / self.elapsed if self.elapsed else 0.0
+
+	@property
+	def files_per_second(self) -> float:
+		return self.files / self.elapsed if self.elapsed else 0.0
+
+
+def generate_project(entry: ManifestEntry, output_dir: Path, store: Optional[Path] = None,
+					link_mode: str = 'auto') -> BatchResult:
+	"""
+	Generates one project. Runs inside a pool worker, so it never raises.
+
+	:param      entry:       The manifest entry
+	:type       entry:       ManifestEntry
+	:param      output_dir:  The output directory
+	:type       output_dir:  Path
+	:param      store:       The store of invariant files, see StoreSink
+	:type       store:       Path
+	:param      link_mode:   How to link from the store, see LINK_MODES
+	:type       link_mode:   str
+
+	:returns:   The result
+	:rtype:     BatchResult
+	"""
+	try:
+		project = Project(entry.name, entry.cpp_standard, entry.cmake_version, entry.tools, output_dir, **entry.options)
+		project.run(store, link_mode)
+	except Exception as error:
+		return BatchResult(entry.name, 0, f'{type(error).__name__}: {error}')
+
+	return BatchResult(entry.name, len(project.files_created), None)
+
+
+def generate_many(entries: List[ManifestEntry], output_dir: Path = Path('.'), jobs: Optional[int] = None,
+				executor: str = 'process', store: Optional[Path] = None, link_mode: str = 'auto') -> BatchSummary:
+	"""
+	Generates all projects on a process or thread pool.
+
+	With a store, files that are the same in every project (build scripts,
+	CMake modules, presets) are written to it once and reflinked or
+	hardlinked into each project instead of being written again.
+
+	:param      entries:     The validated manifest entries
+	:type       entries:     list
+	:param      output_dir:  The output directory
+	:type       output_dir:  Path
+	:param      jobs:        The number of workers (default: CPU count)
+	:type       jobs:        int
+	:param      executor:    The pool kind: process or thread
+	:type       executor:    str
+	:param      store:       The store of invariant files, see StoreSink
+	:type       store:       Path
+	:param      link_mode:   How to link from the store, see LINK_MODES
+	:type       link_mode:   str
+
+	:returns:   The batch summary
+	:rtype:     BatchSummary
+	"""
+	jobs = jobs or os.cpu_count() or 1
+	jobs = max(1, min(jobs, len(entries)))
+	results = []
+	start = time.perf_counter()
+
+	with EXECUTORS[executor](max_workers=jobs) as pool:
+		futures = [pool.submit(generate_project, entry, output_dir, store, link_mode) for entry in entries]
+
+		for future in as_completed(futures):
+			results.append(future.result())
+
+	return BatchSummary(results, time.perf_counter() - start)
@@ -0,0 +1,317 @@
+import json
+import os
+import re
+from collections import defaultdict
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+
+NINJA_LOG_NAME = '.ninja_log'
+NINJA_FILE_NAME = 'build.ninja'
+OBJECT_SUFFIXES = ('.o', '.obj')
+PCH_SUFFIXES = ('.pch', '.gch')
+# CMake's link rules, e.g. CXX_EXECUTABLE_LINKER__app_Debug
+LINK_RULE_PATTERN = re.compile(r'_(?:EXECUTABLE|STATIC_LIBRARY|SHARED_LIBRARY|MODULE_LIBRARY)_LINKER__')
+# `build <outputs>: <rule> ...`, where $ escapes spaces, colons and itself
+BUILD_EDGE_PATTERN = re.compile(r'build ((?:[^:$]|\$.)*):\s*(\S+)')
+NINJA_PATH_PATTERN = re.compile(r'(?:[^ $]|\$.)+')
+# Without build.ninja links are guessed by suffix, which only catches
+# libraries; versioned shared libraries end in e.g. .so.1
+LINK_SUFFIXES = ('.a', '.so', '.dylib', '.dll', '.exe', '.lib')
+# Clang trace files start with this key, so other JSON files in the build
+# dir are skipped without being parsed
+TIME_TRACE_PREFIX = b'{"traceEvents":'
+TEMPLATE_EVENTS = ('InstantiateClass', 'InstantiateFunction')
+
+
+class BuildStep(NamedTuple):
+	"""
+	One ranked entry of a build report: a build output, a header or a
+	template, with its total time and how often it occurred.
+	"""
+
+	name: str
+	seconds: float
+	count: int
+
+
+class BuildReport(NamedTuple):
+	"""
+	Where the time of a build went.
+	"""
+
+	translation_units: List[BuildStep]
+	links: List[BuildStep]
+	headers: List[BuildStep]
+	templates: List[BuildStep]
+	traces: int
+
+	def as_dict(self) -> dict:
+		"""
+		Converts the report to plain data for JSON output.
+
+		:returns:   The report
+		:rtype:     dict
+		"""
+		return {
+			'traces': self.traces,
+			**{
+				section: [step._asdict() for step in getattr(self, section)]
+				for section in ('translation_units', 'links', 'headers', 'templates')
+			},
+		}
+
+
+def parse_ninja_log(path: Path) -> Dict[str, float]:
+	"""
+	Reads the duration of every build step from a `.ninja_log`.
+
+	Ninja appends to the log on every build, so a later entry for an output
+	replaces an earlier one.
+
+	:param      path:  The log path
+	:type       path:  Path
+
+	:returns:   The build outputs and their durations in seconds
+	:rtype:     dict
+
+	:raises     ValueError:  If the file is not a ninja log
+	"""
+	steps = {}
+
+	with open(path, 'r', encoding='utf-8') as log_file:
+		header = log_file.readline()
+
+		if not header.startswith('# ninja log v'):
+			raise ValueError(f"'{path}' is not a ninja log.")
+
+		for line in log_file:
+			fields = line.rstrip('\n').split('\t')
+
+			if len(fields) < 4:
+				continue
+
+			start_ms, end_ms, _, output = fields[:4]
+			steps[output] = (int(end_ms) - int(start_ms)) / 1000
+
+	return steps
+
+
+def _ninja_unescape(path: str) -> str:
+	"""
+	Removes the $ escapes of a path in a ninja file.
+
+	:param      path:  The escaped path
+	:type       path:  str
+
+	:returns:   The path
+	:rtype:     str
+	"""
+	return re.sub(r'\$(.)', r'\1', path)
+
+
+def parse_link_outputs(path: Path) -> Set[str]:
+	"""
+	Finds the outputs of the link edges in a `build.ninja` and the files it
+	includes, e.g. the per-configuration files of Ninja Multi-Config.
+
+	:param      path:  The build.ninja path
+	:type       path:  Path
+
+	:returns:   The outputs, relative to the build directory
+	:rtype:     set
+	"""
+	outputs = set()
+	pending = [path]
+
+	while pending:
+		with open(pending.pop(), 'r', encoding='utf-8') as ninja_file:
+			# A $ at the end of a line continues it on the next one
+			text = ninja_file.read().replace('$\n', '')
+
+		for line in text.splitlines():
+			if line.startswith(('include ', 'subninja ')):
+				# Included paths are relative to the build directory, like outputs
+				pending.append(path.parent / _ninja_unescape(line.split(None, 1)[1].strip()))
+				continue
+
+			match = BUILD_EDGE_PATTERN.match(line)
+
+			if match and LINK_RULE_PATTERN.search(match.group(2)):
+				outputs.update(_ninja_unescape(output) for output in NINJA_PATH_PATTERN.findall(match.group(1)) if output != '|')
+
+	return outputs
+
+
+def is_link_output(output: str, link_outputs: Optional[Set[str]]) -> bool:
+	"""
+	Checks whether a ninja log output was written by a link step.
+
+	:param      output:        The output, relative to the build directory
+	:type       output:        str
+	:param      link_outputs:  The link outputs from build.ninja, None without it
+	:type       link_outputs:  set
+
+	:returns:   True for executables and libraries
+	:rtype:     bool
+	"""
+	# Custom targets such as format-check write CMakeFiles/<target>
+	if 'CMakeFiles' in PurePosixPath(output).parts:
+		return False
+
+	if link_outputs is not None:
+		return output in link_outputs
+
+	return Path(output).suffix in LINK_SUFFIXES or '.so.' in Path(output).name
+
+
+def find_time_traces(build_dir: Path) -> Iterator[Path]:
+	"""
+	Finds the Clang `-ftime-trace` files in a build directory.
+
+	:param      build_dir:  The build directory
+	:type       build_dir:  Path
+
+	:returns:   The trace paths
+	:rtype:     iterator
+	"""
+	for root, _, names in os.walk(build_dir):
+		for name in names:
+			if not name.endswith('.json') or name == 'compile_commands.json':
+				continue
+
+			path = Path(root) / name
+
+			with open(path, 'rb') as trace_file:
+				if trace_file.read(len(TIME_TRACE_PREFIX)) == TIME_TRACE_PREFIX:
+					yield path
+
+
+def parse_time_trace(path: Path) -> Tuple[float, Dict[str, float], Dict[str, Tuple[float, int]]]:
+	"""
+	Reads one Clang time trace.
+
+	Header times are inclusive: a header's time contains the headers it
+	includes, the way the trace records them.
+
+	:param      path:  The trace path
+	:type       path:  Path
+
+	:returns:   The compile time in seconds, the time per header and the
+	            time and count per template
+	:rtype:     tuple
+	"""
+	with open(path, 'r', encoding='utf-8') as trace_file:
+		events = json.load(trace_file).get('traceEvents', [])
+
+	total = 0.0
+	headers = defaultdict(float)
+	templates = defaultdict(lambda: [0.0, 0])
+
+	for event in events:
+		if event.get('ph') != 'X':
+			continue
+
+		name = event.get('name')
+		seconds = event.get('dur', 0) / 1e6
+		detail = event.get('args', {}).get('detail', '')
+
+		if name == 'ExecuteCompiler':
+			total = max(total, seconds)
+		elif name == 'Source':
+			headers[detail] += seconds
+		elif name in TEMPLATE_EVENTS:
+			templates[detail][0] += seconds
+			templates[detail][1] += 1
+
+	return total, dict(headers), {name: tuple(value) for name, value in templates.items()}
+
+
+def _ranked(steps: Dict[str, Tuple[float, int]], limit: int) -> List[BuildStep]:
+	"""
+	Sorts steps by time, slowest first.
+
+	:param      steps:  The steps, name to time and count
+	:type       steps:  dict
+	:param      limit:  The number of steps to keep, 0 for all
+	:type       limit:  int
+
+	:returns:   The ranked steps
+	:rtype:     list
+	"""
+	ranked = sorted(
+		(BuildStep(name, round(seconds, 3), count) for name, (seconds, count) in steps.items()),
+		key=lambda step: (-step.seconds, step.name),
+	)
+
+	return ranked[:limit] if limit else ranked
+
+
+def build_report(build_dir: Path, limit: int = 20) -> BuildReport:
+	"""
+	Ranks the slowest parts of the last build in a build directory.
+
+	Step durations come from `.ninja_log` (Ninja generators), and link steps
+	are told apart by their rule in `build.ninja`; headers and templates come
+	from Clang time traces, which also provide translation unit times when
+	the log is missing.
+
+	:param      build_dir:  The build directory
+	:type       build_dir:  Path
+	:param      limit:      The number of entries per section, 0 for all
+	:type       limit:      int
+
+	:returns:   The report
+	:rtype:     BuildReport
+
+	:raises     ValueError:  If the directory has neither a ninja log nor traces
+	"""
+	build_dir = Path(build_dir)
+	ninja_log = build_dir / NINJA_LOG_NAME
+	translation_units = {}
+	links = {}
+	headers = defaultdict(lambda: [0.0, 0])
+	templates = defaultdict(lambda: [0.0, 0])
+
+	if ninja_log.exists():
+		ninja_file = build_dir / NINJA_FILE_NAME
+		link_outputs = parse_link_outputs(ninja_file) if ninja_file.exists() else None
+
+		for output, seconds in parse_ninja_log(ninja_log).items():
+			if output.endswith(OBJECT_SUFFIXES + PCH_SUFFIXES):
+				translation_units[output] = (seconds, 1)
+			elif is_link_output(output, link_outputs):
+				links[output] = (seconds, 1)
+
+	traces = 0
+
+	for trace in find_time_traces(build_dir):
+		total, trace_headers, trace_templates = parse_time_trace(trace)
+		traces += 1
+
+		# main.cpp.json is written next to main.cpp.o
+		output = trace.relative_to(build_dir).with_suffix('.o').as_posix()
+		if not ninja_log.exists():
+			translation_units[output] = (total, 1)
+
+		for name, seconds in trace_headers.items():
+			headers[name][0] += seconds
+			headers[name][1] += 1
+
+		for name, (seconds, count) in trace_templates.items():
+			templates[name][0] += seconds
+			templates[name][1] += count
+
+	if not ninja_log.exists() and not traces:
+		raise ValueError(
+			f"No {NINJA_LOG_NAME} or time traces in '{build_dir}'. "
+			"Build with the Ninja generator, or with Clang and <project>_ENABLE_BUILD_PROFILE=ON."
+		)
+
+	return BuildReport(
+		_ranked(translation_units, limit),
+		_ranked(links, limit),
+		_ranked(headers, limit),
+		_ranked(templates, limit),
+		traces,
+	)
@@ -1,11 +1,53 @@
-from pycorn_maker.project import Project
+import os
+import sys
 import click
-from rich.console import Console
 
-console = Console()
+# Heavy modules (rich, the template tables, the worker pools) are imported
+# inside the commands that need them, so `corn --help` stays fast.
+_consoles = {}
 
 
-@click.group()
+def get_console(stderr: bool = False):
+	"""
+	Gets the shared rich console, importing rich on first use.
+
+	:param      stderr:  Print to stderr, e.g. when stdout carries an archive
+	:type       stderr:  bool
+
+	:returns:   The console
+	:rtype:     rich.console.Console
+	"""
+	if stderr not in _consoles:
+		from rich.console import Console
+
+		_consoles[stderr] = Console(stderr=stderr)
+
+	return _consoles[stderr]
+
+
+def terminal_width() -> int:
+	"""
+	Gets the terminal width like shutil.get_terminal_size(). click would
+	import shutil, and with it the compression modules, to format any help.
+
+	:returns:   The number of columns
+	:rtype:     int
+	"""
+	try:
+		columns = int(os.environ.get('COLUMNS', ''))
+	except ValueError:
+		columns = 0
+
+	if columns <= 0:
+		try:
+			columns = os.get_terminal_size(sys.__stdout__.fileno()).columns
+		except (AttributeError, ValueError, OSError):
+			columns = 0
+
+	return columns or 80
+
+
+@click.group(context_settings={'terminal_width': terminal_width()})
 def cli():
 	"""
 	Software for quickly creating C++ projects
@@ -21,7 +63,51 @@ def cli():
 @click.option(
 	"--tools",
 	multiple=True,
-	help="Optional tools to include: clang-tidy, cppcheck, doxygen, lcove, clang-format, codespell, conan, vcpkg",
+	help="Optional tools to include: clang-tidy, cppcheck, doxygen, lcov, clang-format, codespell, conan, vcpkg, ccache, sccache, benchmark",
+)
+@click.option("--unity-build", is_flag=True, help="Compile sources in unity batches (CMake 3.16+)")
+@click.option("--unity-batch-size", type=click.IntRange(min=0), default=16, help="Sources per unity batch, 0 for one batch (default: 16)")
+@click.option("--pch", is_flag=True, help="Precompile common headers from src/pch.hpp (CMake 3.16+)")
+@click.option(
+	"--linker",
+	type=click.Choice(["auto", "mold", "lld", "gold", "bfd"]),
+	default="auto",
+	help="Linker to use, auto picks the fastest available (default: auto)",
+)
+@click.option(
+	"--opt-profile",
+	type=click.Choice(["none", "throughput", "native", "latency", "size"]),
+	default="none",
+	help="Optimization flag set for non-Debug builds (default: none)",
+)
+@click.option(
+	"--layout",
+	type=click.Choice(["app", "lib+app"]),
+	default="app",
+	help="app: one executable; lib+app: a library linked by a thin executable and the tests (default: app)",
+)
+@click.option(
+	"--test-framework",
+	type=click.Choice(["auto", "doctest", "catch2", "none"]),
+	default="auto",
+	help="Test framework of test/; none makes each test a program whose exit code is the result, "
+	"auto is doctest if it is installed or in the dependency cache, else none (default: auto)",
+)
+@click.option("--pack", default="", help="Template pack from ~/.config/corn/templates/<pack> overriding the built-in templates")
+@click.option(
+	"--profile",
+	type=click.Choice(["table", "json"]),
+	default=None,
+	is_flag=False,
+	flag_value="table",
+	help="Time the generation per phase and per file: a table, or JSON on stdout",
+)
+@click.option("--archive", default=None, help="Write the project as an archive to this path ('-' for stdout) instead of a directory")
+@click.option(
+	"--archive-format",
+	type=click.Choice(["tar.gz", "zip"]),
+	default=None,
+	help="Archive format (default: from the --archive suffix, tar.gz for stdout)",
 )
 def create(
 	project_name: str,
@@ -29,11 +115,492 @@ def create(
 	cpp_standard: str,
 	cmake_version: str,
 	tools: list,
+	unity_build: bool,
+	unity_batch_size: int,
+	pch: bool,
+	linker: str,
+	opt_profile: str,
+	layout: str,
+	test_framework: str,
+	pack: str,
+	archive: str,
+	archive_format: str,
+	profile: str,
 ):
+	import time
+	from pycorn_maker.project import Project
+
 	if interactive:
 		cpp_standard = click.prompt("Enter CPP standard (default: 17)", default='17', type=str)
 		cmake_version = click.prompt("Enter CMake Version (default: 3.14)", default='3.14', type=str)
 
-	project = Project(project_name, cpp_standard, cmake_version, tools)
-	project.run()
-	console.print(f"[green]Project '{project_name}' created successfully![/green]")
+	start = time.perf_counter()
+
+	try:
+		project = Project(
+			project_name,
+			cpp_standard,
+			cmake_version,
+			tools,
+			unity_build=unity_build,
+			unity_batch_size=unity_batch_size,
+			pch=pch,
+			linker=linker,
+			opt_profile=opt_profile,
+			layout=layout,
+			test_framework=test_framework,
+			pack=pack,
+		)
+	except ValueError as error:
+		raise click.ClickException(str(error))
+
+	init_seconds = time.perf_counter() - start
+
+	if test_framework == 'auto' and project.test_framework == 'none':
+		get_console(stderr=True).print(
+			"[yellow]No usable doctest is installed or in the dependency cache, the tests use --test-framework none. "
+			"Pass --test-framework doctest to fetch it when the project is configured.[/yellow]"
+		)
+
+	if archive is None:
+		if profile is None:
+			project.run()
+		else:
+			from pycorn_maker.sinks import DiskSink
+
+			profile_write(project, DiskSink(project.base_dir), init_seconds, profile)
+
+		# Keep stdout parseable when it carries the JSON profile
+		get_console(stderr=profile == 'json').print(f"[green]Project '{project_name}' created successfully![/green]")
+		return
+
+	from pycorn_maker.sinks import ArchiveSink
+
+	if archive_format is None:
+		archive_format = 'zip' if archive.endswith('.zip') else 'tar.gz'
+
+	if archive == '-':
+		sink = ArchiveSink(click.get_binary_stream('stdout'), archive_format, project_name)
+
+		if profile is None:
+			with sink:
+				project.write(sink)
+		else:
+			# stdout carries the archive
+			profile_write(project, sink, init_seconds, profile, stderr=True)
+	else:
+		with open(archive, 'wb') as archive_file:
+			sink = ArchiveSink(archive_file, archive_format, project_name)
+
+			if profile is None:
+				with sink:
+					project.write(sink)
+			else:
+				profile_write(project, sink, init_seconds, profile)
+
+	get_console(stderr=archive == '-' or profile == 'json').print(f"[green]Project '{project_name}' written to {archive}[/green]")
+
+
+def profile_write(project, sink, init_seconds: float, output: str, stderr: bool = False):
+	"""
+	Writes a project through a profiling sink and prints the timings.
+
+	:param      project:       The project
+	:type       project:       Project
+	:param      sink:          The sink doing the actual output
+	:type       sink:          Sink
+	:param      init_seconds:  The time spent constructing the project
+	:type       init_seconds:  float
+	:param      output:        table or json
+	:type       output:        str
+	:param      stderr:        Print to stderr, e.g. when stdout carries an archive
+	:type       stderr:        bool
+	"""
+	from pycorn_maker.profiling import ProfilingSink
+
+	with ProfilingSink(sink) as profiling_sink:
+		profiling_sink.start(init_seconds)
+		project.write(profiling_sink)
+
+	profile = profiling_sink.profile()
+
+	if output == 'json':
+		import json
+
+		click.echo(json.dumps(profile.as_dict(), indent=4), err=stderr)
+		return
+
+	from rich.table import Table
+
+	console = get_console(stderr)
+	phases = Table(title='Generation phases', title_justify='left')
+	phases.add_column('Phase')
+	phases.add_column('Time (ms)', justify='right')
+	phases.add_column('Share', justify='right')
+
+	for phase, seconds in profile.phases.items():
+		share = seconds / profile.total_seconds if profile.total_seconds else 0.0
+		phases.add_row(phase, f'{seconds * 1e3:.2f}', f'{share:.0%}')
+
+	phases.add_row('total', f'{profile.total_seconds * 1e3:.2f}', '', style='bold')
+	console.print(phases)
+
+	files = Table(title='Files, slowest first', title_justify='left')
+	files.add_column('Path', overflow='fold')
+	files.add_column('Render (ms)', justify='right')
+	files.add_column('Write (ms)', justify='right')
+	files.add_column('Bytes', justify='right')
+
+	for timing in profile.slowest_files():
+		files.add_row(timing.path, f'{timing.render_seconds * 1e3:.3f}', f'{timing.write_seconds * 1e3:.3f}', str(timing.bytes))
+
+	files.add_row(f'{len(profile.files)} files', '', '', str(profile.bytes), style='bold')
+	console.print(files)
+
+
+@cli.command()
+def packs():
+	"""
+	List the template packs available to create --pack
+	"""
+	from rich.table import Table
+	from pycorn_maker.packs import list_packs, packs_dir
+
+	console = get_console()
+	available = list_packs()
+
+	if not available:
+		console.print(f"[yellow]No template packs in {packs_dir()}[/yellow]")
+		return
+
+	table = Table(title='Template packs', title_justify='left', caption=str(packs_dir()))
+	table.add_column('Name')
+	table.add_column('Files', justify='right')
+	table.add_column('Digest')
+
+	for pack in available:
+		table.add_row(pack.name, str(len(pack.files)), pack.digest[:12])
+
+	console.print(table)
+
+
+@cli.command("create-many")
+@click.argument("manifest", type=click.Path(exists=True, dir_okay=False))
+@click.option("--output-dir", default=".", type=click.Path(file_okay=False), help="Directory to create the projects in (default: .)")
+@click.option("--jobs", "-j", type=click.IntRange(min=1), default=None, help="Number of parallel workers (default: CPU count)")
+@click.option("--executor", type=click.Choice(["process", "thread"]), default="process", help="Worker pool kind (default: process)")
+@click.option("--store", default=None, type=click.Path(file_okay=False), help="Content-addressed store to link files shared by all projects from; put it on the same filesystem as --output-dir")
+@click.option("--link-mode", type=click.Choice(["auto", "reflink", "hardlink"]), default="auto", help="How to link from --store: auto tries reflink, then hardlink, then copies (default: auto)")
+def create_many(manifest: str, output_dir: str, jobs: int, executor: str, store: str, link_mode: str):
+	"""
+	Create many projects in parallel from a TOML/JSON manifest
+	"""
+	from pathlib import Path
+	from pycorn_maker.batch import generate_many
+	from pycorn_maker.manifest import load_manifest, validate_manifest
+
+	console = get_console()
+
+	try:
+		entries = load_manifest(manifest)
+	except ValueError as error:
+		raise click.ClickException(str(error))
+
+	valid, errors = validate_manifest(entries)
+
+	for error in errors:
+		console.print(f"[red]Skipping entry {error.index} '{error.name}': {error.message}[/red]")
+
+	summary = generate_many(valid, Path(output_dir), jobs, executor, Path(store).resolve() if store else None, link_mode)
+
+	for result in summary.failed:
+		console.print(f"[red]Project '{result.name}' failed: {result.error}[/red]")
+
+	console.print(
+		f"[green]Created {len(summary.succeeded)}/{len(entries)} projects ({summary.files} files) "
+		f"in {summary.elapsed:.2f}s: {summary.projects_per_second:.1f} projects/s, "
+		f"{summary.files_per_second:.1f} files/s[/green]"
+	)
+
+	if errors or summary.failed:
+		sys.exit(1)
+
+
+def load_project(project_dir: str, cpp_standard: str = None, cmake_version: str = None, tools: list = None):
+	"""
+	Loads an existing project with the options recorded in its .corn-lock.
+
+	:param      project_dir:    The project directory
+	:type       project_dir:    str
+	:param      cpp_standard:   Overrides the recorded C++ standard
+	:type       cpp_standard:   str
+	:param      cmake_version:  Overrides the recorded CMake version
+	:type       cmake_version:  str
+	:param      tools:          Overrides the recorded tools, None keeps them
+	:type       tools:          list
+
+	:returns:   The project
+	:rtype:     Project
+	"""
+	from pathlib import Path
+	from pycorn_maker.config import PROJECT_DEFAULTS
+	from pycorn_maker.lockfile import LOCK_FILE_NAME, LockFile
+	from pycorn_maker.project import Project
+
+	project_dir = Path(project_dir).resolve()
+	lock_path = project_dir / LOCK_FILE_NAME
+
+	try:
+		options = LockFile.load(lock_path).options if lock_path.exists() else {}
+	except ValueError as error:
+		raise click.ClickException(str(error))
+
+	if not options:
+		get_console().print(
+			f"[yellow]No {LOCK_FILE_NAME} found, the project is named '{project_dir.name}' after its directory and "
+			"existing files that differ will be reported as modified[/yellow]"
+		)
+		options = {'project_name': project_dir.name}
+	else:
+		# Projects locked before test frameworks existed keep their plain tests
+		options.setdefault('test_framework', 'none')
+
+	# The directory may be a checkout under another name, which must not rename the project
+	if not isinstance(options.get('project_name'), str):
+		raise click.ClickException(
+			f"{lock_path} does not record the project name. Add \"project_name\" to its options and run again."
+		)
+
+	try:
+		project = Project(
+			options['project_name'],
+			cpp_standard or options.get('cpp_standard', '17'),
+			cmake_version or options.get('cmake_version', '3.14'),
+			options.get('tools', []) if tools is None else list(tools),
+			project_dir.parent,
+			sources=options.get('sources'),
+			test_sources=options.get('test_sources'),
+			**{key: value for key, value in options.items() if key in PROJECT_DEFAULTS},
+		)
+	except ValueError as error:
+		raise click.ClickException(str(error))
+
+	project.base_dir = project_dir
+
+	return project
+
+
+def print_update_report(project, report):
+	"""
+	Prints what `Project.update` did.
+
+	:param      project:  The project
+	:type       project:  Project
+	:param      report:   The update report
+	:type       report:   UpdateReport
+	"""
+	console = get_console()
+
+	for path in report.created:
+		console.print(f"[green]created[/green]   {path}")
+	for path in report.updated:
+		console.print(f"[cyan]updated[/cyan]   {path}")
+	for path in report.modified:
+		console.print(f"[yellow]modified[/yellow]  {path} (changed locally, not overwritten)")
+	for path in report.stale:
+		console.print(f"[dim]stale[/dim]     {path} (no longer generated)")
+
+	console.print(
+		f"[green]Project '{project.project_name}' updated: {len(report.created)} created, "
+		f"{len(report.updated)} updated, {len(report.unchanged)} unchanged, "
+		f"{len(report.modified)} modified[/green]"
+	)
+
+
+@cli.command()
+@click.argument("project_dir", default=".", type=click.Path(exists=True, file_okay=False))
+@click.option("--cpp-standard", default=None, help="Override the C++ standard recorded in .corn-lock")
+@click.option("--cmake-version", default=None, help="Override the CMake version recorded in .corn-lock")
+@click.option("--tools", multiple=True, help="Override the tools recorded in .corn-lock; --tools '' removes them all")
+def update(project_dir: str, cpp_standard: str, cmake_version: str, tools: list):
+	"""
+	Regenerate an existing project, rewriting only changed files
+	"""
+	# Without --tools the recorded tools are kept; --tools '' selects none
+	project = load_project(project_dir, cpp_standard, cmake_version, [tool for tool in tools if tool] if tools else None)
+	print_update_report(project, project.update())
+
+
+def add_seeds(project, seeds: list):
+	"""
+	Adds new source/header pairs to a project and lists the sources in
+	cmake/sources.cmake. Files that already exist are kept as they are.
+
+	:param      project:  The project
+	:type       project:  Project
+	:param      seeds:    Pairs of path relative to the project root and content
+	:type       seeds:    list
+	"""
+	sources = [path for path, _ in seeds if path.suffix == '.cpp']
+	project.add_sources(
+		[path.as_posix() for path in sources if path.parts[0] != 'test'],
+		[path.as_posix() for path in sources if path.parts[0] == 'test'],
+	)
+	print_update_report(project, project.update(seeds))
+
+
+@cli.command("add-source")
+@click.argument("names", nargs=-1, required=True)
+@click.option("--project-dir", default=".", type=click.Path(exists=True, file_okay=False), help="Project directory (default: .)")
+def add_source(names: list, project_dir: str):
+	"""
+	Add source files (src/NAME.cpp and include/NAME.hpp) to a project
+	"""
+	from pycorn_maker.sources import render_source
+
+	project = load_project(project_dir)
+
+	try:
+		seeds = [seed for name in names for seed in render_source(project.project_name, name)]
+	except ValueError as error:
+		raise click.ClickException(str(error))
+
+	add_seeds(project, seeds)
+
+
+@cli.command("add-class")
+@click.argument("class_names", nargs=-1, required=True)
+@click.option("--project-dir", default=".", type=click.Path(exists=True, file_okay=False), help="Project directory (default: .)")
+def add_class(class_names: list, project_dir: str):
+	"""
+	Add classes, each with a header and a source file, to a project
+	"""
+	from pycorn_maker.sources import render_class
+
+	project = load_project(project_dir)
+
+	try:
+		seeds = [seed for class_name in class_names for seed in render_class(project.project_name, class_name)]
+	except ValueError as error:
+		raise click.ClickException(str(error))
+
+	add_seeds(project, seeds)
+
+
+@cli.command("add-module")
+@click.argument("names", nargs=-1, required=True)
+@click.option("--project-dir", default=".", type=click.Path(exists=True, file_okay=False), help="Project directory (default: .)")
+def add_module(names: list, project_dir: str):
+	"""
+	Add library modules (source, header and test) to a project
+	"""
+	from pycorn_maker.sources import render_module
+
+	project = load_project(project_dir)
+
+	try:
+		seeds = [seed for name in names for seed in render_module(project.project_name, name, project.test_framework)]
+	except ValueError as error:
+		raise click.ClickException(str(error))
+
+	add_seeds(project, seeds)
+
+
+@cli.command("build-report")
+@click.argument("build_dir", type=click.Path(exists=True, file_okay=False))
+@click.option("--limit", type=click.IntRange(min=0), default=20, help="Entries per section, 0 for all (default: 20)")
+@click.option("--json", "json_path", default=None, help="Also write the report as JSON to this path ('-' for stdout only)")
+def build_report(build_dir: str, limit: int, json_path: str):
+	"""
+	Rank the slowest translation units, headers, templates and links of a build
+	"""
+	import json
+	from pycorn_maker.build_report import build_report as make_report
+
+	try:
+		report = make_report(build_dir, limit)
+	except ValueError as error:
+		raise click.ClickException(str(error))
+
+	document = json.dumps(report.as_dict(), indent=4) + '\n'
+
+	if json_path == '-':
+		click.echo(document, nl=False)
+		return
+
+	if json_path is not None:
+		with open(json_path, 'w', encoding='utf-8') as json_file:
+			json_file.write(document)
+
+	from rich.table import Table
+
+	console = get_console()
+	sections = (
+		('Slowest translation units', report.translation_units, 'Runs'),
+		('Slowest link steps', report.links, 'Runs'),
+		('Most expensive headers', report.headers, 'Includes'),
+		('Most expensive template instantiations', report.templates, 'Instantiations'),
+	)
+
+	for title, steps, count_label in sections:
+		if not steps:
+			continue
+
+		table = Table(title=title, title_justify='left')
+		table.add_column('Name', overflow='fold')
+		table.add_column('Time (s)', justify='right')
+		table.add_column(count_label, justify='right')
+
+		for step in steps:
+			table.add_row(step.name, f'{step.seconds:.3f}', str(step.count))
+
+		console.print(table)
+
+	if not report.traces:
+		console.print("[yellow]No time traces found: headers and templates need a Clang build with the build-profile preset[/yellow]")
+
+
+@cli.group()
+def deps():
+	"""
+	Manage the dependency cache shared by all generated projects
+	"""
+
+
+@deps.command("prefetch")
+@click.argument("archives", nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.option("--project-dir", default=".", type=click.Path(exists=True, file_okay=False), help="Project whose declared dependencies are checked (default: .)")
+@click.option("--cache-dir", default=None, type=click.Path(file_okay=False), help="Cache directory (default: $CORN_DEPS_CACHE or ~/.cache/corn/deps)")
+def deps_prefetch(archives: list, project_dir: str, cache_dir: str):
+	"""
+	Fill the dependency cache from local archives, for configuring offline
+	"""
+	from pathlib import Path
+	from rich.table import Table
+	from pycorn_maker.deps import deps_cache_dir, find_dependencies, prefetch
+
+	console = get_console()
+	cache = Path(cache_dir) if cache_dir else deps_cache_dir()
+	dependencies = find_dependencies(Path(project_dir))
+
+	for archive in archives:
+		try:
+			keys = list(prefetch(Path(archive), cache, dependencies))
+		except (ValueError, OSError) as error:
+			raise click.ClickException(str(error))
+
+		console.print(f"[green]Cached {Path(archive).name} as {keys[0]}[/green]")
+
+	if not dependencies:
+		return
+
+	table = Table(title=f'Dependencies of {project_dir}', title_justify='left')
+	table.add_column('Name')
+	table.add_column('Archive', overflow='fold')
+	table.add_column('Cached')
+
+	for dependency in dependencies:
+		cached = (cache / dependency.key).is_dir()
+		table.add_row(dependency.name, dependency.url, '[green]yes[/green]' if cached else '[red]no[/red]')
+
+	console.print(table)
@@ -1,44 +1,531 @@
+# Modules generated only when the given tool is selected
+TOOL_MODULES = {
+	'ccache': ('compiler-cache.cmake',),
+	'sccache': ('compiler-cache.cmake',),
+	'benchmark': ('benchmark.cmake',),
+	'clang-tidy': ('tidy.cmake',),
+}
+
 CMAKE_MODULES = {
-	'coverage.cmake': '''
-# ---- Variables ----
+	'benchmark.cmake': '''
+# ---- Benchmarks ----
+
+# Uses an installed Google Benchmark if there is one, otherwise takes it
+# from the shared dependency cache. To build offline, run
+# `corn deps prefetch v1.8.3.tar.gz` with a copy of the release archive
+find_package(benchmark QUIET)
+if(NOT benchmark_FOUND)
+  include(cmake/modules/deps-cache.cmake)
+  set(BENCHMARK_ENABLE_TESTING OFF CACHE BOOL "" FORCE)
+  set(BENCHMARK_ENABLE_INSTALL OFF CACHE BOOL "" FORCE)
+  set(BENCHMARK_ENABLE_WERROR OFF CACHE BOOL "" FORCE)
+  corn_fetch(
+      benchmark
+      URL https://github.com/google/benchmark/archive/refs/tags/v1.8.3.tar.gz
+      URL_HASH SHA256=6bc180a57d23d4d9515519f92b0c83d61b05b5bab188961f36ac7b06b0d9e9ce
+  )
+  FetchContent_MakeAvailable(benchmark)
+endif()
+
+file(GLOB bench_files CONFIGURE_DEPENDS "${PROJECT_SOURCE_DIR}/benchmarks/*.cpp")
+
+# With the lib+app layout the benchmarks link the library instead of
+# compiling its sources again
+if(TARGET {{project_name}}::{{project_name}})
+  add_executable({{project_name}}_benchmarks ${bench_files})
+  target_link_libraries({{project_name}}_benchmarks PRIVATE {{project_name}}::{{project_name}})
+else()
+  add_executable({{project_name}}_benchmarks ${bench_files} ${{{project_name}}_SOURCES})
+endif()
+target_link_libraries({{project_name}}_benchmarks PRIVATE benchmark::benchmark)
+
+# ---- Benchmark target ----
 
-# We use variables separate from what CTest uses, because those have
-# customization issues
 set(
-    COVERAGE_TRACE_COMMAND
-    lcov -c -q
-    -o "${PROJECT_BINARY_DIR}/coverage.info"
-    -d "${PROJECT_BINARY_DIR}"
-    --include "${PROJECT_SOURCE_DIR}/*"
-    CACHE STRING
-    "; separated command to generate a trace for the 'coverage' target"
+    BENCHMARK_BASELINE "${PROJECT_SOURCE_DIR}/benchmarks/baseline.json"
+    CACHE FILEPATH "Benchmark results to compare against"
 )
+set(BENCHMARK_THRESHOLD 5 CACHE STRING "Slowdown in percent reported as a regression")
+
+find_package(Python3 3.6 COMPONENTS Interpreter REQUIRED)
 
+set(results "${PROJECT_BINARY_DIR}/benchmark-results.json")
+
+add_custom_target(
+    benchmark
+    COMMAND {{project_name}}_benchmarks
+    "--benchmark_out=${results}" --benchmark_out_format=json
+    COMMAND "${Python3_EXECUTABLE}" "${PROJECT_SOURCE_DIR}/benchmarks/compare.py"
+    "${results}" "${BENCHMARK_BASELINE}" --threshold "${BENCHMARK_THRESHOLD}"
+    COMMENT "Running benchmarks"
+    USES_TERMINAL
+    VERBATIM
+)
+	''',
+	'build-profile.cmake': '''
+# ---- Build profiling ----
+
+# Records where compile time goes. Clang writes a Chrome trace JSON next to
+# every object file, GCC prints a per-pass report after each compile. Rank
+# the slowest translation units, headers, templates and links with
+# `corn build-report <build-dir>`
+option({{project_name}}_ENABLE_BUILD_PROFILE "Record compile time traces" OFF)
 set(
-    COVERAGE_HTML_COMMAND
-    genhtml --legend -f -q
-    "${PROJECT_BINARY_DIR}/coverage.info"
-    -p "${PROJECT_SOURCE_DIR}"
-    -o "${PROJECT_BINARY_DIR}/coverage_html"
+    {{project_name}}_TIME_TRACE_GRANULARITY 500
+    CACHE STRING "Minimum duration in microseconds of a Clang time trace event"
+)
+
+if(NOT {{project_name}}_ENABLE_BUILD_PROFILE)
+  return()
+endif()
+
+if(CMAKE_CXX_COMPILER_ID MATCHES "Clang")
+  add_compile_options(
+      -ftime-trace
+      "-ftime-trace-granularity=${{{project_name}}_TIME_TRACE_GRANULARITY}"
+  )
+  message(STATUS "Build profile: Clang time traces")
+elseif(CMAKE_CXX_COMPILER_ID STREQUAL "GNU")
+  add_compile_options(-ftime-report)
+  message(STATUS "Build profile: GCC time reports in the build output")
+else()
+  message(WARNING "Build profiling is not supported for ${CMAKE_CXX_COMPILER_ID}")
+endif()
+	''',
+	'compiler-cache.cmake': '''
+# ---- Compiler cache ----
+
+# Wraps every compiler call in ccache or sccache when one of them is
+# installed, so clean rebuilds hit the cache instead of recompiling
+
+option(ENABLE_COMPILER_CACHE "Use a compiler cache when one is available" ON)
+
+set(
+    COMPILER_CACHE {{compiler_cache}}
     CACHE STRING
-    "; separated command to generate an HTML report for the 'coverage' target"
+    "; separated compiler caches to try, in order of preference"
+)
+
+if(NOT ENABLE_COMPILER_CACHE OR DEFINED CMAKE_CXX_COMPILER_LAUNCHER)
+  return()
+endif()
+
+set(name "")
+set(program "")
+foreach(candidate IN LISTS COMPILER_CACHE)
+  find_program("${candidate}_PROGRAM" NAMES "${candidate}")
+  mark_as_advanced("${candidate}_PROGRAM")
+  if(${candidate}_PROGRAM)
+    set(name "${candidate}")
+    set(program "${${candidate}_PROGRAM}")
+    break()
+  endif()
+endforeach()
+
+if(program STREQUAL "")
+  message(STATUS "Compiler cache: none of '${COMPILER_CACHE}' found")
+  return()
+endif()
+
+if(name STREQUAL "ccache")
+  # Make cache entries independent of the checkout location and of compiler
+  # mtimes, so separate clones and build trees share one cache
+  set(sloppiness "pch_defines,time_macros,include_file_mtime,include_file_ctime")
+
+  execute_process(
+      COMMAND "${program}" --version
+      OUTPUT_VARIABLE version_output
+      ERROR_QUIET
+  )
+  string(REGEX MATCH "version ([0-9]+\\\\.[0-9]+)" version_match "${version_output}")
+
+  if(CMAKE_MATCH_1 VERSION_GREATER_EQUAL "4.8")
+    # ccache 4.8+ accepts settings in front of the compiler, no extra process
+    set(
+        launcher
+        "${program}"
+        "base_dir=${PROJECT_SOURCE_DIR}"
+        compiler_check=content
+        hash_dir=false
+        "sloppiness=${sloppiness}"
+    )
+  else()
+    set(
+        launcher
+        "${CMAKE_COMMAND}" -E env
+        "CCACHE_BASEDIR=${PROJECT_SOURCE_DIR}"
+        CCACHE_COMPILERCHECK=content
+        CCACHE_NOHASHDIR=1
+        "CCACHE_SLOPPINESS=${sloppiness}"
+        "${program}"
+    )
+  endif()
+else()
+  set(launcher "${program}")
+endif()
+
+set(CMAKE_C_COMPILER_LAUNCHER ${launcher})
+set(CMAKE_CXX_COMPILER_LAUNCHER ${launcher})
+
+# build.sh reads this to print cache statistics after the build
+set(COMPILER_CACHE_PROGRAM "${program}" CACHE INTERNAL "")
+
+message(STATUS "Compiler cache: ${program}")
+	''',
+	'coverage.cmake': '''
+# ---- Coverage ----
+
+# Collects coverage of the last test run. gcovr and fastcov run gcov over all
+# object files in parallel; lcov is the fallback. Run the tests first, these
+# targets only collect:
+#   coverage          report for src/ and include/
+#   coverage-changed  report only for files changed since COVERAGE_BASE_REF
+#   coverage-reset    zero the counters without rebuilding
+# This file doubles as the script the targets run with cmake -P
+
+if(DEFINED CMAKE_SCRIPT_MODE_FILE)
+  if(MODE STREQUAL "reset")
+    file(GLOB_RECURSE counters "${BINARY_DIR}/*.gcda")
+    list(LENGTH counters count)
+    if(counters)
+      file(REMOVE ${counters})
+    endif()
+    message(STATUS "Coverage counters reset: removed ${count} .gcda files")
+    return()
+  endif()
+
+  if(JOBS LESS_EQUAL 0)
+    cmake_host_system_information(RESULT JOBS QUERY NUMBER_OF_LOGICAL_CORES)
+  endif()
+
+  # Paths relative to SOURCE_DIR that the report is limited to
+  set(paths src/ include/)
+  if(MODE STREQUAL "changed")
+    execute_process(
+        COMMAND git merge-base "${BASE_REF}" HEAD
+        WORKING_DIRECTORY "${SOURCE_DIR}"
+        OUTPUT_VARIABLE base
+        RESULT_VARIABLE result
+        OUTPUT_STRIP_TRAILING_WHITESPACE
+    )
+    if(NOT result EQUAL "0")
+      message(FATAL_ERROR "Cannot find the merge base with '${BASE_REF}'")
+    endif()
+    execute_process(
+        COMMAND git diff --name-only --relative "${base}" -- src include
+        WORKING_DIRECTORY "${SOURCE_DIR}"
+        OUTPUT_VARIABLE changed
+        OUTPUT_STRIP_TRAILING_WHITESPACE
+    )
+    string(REPLACE "\\n" ";" paths "${changed}")
+    if(paths STREQUAL "")
+      message(STATUS "No sources changed since ${BASE_REF}")
+      return()
+    endif()
+    list(JOIN paths ", " changed)
+    message(STATUS "Coverage of files changed since ${BASE_REF}: ${changed}")
+  endif()
+
+  set(output "${BINARY_DIR}/coverage")
+  file(REMOVE_RECURSE "${output}")
+  file(MAKE_DIRECTORY "${output}")
+  set(info "${output}/coverage.info")
+  set(lcov_config "")
+  if(EXISTS "${SOURCE_DIR}/tools/lcovrc")
+    set(lcov_config --config-file "${SOURCE_DIR}/tools/lcovrc")
+  endif()
+
+  get_filename_component(tool_name "${TOOL}" NAME_WE)
+  if(tool_name STREQUAL "gcovr")
+    set(args "")
+    foreach(path IN LISTS paths)
+      # gcovr filters are regular expressions
+      string(REPLACE "." "[.]" path "${path}")
+      list(APPEND args --filter "${path}")
+    endforeach()
+    execute_process(
+        COMMAND "${TOOL}" --root "${SOURCE_DIR}" ${args}
+        -j "${JOBS}" --gcov-executable "${GCOV}"
+        --html-details "${output}/index.html" --print-summary
+        "${BINARY_DIR}"
+        WORKING_DIRECTORY "${SOURCE_DIR}"
+        RESULT_VARIABLE result
+    )
+  else()
+    set(patterns "")
+    foreach(path IN LISTS paths)
+      list(APPEND patterns "${SOURCE_DIR}/${path}")
+    endforeach()
+    if(tool_name STREQUAL "fastcov")
+      execute_process(
+          COMMAND "${TOOL}" -d "${BINARY_DIR}" -j "${JOBS}" --gcov "${GCOV}"
+          --include ${patterns} --lcov -o "${info}"
+          RESULT_VARIABLE result
+      )
+    else()
+      list(TRANSFORM patterns APPEND "*")
+      execute_process(
+          COMMAND "${TOOL}" -c -q -d "${BINARY_DIR}" --gcov-tool "${GCOV}" ${lcov_config} -o "${info}"
+          RESULT_VARIABLE result
+      )
+      if(result EQUAL "0")
+        execute_process(
+            COMMAND "${TOOL}" -q -e "${info}" ${patterns} ${lcov_config} -o "${info}"
+            RESULT_VARIABLE result
+        )
+      endif()
+    endif()
+    if(result EQUAL "0" AND GENHTML)
+      execute_process(
+          COMMAND "${GENHTML}" --legend -q "${info}" -p "${SOURCE_DIR}" ${lcov_config} -o "${output}"
+          RESULT_VARIABLE result
+      )
+    endif()
+  endif()
+
+  if(NOT result EQUAL "0")
+    message(FATAL_ERROR "${tool_name} returned with ${result}")
+  endif()
+  message(STATUS "Coverage report: ${output}/index.html")
+  return()
+endif()
+
+# ---- Instrumentation ----
+
+# Instruments the targets defined so far in the project and test dirs
+foreach(dir IN ITEMS "${PROJECT_SOURCE_DIR}" "${PROJECT_SOURCE_DIR}/test")
+  if(NOT EXISTS "${dir}/CMakeLists.txt")
+    continue()
+  endif()
+  get_property(targets DIRECTORY "${dir}" PROPERTY BUILDSYSTEM_TARGETS)
+  foreach(target IN LISTS targets)
+    get_property(type TARGET "${target}" PROPERTY TYPE)
+    if(type MATCHES "^(EXECUTABLE|STATIC_LIBRARY|SHARED_LIBRARY|OBJECT_LIBRARY)$")
+      target_compile_options("${target}" PRIVATE --coverage)
+      target_link_options("${target}" PRIVATE --coverage)
+    endif()
+  endforeach()
+endforeach()
+
+# ---- Tools ----
+
+set(COVERAGE_TOOL auto CACHE STRING "Coverage tool: auto, gcovr, fastcov or lcov")
+set_property(CACHE COVERAGE_TOOL PROPERTY STRINGS auto gcovr fastcov lcov)
+set(COVERAGE_JOBS 0 CACHE STRING "Parallel gcov processes, 0 for one per core")
+set(COVERAGE_BASE_REF origin/main CACHE STRING "Git ref coverage-changed compares against")
+
+set(gcov gcov)
+if(CMAKE_CXX_COMPILER_ID MATCHES "Clang")
+  # Only gcovr accepts a command with arguments here
+  set(gcov "llvm-cov gcov")
+endif()
+set(COVERAGE_GCOV "${gcov}" CACHE STRING "gcov executable matching the compiler")
+
+set(candidates gcovr fastcov lcov)
+if(NOT COVERAGE_TOOL STREQUAL "auto")
+  set(candidates "${COVERAGE_TOOL}")
+endif()
+
+set(tool "")
+foreach(candidate IN LISTS candidates)
+  find_program("${candidate}_PROGRAM" NAMES "${candidate}")
+  mark_as_advanced("${candidate}_PROGRAM")
+  if(${candidate}_PROGRAM)
+    set(tool "${${candidate}_PROGRAM}")
+    break()
+  endif()
+endforeach()
+find_program(GENHTML_PROGRAM NAMES genhtml)
+mark_as_advanced(GENHTML_PROGRAM)
+
+if(tool STREQUAL "")
+  message(WARNING "None of '${candidates}' found, the coverage targets are disabled")
+  return()
+endif()
+message(STATUS "Coverage tool: ${tool}")
+
+set(genhtml "")
+if(GENHTML_PROGRAM)
+  set(genhtml "${GENHTML_PROGRAM}")
+endif()
+
+set(
+    coverage_command
+    "${CMAKE_COMMAND}"
+    -D "TOOL=${tool}"
+    -D "GCOV=${COVERAGE_GCOV}"
+    -D "GENHTML=${genhtml}"
+    -D "JOBS=${COVERAGE_JOBS}"
+    -D "SOURCE_DIR=${PROJECT_SOURCE_DIR}"
+    -D "BINARY_DIR=${PROJECT_BINARY_DIR}"
 )
 
-# ---- Coverage target ----
+# ---- Coverage targets ----
 
 add_custom_target(
     coverage
-    COMMAND ${COVERAGE_TRACE_COMMAND}
-    COMMAND ${COVERAGE_HTML_COMMAND}
+    COMMAND ${coverage_command} -D MODE=all -P "${CMAKE_CURRENT_LIST_FILE}"
     COMMENT "Generating coverage report"
     VERBATIM
 )
+
+add_custom_target(
+    coverage-changed
+    COMMAND ${coverage_command} -D MODE=changed -D "BASE_REF=${COVERAGE_BASE_REF}"
+    -P "${CMAKE_CURRENT_LIST_FILE}"
+    COMMENT "Generating coverage report for files changed since ${COVERAGE_BASE_REF}"
+    VERBATIM
+)
+
+add_custom_target(
+    coverage-reset
+    COMMAND "${CMAKE_COMMAND}" -D MODE=reset -D "BINARY_DIR=${PROJECT_BINARY_DIR}"
+    -P "${CMAKE_CURRENT_LIST_FILE}"
+    COMMENT "Resetting coverage counters"
+    VERBATIM
+)
+	''',
+	'deps-cache.cmake': '''
+# ---- Shared dependency cache ----
+
+# Dependency archives are unpacked once into a cache shared by all projects
+# and build trees, keyed by the archive hash (or by the URL when there is no
+# hash), so configure is a directory lookup. Fill the cache on hosts without
+# network access with `corn deps prefetch <archives...>`.
+# Works in script mode (cmake -P) too, see docs-ci.cmake
+
+include_guard(GLOBAL)
+
+if(DEFINED ENV{CORN_DEPS_CACHE})
+  set(default_cache "$ENV{CORN_DEPS_CACHE}")
+elseif(DEFINED ENV{XDG_CACHE_HOME})
+  set(default_cache "$ENV{XDG_CACHE_HOME}/corn/deps")
+elseif(WIN32)
+  set(default_cache "$ENV{LOCALAPPDATA}/corn/deps")
+else()
+  set(default_cache "$ENV{HOME}/.cache/corn/deps")
+endif()
+if(NOT DEFINED CORN_DEPS_CACHE)
+  set(CORN_DEPS_CACHE "${default_cache}" CACHE PATH "Shared cache of unpacked dependencies")
+endif()
+
+# corn_deps_entry(<name> URL <url> [URL_HASH <algo>=<hash>] [OPTIONAL])
+# Sets <name>_SOURCE_DIR to the unpacked archive in the cache. A miss
+# downloads and unpacks it, unless FETCHCONTENT_FULLY_DISCONNECTED is set.
+# With OPTIONAL, a miss that can not be downloaded leaves <name>_SOURCE_DIR
+# empty instead of failing
+function(corn_deps_entry name)
+  cmake_parse_arguments(PARSE_ARGV 1 arg "OPTIONAL" "URL;URL_HASH" "")
+  if(arg_URL_HASH)
+    string(REPLACE "=" "/" key "${arg_URL_HASH}")
+    string(TOLOWER "${key}" key)
+  else()
+    string(SHA256 key "${arg_URL}")
+    set(key "url/${key}")
+  endif()
+  set(entry "${CORN_DEPS_CACHE}/${key}")
+
+  if(NOT IS_DIRECTORY "${entry}")
+    if(FETCHCONTENT_FULLY_DISCONNECTED AND arg_OPTIONAL)
+      set("${name}_SOURCE_DIR" "" PARENT_SCOPE)
+      return()
+    elseif(FETCHCONTENT_FULLY_DISCONNECTED)
+      message(
+          FATAL_ERROR
+          "${name} is not in ${CORN_DEPS_CACHE}. Download ${arg_URL} "
+          "elsewhere and run: corn deps prefetch <archive>"
+      )
+    endif()
+
+    message(STATUS "Caching ${name} from ${arg_URL}")
+    string(RANDOM LENGTH 8 suffix)
+    set(tmp "${CORN_DEPS_CACHE}/tmp/${name}-${suffix}")
+    get_filename_component(archive "${arg_URL}" NAME)
+    # EXPECTED_HASH would turn a failed download into a hash mismatch
+    # error, so the hash is checked once the download succeeded
+    file(DOWNLOAD "${arg_URL}" "${tmp}/${archive}" STATUS status)
+    if(NOT status MATCHES "^0;")
+      file(REMOVE_RECURSE "${tmp}")
+      if(arg_OPTIONAL)
+        message(STATUS "Download of ${arg_URL} failed with ${status}")
+        set("${name}_SOURCE_DIR" "" PARENT_SCOPE)
+        return()
+      endif()
+      message(FATAL_ERROR "Download of ${arg_URL} failed with ${status}")
+    endif()
+    if(arg_URL_HASH)
+      string(REGEX MATCH "^([^=]+)=(.*)$" match "${arg_URL_HASH}")
+      string(TOUPPER "${CMAKE_MATCH_1}" algorithm)
+      string(TOLOWER "${CMAKE_MATCH_2}" expected)
+      file("${algorithm}" "${tmp}/${archive}" actual)
+      if(NOT actual STREQUAL expected)
+        file(REMOVE_RECURSE "${tmp}")
+        message(FATAL_ERROR "${arg_URL} has ${algorithm} ${actual}, expected ${expected}")
+      endif()
+    endif()
+
+    file(MAKE_DIRECTORY "${tmp}/src")
+    execute_process(
+        COMMAND "${CMAKE_COMMAND}" -E tar xf "${tmp}/${archive}"
+        WORKING_DIRECTORY "${tmp}/src"
+        RESULT_VARIABLE result
+    )
+    if(NOT result EQUAL "0")
+      file(REMOVE_RECURSE "${tmp}")
+      message(FATAL_ERROR "Extraction of ${archive} failed with ${result}")
+    endif()
+
+    # Like FetchContent, drop a single top level directory
+    set(root "${tmp}/src")
+    file(GLOB top LIST_DIRECTORIES true "${root}/*")
+    list(LENGTH top count)
+    if(count EQUAL "1" AND IS_DIRECTORY "${top}")
+      set(root "${top}")
+    endif()
+
+    # Entries appear atomically, so concurrent configures never see half
+    # of one
+    get_filename_component(parent "${entry}" DIRECTORY)
+    file(MAKE_DIRECTORY "${parent}")
+    if(NOT IS_DIRECTORY "${entry}")
+      file(RENAME "${root}" "${entry}")
+    endif()
+    file(REMOVE_RECURSE "${tmp}")
+  endif()
+
+  set("${name}_SOURCE_DIR" "${entry}" PARENT_SCOPE)
+endfunction()
+
+# corn_fetch(<name> URL <url> [URL_HASH <algo>=<hash>] [OPTIONAL] [<FetchContent_Declare options>...])
+# FetchContent_Declare with the sources taken from the shared cache, and
+# <name>_SOURCE_DIR set to them. Call FetchContent_MakeAvailable(<name>)
+# afterwards as usual. With OPTIONAL, a dependency that is neither cached
+# nor downloadable is not declared and <name>_SOURCE_DIR is empty
+macro(corn_fetch name)
+  include(FetchContent)
+  string(TOUPPER "${name}" corn_fetch_upper)
+  set(corn_fetch_args ${ARGN})
+  list(REMOVE_ITEM corn_fetch_args OPTIONAL)
+  if(FETCHCONTENT_SOURCE_DIR_${corn_fetch_upper})
+    set("${name}_SOURCE_DIR" "${FETCHCONTENT_SOURCE_DIR_${corn_fetch_upper}}")
+  else()
+    corn_deps_entry("${name}" ${ARGN})
+    set("FETCHCONTENT_SOURCE_DIR_${corn_fetch_upper}" "${${name}_SOURCE_DIR}")
+  endif()
+  if(${name}_SOURCE_DIR)
+    if(CMAKE_VERSION VERSION_GREATER_EQUAL "3.24")
+      list(APPEND corn_fetch_args DOWNLOAD_EXTRACT_TIMESTAMP YES)
+    endif()
+    FetchContent_Declare("${name}" ${corn_fetch_args})
+  endif()
+endmacro()
 	''',
 	'dev-mode.cmake': '''
 include(cmake/modules/folders.cmake)
 
 include(CTest)
-if(BUILD_TESTING)
+if(BUILD_TESTING AND EXISTS "${PROJECT_SOURCE_DIR}/test/CMakeLists.txt")
+  include(cmake/modules/test-framework.cmake)
   add_subdirectory(test)
 endif()
 
@@ -60,21 +547,13 @@ add_folders(Project)
 	'docs.cmake': '''
 # ---- Dependencies ----
 
-set(extract_timestamps "")
-if(CMAKE_VERSION VERSION_GREATER_EQUAL "3.24")
-  set(extract_timestamps DOWNLOAD_EXTRACT_TIMESTAMP YES)
-endif()
-
-include(FetchContent)
-FetchContent_Declare(
-    mcss URL
-    https://github.com/friendlyanon/m.css/releases/download/release-1/mcss.zip
-    URL_MD5 00cd2757ebafb9bcba7f5d399b3bec7f
-    SOURCE_DIR "${PROJECT_BINARY_DIR}/mcss"
-    UPDATE_DISCONNECTED YES
-    ${extract_timestamps}
+# m.css only provides scripts, so its cached sources are used in place
+include(cmake/modules/deps-cache.cmake)
+corn_deps_entry(
+    mcss
+    URL https://github.com/friendlyanon/m.css/releases/download/release-1/mcss.zip
+    URL_HASH MD5=00cd2757ebafb9bcba7f5d399b3bec7f
 )
-FetchContent_MakeAvailable(mcss)
 
 find_package(Python3 3.6 REQUIRED)
 
@@ -118,29 +597,12 @@ set(src "${PROJECT_SOURCE_DIR}")
 
 # ---- Dependencies ----
 
-set(mcss_SOURCE_DIR "${bin}/docs/.ci")
-if(NOT IS_DIRECTORY "${mcss_SOURCE_DIR}")
-  file(MAKE_DIRECTORY "${mcss_SOURCE_DIR}")
-  file(
-      DOWNLOAD
-      https://github.com/friendlyanon/m.css/releases/download/release-1/mcss.zip
-      "${mcss_SOURCE_DIR}/mcss.zip"
-      STATUS status
-      EXPECTED_MD5 00cd2757ebafb9bcba7f5d399b3bec7f
-  )
-  if(NOT status MATCHES "^0;")
-    message(FATAL_ERROR "Download failed with ${status}")
-  endif()
-  execute_process(
-      COMMAND "${CMAKE_COMMAND}" -E tar xf mcss.zip
-      WORKING_DIRECTORY "${mcss_SOURCE_DIR}"
-      RESULT_VARIABLE result
-  )
-  if(NOT result EQUAL "0")
-    message(FATAL_ERROR "Extraction failed with ${result}")
-  endif()
-  file(REMOVE "${mcss_SOURCE_DIR}/mcss.zip")
-endif()
+include("${CMAKE_CURRENT_LIST_DIR}/deps-cache.cmake")
+corn_deps_entry(
+    mcss
+    URL https://github.com/friendlyanon/m.css/releases/download/release-1/mcss.zip
+    URL_HASH MD5=00cd2757ebafb9bcba7f5d399b3bec7f
+)
 
 find_program(Python3_EXECUTABLE NAMES python3 python)
 if(NOT Python3_EXECUTABLE)
@@ -153,13 +615,13 @@ file(READ "${src}/CMakeLists.txt" content)
 
 string(FIND "${content}" "project(" index)
 if(index EQUAL "-1")
-  message(FATAL_ERROR "Could not find \"project(\"")
+  message(FATAL_ERROR "Could not find \\"project(\\"")
 endif()
 string(SUBSTRING "${content}" "${index}" -1 content)
 
 string(FIND "${content}" "\n)\n" index)
 if(index EQUAL "-1")
-  message(FATAL_ERROR "Could not find \"\\n)\\n\"")
+  message(FATAL_ERROR "Could not find \\"\\\\n)\\\\n\\"")
 endif()
 string(SUBSTRING "${content}" 0 "${index}" content)
 
@@ -175,7 +637,7 @@ function(docs_project name)
   set(PROJECT_NAME "${name}" PARENT_SCOPE)
   if(DEFINED _VERSION)
     set(PROJECT_VERSION "${_VERSION}" PARENT_SCOPE)
-    string(REGEX MATCH "^[0-9]+(\\.[0-9]+)*" versions "${_VERSION}")
+    string(REGEX MATCH "^[0-9]+(\\\\.[0-9]+)*" versions "${_VERSION}")
     string(REPLACE . ";" versions "${versions}")
     set(suffixes MAJOR MINOR PATCH TWEAK)
     while(NOT versions STREQUAL "" AND NOT suffixes STREQUAL "")
@@ -243,8 +705,7 @@ function(add_folders name)
 endfunction()                 
 	''',
 	'install-config.cmake': '''
-include(CMakeFindDependencyMacro)
-find_dependency(fmt)
+include("${CMAKE_CURRENT_LIST_DIR}/{{project_name}}Targets.cmake")
 	''',
 	'install-rules.cmake': '''
 if(PROJECT_IS_TOP_LEVEL)
@@ -262,9 +723,7 @@ include(GNUInstallDirs)
 set(package {{project_name}})
 
 install(
-    DIRECTORY
-    include/
-    "${PROJECT_BINARY_DIR}/export/"
+    DIRECTORY include/
     DESTINATION "${CMAKE_INSTALL_INCLUDEDIR}"
     COMPONENT {{project_name}}_Development
 )
@@ -283,6 +742,12 @@ install(
     DESTINATION "${CMAKE_INSTALL_INCLUDEDIR}"
 )
 
+install(
+    TARGETS {{project_name}}_exe
+    RUNTIME #
+    COMPONENT {{project_name}}_Runtime
+)
+
 write_basic_package_version_file(
     "${package}ConfigVersion.cmake"
     COMPATIBILITY SameMajorVersion
@@ -290,7 +755,7 @@ write_basic_package_version_file(
 
 # Allow package maintainers to freely override the path for the configs
 set(
-    {{project_name}}_INSTALL_CMAKEDIR "${CMAKE_INSTALL_LIBDIR}/cmake/modules/${package}"
+    {{project_name}}_INSTALL_CMAKEDIR "${CMAKE_INSTALL_LIBDIR}/cmake/${package}"
     CACHE STRING "CMake package config location relative to the install prefix"
 )
 set_property(CACHE {{project_name}}_INSTALL_CMAKEDIR PROPERTY TYPE PATH)
@@ -320,7 +785,49 @@ if(PROJECT_IS_TOP_LEVEL)
   include(CPack)
 endif()
 	''',
-	'link.cmake': '''
+	'lint-targets.cmake': '''
+set(
+    FORMAT_PATTERNS
+    src/*.cpp src/*.hpp
+    include/*.hpp
+    test/*.cpp test/*.hpp
+    CACHE STRING
+    "; separated patterns relative to the project source dir to format"
+)
+
+set(FORMAT_COMMAND clang-format CACHE STRING "Formatter to use")
+set(FORMAT_JOBS 0 CACHE STRING "Parallel formatter processes, 0 for one per core")
+
+# Both targets share a stamp file in the build dir, so only files changed
+# since the last clean run are passed to the formatter
+add_custom_target(
+    format-check
+    COMMAND "${CMAKE_COMMAND}"
+    -D "FORMAT_COMMAND=${FORMAT_COMMAND}"
+    -D "PATTERNS=${FORMAT_PATTERNS}"
+    -D "JOBS=${FORMAT_JOBS}"
+    -D "BINARY_DIR=${PROJECT_BINARY_DIR}"
+    -P "${PROJECT_SOURCE_DIR}/cmake/modules/lint.cmake"
+    WORKING_DIRECTORY "${PROJECT_SOURCE_DIR}"
+    COMMENT "Linting the code"
+    VERBATIM
+)
+
+add_custom_target(
+    format-fix
+    COMMAND "${CMAKE_COMMAND}"
+    -D "FORMAT_COMMAND=${FORMAT_COMMAND}"
+    -D "PATTERNS=${FORMAT_PATTERNS}"
+    -D "JOBS=${FORMAT_JOBS}"
+    -D "BINARY_DIR=${PROJECT_BINARY_DIR}"
+    -D FIX=YES
+    -P "${PROJECT_SOURCE_DIR}/cmake/modules/lint.cmake"
+    WORKING_DIRECTORY "${PROJECT_SOURCE_DIR}"
+    COMMENT "Fixing the code"
+    VERBATIM
+)
+	''',
+	'lint.cmake': '''
 cmake_minimum_required(VERSION 3.14)
 
 macro(default name)
@@ -332,81 +839,416 @@ endmacro()
 default(FORMAT_COMMAND clang-format)
 default(
     PATTERNS
-    source/*.cpp source/*.hpp
+    src/*.cpp src/*.hpp
     include/*.hpp
     test/*.cpp test/*.hpp
 )
 default(FIX NO)
-
-set(flag --output-replacements-xml)
-set(args OUTPUT_VARIABLE output)
-if(FIX)
-  set(flag -i)
-  set(args "")
+# Files per clang-format call and number of concurrent calls, 0 for one per core
+default(BATCH_SIZE 8)
+default(JOBS 0)
+# Directory for the stamp file, empty to re-check every file on every run
+default(BINARY_DIR "")
+
+if(JOBS LESS_EQUAL 0)
+  cmake_host_system_information(RESULT JOBS QUERY NUMBER_OF_LOGICAL_CORES)
+endif()
+if(JOBS LESS_EQUAL 0)
+  set(JOBS 1)
 endif()
 
 file(GLOB_RECURSE files ${PATTERNS})
-set(badly_formatted "")
-set(output "")
 string(LENGTH "${CMAKE_SOURCE_DIR}/" path_prefix_length)
 
+# ---- Skip files that were clean at the last run ----
+
+# The stamp file holds the SHA256 of every file that passed, keyed by the
+# formatter and its configuration, so changing either re-checks everything
+set(stamp_file "")
+set(config_hash "")
+if(NOT BINARY_DIR STREQUAL "")
+  set(stamp_file "${BINARY_DIR}/format-check.stamp")
+  set(config "${FORMAT_COMMAND}")
+  if(EXISTS "${CMAKE_SOURCE_DIR}/.clang-format")
+    file(READ "${CMAKE_SOURCE_DIR}/.clang-format" style)
+    string(APPEND config "\\n${style}")
+  endif()
+  string(SHA256 config_hash "${config}")
+endif()
+
+if(EXISTS "${stamp_file}")
+  file(STRINGS "${stamp_file}" stamp_lines)
+  list(GET stamp_lines 0 stamp_config)
+  list(REMOVE_AT stamp_lines 0)
+  if(stamp_config STREQUAL "config ${config_hash}")
+    foreach(line IN LISTS stamp_lines)
+      string(SUBSTRING "${line}" 0 64 hash)
+      string(SUBSTRING "${line}" 65 -1 relative_file)
+      set("stamp/${relative_file}" "${hash}")
+    endforeach()
+  endif()
+endif()
+
+set(pending "")
+set(clean "")
 foreach(file IN LISTS files)
-  execute_process(
-      COMMAND "${FORMAT_COMMAND}" --style=file "${flag}" "${file}"
-      WORKING_DIRECTORY "${CMAKE_SOURCE_DIR}"
-      RESULT_VARIABLE result
-      ${args}
-  )
-  if(NOT result EQUAL "0")
-    message(FATAL_ERROR "'${file}': formatter returned with ${result}")
+  string(SUBSTRING "${file}" "${path_prefix_length}" -1 relative_file)
+  file(SHA256 "${file}" hash)
+  set("hash/${relative_file}" "${hash}")
+  if(DEFINED "stamp/${relative_file}" AND "${stamp/${relative_file}}" STREQUAL hash)
+    list(APPEND clean "${relative_file}")
+  else()
+    list(APPEND pending "${relative_file}")
+  endif()
+endforeach()
+
+list(LENGTH files file_count)
+list(LENGTH pending pending_count)
+message(STATUS "Checking ${pending_count} of ${file_count} files")
+
+# ---- Run the formatter over batches of files in parallel ----
+
+# All COMMANDs of one execute_process run concurrently as a pipeline. With
+# file arguments clang-format ignores stdin, so each is an independent job
+set(flags --dry-run --Werror)
+if(FIX)
+  set(flags -i)
+endif()
+
+set(badly_formatted "")
+set(passed "")
+set(failures "")
+set(failure_output "")
+set(commands "")
+set(batch "")
+set(batches 0)
+set(index 0)
+
+foreach(relative_file IN LISTS pending)
+  list(APPEND batch "${relative_file}")
+  math(EXPR index "${index} + 1")
+  list(LENGTH batch batch_size)
+  if(batch_size EQUAL BATCH_SIZE OR index EQUAL pending_count)
+    list(APPEND commands COMMAND "${FORMAT_COMMAND}" --style=file ${flags} ${batch})
+    set("batch/${batches}" ${batch})
+    set(batch "")
+    math(EXPR batches "${batches} + 1")
   endif()
-  if(NOT FIX AND output MATCHES "\n<replacement offset")
-    string(SUBSTRING "${file}" "${path_prefix_length}" -1 relative_file)
-    list(APPEND badly_formatted "${relative_file}")
+  if(batches EQUAL JOBS OR (index EQUAL pending_count AND batches GREATER 0))
+    execute_process(
+        ${commands}
+        WORKING_DIRECTORY "${CMAKE_SOURCE_DIR}"
+        RESULTS_VARIABLE results
+        OUTPUT_VARIABLE output
+        ERROR_VARIABLE errors
+    )
+    # Violations look like "src/main.cpp:3:1: error: code should be
+    # clang-formatted [-Wclang-format-violations]"
+    string(REGEX MATCHALL "[^\\n]+:[0-9]+:[0-9]+: (error|warning): code should be clang-formatted" violations "${errors}")
+    foreach(violation IN LISTS violations)
+      string(REGEX REPLACE ":[0-9]+:[0-9]+: (error|warning): .*" "" relative_file "${violation}")
+      list(APPEND badly_formatted "${relative_file}")
+    endforeach()
+    # One result per batch, in order. Only the files of a batch that
+    # returned 0 are known to be clean. 1 means violations; anything else,
+    # or 1 without violations (e.g. an unreadable style file), is a failure
+    # of the formatter itself
+    set(batch_index 0)
+    set(group_failed NO)
+    foreach(result IN LISTS results)
+      if(result STREQUAL "0")
+        list(APPEND passed ${batch/${batch_index}})
+      elseif(NOT result STREQUAL "1" OR violations STREQUAL "")
+        list(APPEND failures "${result}")
+        set(group_failed YES)
+      endif()
+      math(EXPR batch_index "${batch_index} + 1")
+    endforeach()
+    if(group_failed)
+      string(APPEND failure_output "${errors}")
+    endif()
+    set(commands "")
+    set(batches 0)
   endif()
-  set(output "")
 endforeach()
 
+list(REMOVE_DUPLICATES badly_formatted)
+
+# ---- Remember the clean files ----
+
+if(NOT stamp_file STREQUAL "")
+  set(stamp "config ${config_hash}\\n")
+  foreach(relative_file IN LISTS clean passed)
+    set(hash "${hash/${relative_file}}")
+    if(FIX)
+      file(SHA256 "${CMAKE_SOURCE_DIR}/${relative_file}" hash)
+    endif()
+    string(APPEND stamp "${hash} ${relative_file}\\n")
+  endforeach()
+  file(WRITE "${stamp_file}" "${stamp}")
+endif()
+
+if(NOT failures STREQUAL "")
+  list(REMOVE_DUPLICATES failures)
+  list(JOIN failures ", " failure_list)
+  message(FATAL_ERROR "The formatter failed with ${failure_list}:\\n${failure_output}")
+endif()
+
 if(NOT badly_formatted STREQUAL "")
-  list(JOIN badly_formatted "\n" bad_list)
-  message("The following files are badly formatted:\n\n${bad_list}\n")
+  list(JOIN badly_formatted "\\n" bad_list)
+  message("The following files are badly formatted:\\n\\n${bad_list}\\n")
   message(FATAL_ERROR "Run again with FIX=YES to fix these files.")
 endif()
 	''',
-	'lint-targets.cmake': '''
+	'linker.cmake': '''
+# ---- Linker selection ----
+
+# auto picks the fastest linker that works with the current compiler, in the
+# order mold, lld, gold. default leaves the toolchain's linker alone
+set(USE_LINKER {{linker}} CACHE STRING "Linker: auto, mold, lld, gold, bfd or default")
+set_property(CACHE USE_LINKER PROPERTY STRINGS auto mold lld gold bfd default)
+
+if(MSVC OR USE_LINKER STREQUAL "default")
+  message(STATUS "Linker: toolchain default")
+  return()
+endif()
+
+include(CheckCXXSourceCompiles)
+
+# Results are cached, so only the first configure pays for the probes
+function(check_linker name result)
+  set(CMAKE_REQUIRED_LINK_OPTIONS "-fuse-ld=${name}")
+  set(CMAKE_REQUIRED_QUIET ON)
+  check_cxx_source_compiles("int main() { return 0; }" "LINKER_${name}_WORKS")
+  set("${result}" "${LINKER_${name}_WORKS}" PARENT_SCOPE)
+endfunction()
+
+set(candidates "${USE_LINKER}")
+if(USE_LINKER STREQUAL "auto")
+  set(candidates mold lld gold)
+endif()
+
+set(selected "")
+foreach(candidate IN LISTS candidates)
+  check_linker("${candidate}" works)
+  if(works)
+    set(selected "${candidate}")
+    break()
+  endif()
+endforeach()
+
+if(selected STREQUAL "")
+  if(NOT USE_LINKER STREQUAL "auto")
+    message(WARNING "Linker '${USE_LINKER}' does not work with ${CMAKE_CXX_COMPILER_ID}, using the default")
+  endif()
+  message(STATUS "Linker: toolchain default")
+  return()
+endif()
+
+if(CMAKE_VERSION VERSION_GREATER_EQUAL "3.29")
+  string(TOUPPER "${selected}" CMAKE_LINKER_TYPE)
+else()
+  add_link_options("-fuse-ld=${selected}")
+endif()
+
+message(STATUS "Linker: ${selected}")
+	''',
+	'lto-pgo.cmake': '''
+# ---- Link-time optimization ----
+
+option({{project_name}}_ENABLE_IPO "Enable interprocedural (link-time) optimization" OFF)
+
+if({{project_name}}_ENABLE_IPO)
+  if(NOT DEFINED {{project_name}}_IPO_SUPPORTED)
+    include(CheckIPOSupported)
+    check_ipo_supported(RESULT supported OUTPUT output LANGUAGES CXX)
+    set({{project_name}}_IPO_SUPPORTED "${supported}" CACHE INTERNAL "")
+    if(NOT supported)
+      message(WARNING "IPO/LTO is not supported by this toolchain: ${output}")
+    endif()
+  endif()
+
+  if({{project_name}}_IPO_SUPPORTED)
+    set(CMAKE_INTERPROCEDURAL_OPTIMIZATION ON)
+    message(STATUS "IPO/LTO: enabled")
+  endif()
+endif()
+
+# ---- Profile-guided optimization ----
+
+# GENERATE builds instrumented binaries that write profiles into
+# {{project_name}}_PGO_DIR when run; USE rebuilds with those profiles.
+# build.sh pgo <training-command> runs both stages end to end. Objects do
+# not depend on the profiles, so build USE with --clean-first (the pgo-use
+# build preset does) after every training run
+set({{project_name}}_PGO OFF CACHE STRING "Profile-guided optimization stage: OFF, GENERATE or USE")
+set_property(CACHE {{project_name}}_PGO PROPERTY STRINGS OFF GENERATE USE)
 set(
-    FORMAT_PATTERNS
-    source/*.cpp source/*.hpp
-    include/*.hpp
-    test/*.cpp test/*.hpp
-    CACHE STRING
-    "; separated patterns relative to the project source dir to format"
+    {{project_name}}_PGO_DIR "${PROJECT_SOURCE_DIR}/build/pgo-profile"
+    CACHE PATH "Directory the PGO profiles are written to and read from"
 )
 
-set(FORMAT_COMMAND clang-format CACHE STRING "Formatter to use")
+set(stage "${{{project_name}}_PGO}")
+set(dir "${{{project_name}}_PGO_DIR}")
 
-add_custom_target(
-    format-check
-    COMMAND "${CMAKE_COMMAND}"
-    -D "FORMAT_COMMAND=${FORMAT_COMMAND}"
-    -D "PATTERNS=${FORMAT_PATTERNS}"
-    -P "${PROJECT_SOURCE_DIR}/cmake/modules/lint.cmake"
-    WORKING_DIRECTORY "${PROJECT_SOURCE_DIR}"
-    COMMENT "Linting the code"
-    VERBATIM
-)
+if(NOT stage OR NOT stage MATCHES "^(GENERATE|USE)$")
+  return()
+endif()
 
-add_custom_target(
-    format-fix
-    COMMAND "${CMAKE_COMMAND}"
-    -D "FORMAT_COMMAND=${FORMAT_COMMAND}"
-    -D "PATTERNS=${FORMAT_PATTERNS}"
-    -D FIX=YES
-    -P "${PROJECT_SOURCE_DIR}/cmake/modules/lint.cmake"
-    WORKING_DIRECTORY "${PROJECT_SOURCE_DIR}"
-    COMMENT "Fixing the code"
-    VERBATIM
+if(CMAKE_CXX_COMPILER_ID MATCHES "Clang")
+  if(stage STREQUAL "GENERATE")
+    set(flags "-fprofile-generate=${dir}")
+  else()
+    # Clang writes raw profiles that have to be merged before use
+    set(profile "${dir}/default.profdata")
+    file(GLOB raw_profiles "${dir}/*.profraw")
+    if(raw_profiles)
+      get_filename_component(compiler_dir "${CMAKE_CXX_COMPILER}" DIRECTORY)
+      find_program(LLVM_PROFDATA NAMES llvm-profdata HINTS "${compiler_dir}")
+      if(NOT LLVM_PROFDATA)
+        message(FATAL_ERROR "llvm-profdata is needed to merge the PGO profiles in ${dir}")
+      endif()
+      execute_process(
+          COMMAND "${LLVM_PROFDATA}" merge "-output=${profile}" ${raw_profiles}
+          RESULT_VARIABLE result
+      )
+      if(NOT result EQUAL "0")
+        message(FATAL_ERROR "llvm-profdata merge failed with ${result}")
+      endif()
+      file(REMOVE ${raw_profiles})
+    endif()
+    if(NOT EXISTS "${profile}")
+      message(FATAL_ERROR "No PGO profile in ${dir}, build and run the GENERATE stage first")
+    endif()
+    set(
+        flags
+        "-fprofile-use=${profile}"
+        -Wno-profile-instr-unprofiled
+        -Wno-profile-instr-out-of-date
+    )
+  endif()
+elseif(CMAKE_CXX_COMPILER_ID STREQUAL "GNU")
+  if(stage STREQUAL "GENERATE")
+    set(flags "-fprofile-generate=${dir}" -fprofile-update=prefer-atomic)
+  else()
+    set(flags "-fprofile-use=${dir}" -fprofile-correction)
+  endif()
+
+  # GCC names profiles after the object paths; strip the build directory so
+  # the GENERATE and USE build trees can live in different directories
+  include(CheckCXXCompilerFlag)
+  check_cxx_compiler_flag("-fprofile-prefix-path=${PROJECT_BINARY_DIR}" HAVE_FPROFILE_PREFIX_PATH)
+  if(HAVE_FPROFILE_PREFIX_PATH)
+    list(APPEND flags "-fprofile-prefix-path=${PROJECT_BINARY_DIR}")
+  else()
+    message(WARNING "GCC older than 11: use the same build directory for both PGO stages")
+  endif()
+else()
+  message(WARNING "PGO is not supported for ${CMAKE_CXX_COMPILER_ID}")
+  return()
+endif()
+
+file(MAKE_DIRECTORY "${dir}")
+add_compile_options(${flags})
+add_link_options(${flags})
+
+message(STATUS "PGO: ${stage} (${dir})")
+	''',
+	'optimization.cmake': '''
+# ---- Optimization profile ----
+
+# Curated flag sets on top of the build type. Every flag is checked against
+# the compiler first, so unsupported flags are dropped instead of breaking
+# the build. Debug builds are left alone
+#   throughput  -O3, no PLT indirection, no semantic interposition
+#   native      throughput tuned for the build machine (-march=native)
+#   latency     -O2 with frame pointers, for profiling with perf and friends
+#   size        -Os, dropping unused functions and data at link time
+set(
+    {{project_name}}_OPT_PROFILE {{opt_profile}}
+    CACHE STRING "Optimization profile: none, throughput, native, latency or size"
 )
+set_property(CACHE {{project_name}}_OPT_PROFILE PROPERTY STRINGS none throughput native latency size)
+
+set(profile "${{{project_name}}_OPT_PROFILE}")
+
+if(profile STREQUAL "none")
+  return()
+endif()
+
+if(NOT CMAKE_CXX_COMPILER_ID MATCHES "GNU|Clang")
+  message(WARNING "Optimization profile '${profile}' is not supported for ${CMAKE_CXX_COMPILER_ID}")
+  return()
+endif()
+
+set(compile_flags "")
+set(link_flags "")
+
+if(profile STREQUAL "throughput" OR profile STREQUAL "native")
+  list(APPEND compile_flags -O3 -fno-plt -fno-semantic-interposition)
+  if(profile STREQUAL "native")
+    if(CMAKE_CROSSCOMPILING)
+      message(WARNING "-march=native is skipped when cross-compiling")
+    else()
+      list(APPEND compile_flags -march=native -mtune=native)
+    endif()
+  endif()
+elseif(profile STREQUAL "latency")
+  list(
+      APPEND compile_flags
+      -O2 -fno-omit-frame-pointer -mno-omit-leaf-frame-pointer
+      -fno-semantic-interposition
+  )
+elseif(profile STREQUAL "size")
+  list(APPEND compile_flags -Os -ffunction-sections -fdata-sections)
+  if(APPLE)
+    list(APPEND link_flags -Wl,-dead_strip)
+  else()
+    list(APPEND link_flags -Wl,--gc-sections)
+  endif()
+else()
+  message(FATAL_ERROR "Unknown optimization profile '${profile}'")
+endif()
+
+include(CheckCXXCompilerFlag)
+include(CheckCXXSourceCompiles)
+
+set(applied "")
+set(dropped "")
+set(release_only "$<NOT:$<CONFIG:Debug>>")
+
+foreach(flag IN LISTS compile_flags)
+  string(MAKE_C_IDENTIFIER "{{project_name}}_HAS_FLAG${flag}" result)
+  check_cxx_compiler_flag("${flag}" "${result}")
+  if(${result})
+    add_compile_options("$<${release_only}:${flag}>")
+    list(APPEND applied "${flag}")
+  else()
+    list(APPEND dropped "${flag}")
+  endif()
+endforeach()
+
+# Linker flags need a link step, which check_cxx_compiler_flag does not
+# pass them to
+foreach(flag IN LISTS link_flags)
+  string(MAKE_C_IDENTIFIER "{{project_name}}_HAS_LINK_FLAG${flag}" result)
+  set(CMAKE_REQUIRED_LINK_OPTIONS "${flag}")
+  check_cxx_source_compiles("int main() { return 0; }" "${result}")
+  unset(CMAKE_REQUIRED_LINK_OPTIONS)
+  if(${result})
+    add_link_options("$<${release_only}:${flag}>")
+    list(APPEND applied "${flag}")
+  else()
+    list(APPEND dropped "${flag}")
+  endif()
+endforeach()
+
+list(JOIN applied " " applied)
+message(STATUS "Optimization profile ${profile}: ${applied}")
+if(dropped)
+  list(JOIN dropped " " dropped)
+  message(STATUS "Optimization profile ${profile}: dropped unsupported ${dropped}")
+endif()
 	''',
 	'prelude.cmake': '''
 # ---- In-source guard ----
@@ -482,6 +1324,263 @@ add_custom_target(
     COMMENT "Fixing spelling errors"
     VERBATIM
 )
+	''',
+	'test-framework.cmake': '''
+# ---- Test framework ----
+
+# corn_setup_tests(<doctest|catch2|none> [OPTIONAL]) makes the framework
+# available and writes the CTest resource spec; corn_add_test() then adds
+# one executable per test source. An installed doctest or Catch2 is used if
+# there is one, otherwise it is taken from the shared dependency cache. To
+# build offline, run `corn deps prefetch` with a copy of the release archive.
+# A framework that can not be found or downloaded is an error, unless it is
+# OPTIONAL (picked by `corn create` rather than by the user): then
+# CORN_TEST_FRAMEWORK is left empty and the tests are disabled with a
+# warning, and `build.sh test` fails as no tests are registered
+
+include_guard(GLOBAL)
+include("${CMAKE_CURRENT_LIST_DIR}/deps-cache.cmake")
+
+set(
+    CORN_TEST_CPUS 0
+    CACHE STRING "CPU slots in the CTest resource spec, 0 for all logical cores"
+)
+
+function(corn_setup_tests framework)
+  cmake_parse_arguments(PARSE_ARGV 1 arg "OPTIONAL" "" "")
+  set(main "")
+  set(CORN_TEST_FRAMEWORK "" PARENT_SCOPE)
+  set(
+      missing
+      "${framework} is neither installed nor in ${CORN_DEPS_CACHE} and could "
+      "not be downloaded. Install it, or download its release archive "
+      "elsewhere and run: corn deps prefetch <archive>"
+  )
+  string(CONCAT missing ${missing})
+  set(missing_severity FATAL_ERROR)
+  if(arg_OPTIONAL)
+    set(missing_severity WARNING)
+    string(APPEND missing " The tests are disabled until then.")
+  endif()
+
+  if(framework STREQUAL "doctest")
+    find_package(doctest 2.4 QUIET)
+    if(doctest_FOUND)
+      list(APPEND CMAKE_MODULE_PATH "${doctest_DIR}")
+    else()
+      set(DOCTEST_WITH_TESTS OFF CACHE BOOL "" FORCE)
+      set(DOCTEST_NO_INSTALL ON CACHE BOOL "" FORCE)
+      corn_fetch(
+          doctest
+          URL https://github.com/doctest/doctest/archive/refs/tags/v2.4.11.tar.gz
+          URL_HASH SHA256=632ed2c05a7f53fa961381497bf8069093f0d6628c5f26286161fbd32a560186
+          OPTIONAL
+      )
+      if(NOT doctest_SOURCE_DIR)
+        message("${missing_severity}" "${missing}")
+        return()
+      endif()
+      FetchContent_MakeAvailable(doctest)
+      list(APPEND CMAKE_MODULE_PATH "${doctest_SOURCE_DIR}/scripts/cmake")
+    endif()
+    include(doctest)
+
+    # The main() of all test executables, compiled once. configure_file only
+    # touches the source when it changes, so reconfiguring rebuilds nothing
+    set(main_source "${PROJECT_BINARY_DIR}/test-main/doctest_main.cpp")
+    file(
+        WRITE "${main_source}.in"
+        "#define DOCTEST_CONFIG_IMPLEMENT_WITH_MAIN\\n#include <doctest/doctest.h>\\n"
+    )
+    configure_file("${main_source}.in" "${main_source}" COPYONLY)
+    set(main "${PROJECT_NAME}_test_main")
+    if(NOT TARGET "${main}")
+      add_library("${main}" STATIC "${main_source}")
+      target_link_libraries("${main}" PUBLIC doctest::doctest)
+    endif()
+  elseif(framework STREQUAL "catch2")
+    find_package(Catch2 3 QUIET)
+    if(Catch2_FOUND)
+      list(APPEND CMAKE_MODULE_PATH "${Catch2_DIR}")
+    else()
+      corn_fetch(
+          Catch2
+          URL https://github.com/catchorg/Catch2/archive/refs/tags/v3.5.2.tar.gz
+          URL_HASH SHA256=269543a49eb76f40b3f93ff231d4c24c27a7e16c90e47d2e45bcc564de470c6e
+          OPTIONAL
+      )
+      if(NOT Catch2_SOURCE_DIR)
+        message("${missing_severity}" "${missing}")
+        return()
+      endif()
+      FetchContent_MakeAvailable(Catch2)
+      list(APPEND CMAKE_MODULE_PATH "${catch2_SOURCE_DIR}/extras")
+    endif()
+    include(Catch)
+    set(main Catch2::Catch2WithMain)
+  elseif(NOT framework STREQUAL "none")
+    message(FATAL_ERROR "Unknown test framework '${framework}', use doctest, catch2 or none")
+  endif()
+
+  # A single CPU resource with one slot per core: CTest starts a test only
+  # when the slots it reserves with RESOURCE_GROUPS are free
+  set(cpus "${CORN_TEST_CPUS}")
+  if(NOT cpus)
+    cmake_host_system_information(RESULT cpus QUERY NUMBER_OF_LOGICAL_CORES)
+  endif()
+  set(spec "${PROJECT_BINARY_DIR}/ctest-resources.json")
+  file(
+      WRITE "${spec}.in"
+      "{\\n"
+      "  \\"version\\": {\\"major\\": 1, \\"minor\\": 0},\\n"
+      "  \\"local\\": [{\\"cpus\\": [{\\"id\\": \\"0\\", \\"slots\\": ${cpus}}]}]\\n"
+      "}\\n"
+  )
+  configure_file("${spec}.in" "${spec}" COPYONLY)
+
+  set(CORN_TEST_FRAMEWORK "${framework}" PARENT_SCOPE)
+  set(CORN_TEST_MAIN "${main}" PARENT_SCOPE)
+  set(CORN_TEST_SLOTS "${cpus}" PARENT_SCOPE)
+endfunction()
+
+# corn_add_test(<name> <source> [LIBRARY <target>] [CPUS <n>])
+# Builds one test executable and registers each of its test cases with
+# CTest as <name>.<case>, so `ctest -j` runs cases rather than executables
+# in parallel. Every case reserves CPUS cores (default 1): a test that
+# starts threads should ask for as many as it uses. Without the framework,
+# the executable is one test and a non-zero exit code fails it
+function(corn_add_test name source)
+  cmake_parse_arguments(PARSE_ARGV 2 arg "" "LIBRARY;CPUS" "")
+  if(NOT arg_CPUS)
+    set(arg_CPUS 1)
+  elseif(arg_CPUS GREATER CORN_TEST_SLOTS)
+    set(arg_CPUS "${CORN_TEST_SLOTS}")
+  endif()
+
+  add_executable("${name}" "${source}")
+  target_link_libraries("${name}" PRIVATE ${arg_LIBRARY} ${CORN_TEST_MAIN})
+
+  # PROCESSORS limits `ctest -j` without a resource spec too
+  set(properties PROCESSORS "${arg_CPUS}" RESOURCE_GROUPS "cpus:${arg_CPUS}")
+  if(CORN_TEST_FRAMEWORK STREQUAL "doctest")
+    doctest_discover_tests("${name}" TEST_PREFIX "${name}." PROPERTIES ${properties})
+  elseif(CORN_TEST_FRAMEWORK STREQUAL "catch2")
+    catch_discover_tests("${name}" TEST_PREFIX "${name}." PROPERTIES ${properties})
+  else()
+    add_test(NAME "${name}" COMMAND "${name}")
+    set_tests_properties("${name}" PROPERTIES ${properties})
+  endif()
+endfunction()
+	''',
+	'tidy.cmake': '''
+# ---- clang-tidy ----
+
+# clang-tidy needs the exact flags of every translation unit
+set(CMAKE_EXPORT_COMPILE_COMMANDS ON)
+
+find_program(CLANG_TIDY_PROGRAM NAMES clang-tidy)
+find_package(Python3 COMPONENTS Interpreter)
+
+set(TIDY_JOBS 0 CACHE STRING "Parallel clang-tidy processes, 0 for one per core")
+set(TIDY_BASE_REF origin/main CACHE STRING "Git ref that tidy-changed compares against")
+
+if(NOT CLANG_TIDY_PROGRAM OR NOT Python3_Interpreter_FOUND)
+  message(STATUS "clang-tidy or Python 3 not found, the tidy targets are disabled")
+  return()
+endif()
+
+# A unity build compiles batches that only include the real sources, so its
+# compile database hides them from clang-tidy. The tidy targets then use
+# the compile database of a tree configured without unity builds (and
+# without precompiled headers, whose flags clang-tidy can not read)
+set(tidy_database "${PROJECT_BINARY_DIR}")
+set(tidy_configure "")
+if({{project_name}}_UNITY_BUILD)
+  set(tidy_database "${PROJECT_BINARY_DIR}/tidy-db")
+  set(
+      tidy_configure
+      COMMAND "${CMAKE_COMMAND}"
+      -S "${PROJECT_SOURCE_DIR}" -B "${tidy_database}"
+      -G "${CMAKE_GENERATOR}"
+      "-DCMAKE_CXX_COMPILER=${CMAKE_CXX_COMPILER}"
+      "-DCMAKE_BUILD_TYPE=${CMAKE_BUILD_TYPE}"
+      -DCMAKE_EXPORT_COMPILE_COMMANDS=ON
+      "-D{{project_name}}_DEVELOPER_MODE=${{{project_name}}_DEVELOPER_MODE}"
+      -D{{project_name}}_UNITY_BUILD=OFF
+      -D{{project_name}}_PCH=OFF
+  )
+endif()
+
+# Results are cached per translation unit in the build dir, keyed on the
+# compile command and the content of every file it includes
+set(
+    tidy_command
+    "${Python3_EXECUTABLE}" "${PROJECT_SOURCE_DIR}/tools/run-tidy.py"
+    --clang-tidy "${CLANG_TIDY_PROGRAM}"
+    --build-dir "${tidy_database}"
+    --source-dir "${PROJECT_SOURCE_DIR}"
+    --cache "${PROJECT_BINARY_DIR}/tidy-cache.json"
+    --jobs "${TIDY_JOBS}"
+)
+
+add_custom_target(
+    tidy
+    ${tidy_configure}
+    COMMAND ${tidy_command}
+    WORKING_DIRECTORY "${PROJECT_SOURCE_DIR}"
+    COMMENT "Running clang-tidy"
+    VERBATIM
+    USES_TERMINAL
+)
+
+add_custom_target(
+    tidy-changed
+    ${tidy_configure}
+    COMMAND ${tidy_command} --changed "${TIDY_BASE_REF}"
+    WORKING_DIRECTORY "${PROJECT_SOURCE_DIR}"
+    COMMENT "Running clang-tidy on files changed since ${TIDY_BASE_REF}"
+    VERBATIM
+    USES_TERMINAL
+)
+	''',
+	'unity-pch.cmake': '''
+# ---- Unity builds and precompiled headers ----
+
+# The project-wide options below set the defaults. Each target passed to
+# enable_unity_pch() also gets UNITY_BUILD_<target> and PCH_<target> cache
+# options, so either can be turned off for a single target
+option({{project_name}}_UNITY_BUILD "Compile sources in unity batches" {{unity_build}})
+set(
+    {{project_name}}_UNITY_BUILD_BATCH_SIZE {{unity_batch_size}}
+    CACHE STRING "Sources per unity batch, 0 for one batch per target"
+)
+option({{project_name}}_PCH "Precompile src/pch.hpp" {{pch}})
+
+function(enable_unity_pch target)
+  option(UNITY_BUILD_${target} "Unity build for ${target}" ${{{project_name}}_UNITY_BUILD})
+  option(PCH_${target} "Precompiled header for ${target}" ${{{project_name}}_PCH})
+
+  if(NOT UNITY_BUILD_${target} AND NOT PCH_${target})
+    return()
+  endif()
+
+  if(CMAKE_VERSION VERSION_LESS "3.16")
+    message(WARNING "Unity builds and precompiled headers need CMake 3.16, ignored for ${target}")
+    return()
+  endif()
+
+  if(UNITY_BUILD_${target})
+    set_target_properties(
+        "${target}" PROPERTIES
+        UNITY_BUILD ON
+        UNITY_BUILD_BATCH_SIZE "${{{project_name}}_UNITY_BUILD_BATCH_SIZE}"
+    )
+  endif()
+
+  if(PCH_${target})
+    target_precompile_headers("${target}" PRIVATE "${PROJECT_SOURCE_DIR}/src/pch.hpp")
+  endif()
+endfunction()
 	''',
 	'variables.cmake': '''
 # ---- Developer mode ----
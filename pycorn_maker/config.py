@@ -0,0 +1,26 @@
+# Optional project settings and their defaults. Every key is a keyword
+# argument of Project, is recorded in .corn-lock and may appear in a
+# create-many manifest entry.
+PROJECT_DEFAULTS = {
+	'unity_build': False,
+	'unity_batch_size': 16,
+	'pch': False,
+	'linker': 'auto',
+	'layout': 'app',
+	'opt_profile': 'none',
+	# A template pack from ~/.config/corn/templates, '' for the built-in templates
+	'pack': '',
+	# auto is doctest when it is installed or in the dependency cache, else none
+	'test_framework': 'auto',
+	# Disable the tests with a warning when the framework is missing at
+	# configure time, instead of failing. Set when auto picked the framework
+	'test_framework_optional': False,
+}
+
+# Allowed values of the string settings above
+PROJECT_CHOICES = {
+	'linker': ('auto', 'mold', 'lld', 'gold', 'bfd'),
+	'layout': ('app', 'lib+app'),
+	'opt_profile': ('none', 'throughput', 'native', 'latency', 'size'),
+	'test_framework': ('auto', 'doctest', 'catch2', 'none'),
+}
@@ -0,0 +1,412 @@
+import hashlib
+import os
+import re
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+# Digests an archive is registered under, so a declaration can use any of them
+HASH_ALGORITHMS = ('md5', 'sha1', 'sha256')
+# The digest the unpacked sources are stored under; the others link to it
+STORE_ALGORITHM = 'sha256'
+URL_KEY = 'url'
+TMP_DIR_NAME = 'tmp'
+CHUNK_SIZE = 1 << 20
+# corn_fetch(<name> URL <url> [URL_HASH <algo>=<hash>] ...) and
+# corn_deps_entry(<name> ...) calls in the generated CMake modules
+DECLARATION_PATTERN = re.compile(r'corn_(?:fetch|deps_entry)\(\s*(\w+)\s+([^)]*)\)')
+# Where CMake package configs are installed below a prefix
+PACKAGE_CONFIG_DIRS = ('lib/cmake/{package}*', 'lib64/cmake/{package}*', 'lib/*/cmake/{package}*', 'share/{package}*',
+					'share/cmake/{package}*')
+# find_package(<name> <version> QUIET) calls of the test framework module
+FIND_PACKAGE_PATTERN = re.compile(r'find_package\((\w+) ([\d.]+) QUIET\)')
+# The version a package version file reports
+PACKAGE_VERSION_PATTERN = re.compile(r'set\(\s*PACKAGE_VERSION\s+"?([\d.]+)')
+
+
+class Dependency(NamedTuple):
+	"""
+	A dependency declared by a project's CMake modules.
+	"""
+
+	name: str
+	url: str
+	url_hash: str
+
+	@property
+	def key(self) -> str:
+		"""
+		The cache key, the same one deps-cache.cmake computes.
+
+		:returns:   The key, relative to the cache directory
+		:rtype:     str
+		"""
+		if self.url_hash:
+			return self.url_hash.replace('=', '/', 1).lower()
+
+		return url_key(self.url)
+
+	@property
+	def archive_name(self) -> str:
+		"""
+		The file name of the archive the URL points to.
+
+		:returns:   The file name
+		:rtype:     str
+		"""
+		return PurePosixPath(self.url).name
+
+
+def deps_cache_dir() -> Path:
+	"""
+	Gets the shared dependency cache, with the same precedence as
+	deps-cache.cmake: $CORN_DEPS_CACHE, then $XDG_CACHE_HOME/corn/deps, then
+	~/.cache/corn/deps.
+
+	:returns:   The cache directory
+	:rtype:     Path
+	"""
+	if os.environ.get('CORN_DEPS_CACHE'):
+		return Path(os.environ['CORN_DEPS_CACHE'])
+
+	if os.environ.get('XDG_CACHE_HOME'):
+		return Path(os.environ['XDG_CACHE_HOME']) / 'corn' / 'deps'
+
+	return Path.home() / '.cache' / 'corn' / 'deps'
+
+
+def url_key(url: str) -> str:
+	"""
+	Gets the cache key of a dependency declared without a hash.
+
+	:param      url:  The URL
+	:type       url:  str
+
+	:returns:   The key, relative to the cache directory
+	:rtype:     str
+	"""
+	return f"{URL_KEY}/{hashlib.sha256(url.encode('utf-8')).hexdigest()}"
+
+
+def declared_dependencies(text: str) -> Iterator[Dependency]:
+	"""
+	Parses the dependency declarations of one CMake module.
+
+	:param      text:  The module source
+	:type       text:  str
+
+	:returns:   The dependencies in declaration order
+	:rtype:     iterator
+	"""
+	for match in DECLARATION_PATTERN.finditer(text):
+		arguments = [argument.strip('"') for argument in match.group(2).split()]
+		values = dict(zip(arguments, arguments[1:]))
+
+		if 'URL' in values:
+			yield Dependency(match.group(1), values['URL'], values.get('URL_HASH', ''))
+
+
+def find_dependencies(project_dir: Path) -> List[Dependency]:
+	"""
+	Finds the dependencies declared in a project's CMake modules.
+
+	:param      project_dir:  The project directory
+	:type       project_dir:  Path
+
+	:returns:   The dependencies in file order, each listed once
+	:rtype:     list
+	"""
+	dependencies = []
+	modules_dir = Path(project_dir) / 'cmake' / 'modules'
+
+	for path in sorted(modules_dir.glob('*.cmake')):
+		for dependency in declared_dependencies(path.read_text(encoding='utf-8')):
+			# docs.cmake and docs-ci.cmake both declare m.css
+			if all(known.key != dependency.key for known in dependencies):
+				dependencies.append(dependency)
+
+	return dependencies
+
+
+def parse_version(version: str) -> Tuple[int, ...]:
+	"""
+	Parses a dotted version number.
+
+	:param      version:  The version, e.g. 2.4.11
+	:type       version:  str
+
+	:returns:   The numeric components
+	:rtype:     tuple
+	"""
+	return tuple(int(part) for part in version.split('.') if part)
+
+
+def version_compatible(installed: str, required: str) -> bool:
+	"""
+	Checks an installed version against a find_package() version the way
+	doctest and Catch2 configs do: same major version, not older.
+
+	:param      installed:  The installed version
+	:type       installed:  str
+	:param      required:   The required version
+	:type       required:   str
+
+	:returns:   True if find_package() accepts the installed version
+	:rtype:     bool
+	"""
+	installed_version, required_version = parse_version(installed), parse_version(required)
+
+	return bool(installed_version) and installed_version[0] == required_version[0] and installed_version >= required_version
+
+
+def installed_version(directory: Path, package: str) -> Optional[str]:
+	"""
+	Reads the version of an installed package from its version file.
+
+	:param      directory:  The directory of the package config
+	:type       directory:  Path
+	:param      package:    The package name
+	:type       package:    str
+
+	:returns:   The version, or None without a version file
+	:rtype:     str
+	"""
+	for name in (f'{package}ConfigVersion.cmake', f'{package.lower()}-config-version.cmake'):
+		try:
+			match = PACKAGE_VERSION_PATTERN.search((directory / name).read_text(encoding='utf-8', errors='replace'))
+		except OSError:
+			continue
+
+		if match:
+			return match.group(1)
+
+	return None
+
+
+@lru_cache(maxsize=None)
+def package_installed(package: str, version: str = '') -> bool:
+	"""
+	Checks for the CMake package config of a package in the usual install
+	prefixes and $CMAKE_PREFIX_PATH, roughly where find_package looks.
+
+	:param      package:  The package name, e.g. doctest
+	:type       package:  str
+	:param      version:  The version passed to find_package(), '' for any
+	:type       version:  str
+
+	:returns:   True if a config file of a compatible version was found
+	:rtype:     bool
+	"""
+	prefixes = [Path(prefix) for prefix in os.environ.get('CMAKE_PREFIX_PATH', '').split(os.pathsep) if prefix]
+	prefixes += [Path('/usr/local'), Path('/usr')]
+	config_names = (f'{package}Config.cmake', f'{package.lower()}-config.cmake')
+
+	for prefix in prefixes:
+		for pattern in PACKAGE_CONFIG_DIRS:
+			for directory in prefix.glob(pattern.format(package=package)):
+				if not any((directory / name).is_file() for name in config_names):
+					continue
+
+				# find_package() rejects a config without a version file when a version is requested
+				found_version = installed_version(directory, package)
+
+				if not version or (found_version and version_compatible(found_version, version)):
+					return True
+
+	return False
+
+
+def test_framework_available(test_framework: str, cache_dir: Optional[Path] = None) -> bool:
+	"""
+	Checks whether a project could configure the test framework without
+	network access: installed, or already in the dependency cache.
+
+	:param      test_framework:  The test framework, see config.PROJECT_CHOICES
+	:type       test_framework:  str
+	:param      cache_dir:       The cache directory, see deps_cache_dir()
+	:type       cache_dir:       Path
+
+	:returns:   True if it is available
+	:rtype:     bool
+	"""
+	from pycorn_maker.cmake_modules import CMAKE_MODULES
+
+	if test_framework == 'none':
+		return True
+
+	cache_dir = cache_dir or deps_cache_dir()
+	module = CMAKE_MODULES['test-framework.cmake']
+	versions = dict(FIND_PACKAGE_PATTERN.findall(module))
+
+	for dependency in declared_dependencies(module):
+		if dependency.name.lower() == test_framework:
+			# The cached archive is the pinned release, which is always compatible
+			return package_installed(dependency.name, versions.get(dependency.name, '')) or (cache_dir / dependency.key).is_dir()
+
+	return False
+
+
+def archive_digests(archive: Path) -> Dict[str, str]:
+	"""
+	Hashes an archive with every supported algorithm in one pass.
+
+	:param      archive:  The archive path
+	:type       archive:  Path
+
+	:returns:   The algorithm names and hex digests
+	:rtype:     dict
+	"""
+	hashes = {algorithm: hashlib.new(algorithm) for algorithm in HASH_ALGORITHMS}
+
+	with open(archive, 'rb') as archive_file:
+		for chunk in iter(lambda: archive_file.read(CHUNK_SIZE), b''):
+			for digest in hashes.values():
+				digest.update(chunk)
+
+	return {algorithm: digest.hexdigest() for algorithm, digest in hashes.items()}
+
+
+def _check_member(name: str, archive: Path):
+	"""
+	Rejects archive members that would land outside the extraction directory.
+
+	:param      name:     The member name
+	:type       name:     str
+	:param      archive:  The archive, for the error message
+	:type       archive:  Path
+
+	:raises     ValueError:  If the member path is absolute or leaves the directory
+	"""
+	path = PurePosixPath(name)
+
+	if path.is_absolute() or '..' in path.parts:
+		raise ValueError(f"Unsafe path '{name}' in '{archive}'.")
+
+
+def extract_archive(archive: Path, destination: Path):
+	"""
+	Unpacks a tar or zip archive.
+
+	:param      archive:      The archive path
+	:type       archive:      Path
+	:param      destination:  The directory to unpack into
+	:type       destination:  Path
+
+	:raises     ValueError:  If the file is not a supported archive or is unsafe
+	"""
+	if zipfile.is_zipfile(archive):
+		with zipfile.ZipFile(archive) as zip_file:
+			for name in zip_file.namelist():
+				_check_member(name, archive)
+
+			zip_file.extractall(destination)
+	elif tarfile.is_tarfile(archive):
+		with tarfile.open(archive) as tar_file:
+			members = tar_file.getmembers()
+
+			for member in members:
+				_check_member(member.name, archive)
+
+				if member.issym() or member.islnk():
+					_check_member(str(PurePosixPath(member.name).parent / member.linkname), archive)
+
+			tar_file.extractall(destination, members)
+	else:
+		raise ValueError(f"'{archive}' is not a tar or zip archive.")
+
+
+def _source_root(directory: Path) -> Path:
+	"""
+	Gets the directory holding the unpacked sources: like FetchContent, a
+	single top level directory is dropped.
+
+	:param      directory:  The extraction directory
+	:type       directory:  Path
+
+	:returns:   The source root
+	:rtype:     Path
+	"""
+	entries = list(directory.iterdir())
+
+	if len(entries) == 1 and entries[0].is_dir():
+		return entries[0]
+
+	return directory
+
+
+def _link(entry: Path, target: Path):
+	"""
+	Points an alias key at a stored entry, unless the alias already exists.
+
+	:param      entry:   The alias path
+	:type       entry:   Path
+	:param      target:  The stored entry
+	:type       target:  Path
+	"""
+	if entry.exists() or entry.is_symlink():
+		return
+
+	entry.parent.mkdir(parents=True, exist_ok=True)
+	entry.symlink_to(os.path.relpath(target, entry.parent), target_is_directory=True)
+
+
+def prefetch(archive: Path, cache_dir: Path, dependencies: Optional[List[Dependency]] = None) -> Iterator[str]:
+	"""
+	Adds a local archive to the dependency cache.
+
+	The sources are unpacked once under the SHA-256 of the archive, and the
+	other digests link to them. Dependencies declared without a hash are
+	matched by the archive file name and linked under their URL key. An
+	entry is renamed into place only once it is complete, so a concurrent
+	configure never sees half of one.
+
+	:param      archive:       The archive path
+	:type       archive:       Path
+	:param      cache_dir:     The cache directory
+	:type       cache_dir:     Path
+	:param      dependencies:  The declared dependencies to link by file name
+	:type       dependencies:  list
+
+	:returns:   The keys the archive is now cached under
+	:rtype:     iterator
+
+	:raises     ValueError:  If the archive is missing or cannot be unpacked
+	"""
+	archive = Path(archive)
+
+	if not archive.is_file():
+		raise ValueError(f"Archive '{archive}' does not exist.")
+
+	digests = archive_digests(archive)
+	stored = cache_dir / STORE_ALGORITHM / digests[STORE_ALGORITHM]
+
+	if not stored.is_dir():
+		tmp_dir = cache_dir / TMP_DIR_NAME
+		tmp_dir.mkdir(parents=True, exist_ok=True)
+		extraction = Path(tempfile.mkdtemp(prefix=f'{archive.name}-', dir=tmp_dir))
+
+		try:
+			extract_archive(archive, extraction)
+			stored.parent.mkdir(parents=True, exist_ok=True)
+
+			if not stored.is_dir():
+				os.rename(_source_root(extraction), stored)
+		finally:
+			shutil.rmtree(extraction, ignore_errors=True)
+
+	yield f'{STORE_ALGORITHM}/{digests[STORE_ALGORITHM]}'
+
+	for algorithm, digest in digests.items():
+		if algorithm != STORE_ALGORITHM:
+			_link(cache_dir / algorithm / digest, stored)
+			yield f'{algorithm}/{digest}'
+
+	for dependency in dependencies or ():
+		if not dependency.url_hash and dependency.archive_name == archive.name:
+			_link(cache_dir / dependency.key, stored)
+			yield dependency.key
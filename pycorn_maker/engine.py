@@ -0,0 +1,91 @@
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Tuple
+
+
+PLACEHOLDER_RE = re.compile(r'\{\{(\w+)\}\}')
+# Looks like a placeholder but is not one, e.g. {{ name }} or {{project-name}}.
+# Braces around other text, such as C++ initializers {{1, 2}}, are literal
+MALFORMED_RE = re.compile(r'\{\{[\w.\- ]*\}\}')
+
+
+class Template:
+	"""
+	A template parsed once into literal and placeholder segments.
+
+	Segments alternate: even positions are literal text, odd positions are
+	placeholder names, so rendering is a single join over the segment list.
+	"""
+
+	def __init__(self, source: str, name: str = '<template>'):
+		"""
+		Constructs a new instance.
+
+		:param      source:  The template source
+		:type       source:  str
+		:param      name:    The template name used in error messages
+		:type       name:    str
+
+		:raises     ValueError:  If the template has a malformed placeholder
+		"""
+		self.name = name
+		self.segments: Tuple[str, ...] = tuple(PLACEHOLDER_RE.split(source))
+		self.placeholders: FrozenSet[str] = frozenset(self.segments[1::2])
+
+		malformed = sorted({match.group(0) for literal in self.segments[::2] for match in MALFORMED_RE.finditer(literal)})
+		if malformed:
+			raise ValueError(f"Malformed template keys in '{name}': {', '.join(malformed)}")
+
+	def render(self, variables: Dict[str, str]) -> str:
+		"""
+		Renders the template in one pass.
+
+		:param      variables:  The variables
+		:type       variables:  dict
+
+		:returns:   The rendered text
+		:rtype:     str
+
+		:raises     ValueError:  If the template uses a key missing from variables
+		"""
+		missing = self.placeholders.difference(variables)
+		if missing:
+			raise ValueError(f"Unknown template keys in '{self.name}': {', '.join(sorted(missing))}")
+
+		parts = list(self.segments)
+		parts[1::2] = [variables[key] for key in self.segments[1::2]]
+
+		return ''.join(parts)
+
+
+@lru_cache(maxsize=None)
+def compile_template(source: str, name: str = '<template>') -> Template:
+	"""
+	Parses a template, caching the parsed form for the life of the process.
+
+	:param      source:  The template source
+	:type       source:  str
+	:param      name:    The template name used in error messages
+	:type       name:    str
+
+	:returns:   The parsed template
+	:rtype:     Template
+	"""
+	return Template(source, name)
+
+
+def render_template(source: str, variables: Dict[str, str], name: str = '<template>') -> str:
+	"""
+	Renders a template source with the given variables.
+
+	:param      source:     The template source
+	:type       source:     str
+	:param      variables:  The variables
+	:type       variables:  dict
+	:param      name:       The template name used in error messages
+	:type       name:       str
+
+	:returns:   The rendered text
+	:rtype:     str
+	"""
+	return compile_template(source, name).render(variables)
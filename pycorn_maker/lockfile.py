@@ -0,0 +1,118 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+
+LOCK_FILE_NAME = '.corn-lock'
+LOCK_FILE_VERSION = 1
+
+
+def content_hash(data: bytes) -> str:
+	"""
+	Computes the hash recorded for a generated file.
+
+	:param      data:  The file content
+	:type       data:  bytes
+
+	:returns:   The hex digest
+	:rtype:     str
+	"""
+	return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path: Path) -> Optional[str]:
+	"""
+	Computes the hash of a file on disk.
+
+	:param      path:  The path
+	:type       path:  Path
+
+	:returns:   The hex digest, or None if the file does not exist
+	:rtype:     str
+	"""
+	try:
+		with open(path, 'rb') as file:
+			return content_hash(file.read())
+	except FileNotFoundError:
+		return None
+
+
+class LockFile:
+	"""
+	The `.corn-lock` manifest: the options a project was generated with and
+	the hash of every generated file.
+	"""
+
+	def __init__(self, options: dict, files: Dict[str, str]):
+		"""
+		Constructs a new instance.
+
+		:param      options:  The generation options
+		:type       options:  dict
+		:param      files:    The generated files, relative path to hash
+		:type       files:    dict
+		"""
+		self.options = options
+		self.files = files
+
+	@classmethod
+	def load(cls, path: Path) -> 'LockFile':
+		"""
+		Loads a lock file.
+
+		:param      path:  The path
+		:type       path:  Path
+
+		:returns:   The lock file
+		:rtype:     LockFile
+
+		:raises     ValueError:  If the lock file is malformed or from a newer version
+		"""
+		with open(path, 'r', encoding='utf-8') as lock_file:
+			try:
+				document = json.load(lock_file)
+			except json.JSONDecodeError as error:
+				raise ValueError(f"Malformed lock file '{path}': {error}") from None
+
+		if document.get('version') != LOCK_FILE_VERSION:
+			raise ValueError(f"Unsupported lock file version in '{path}': {document.get('version')}")
+
+		return cls(document.get('options', {}), document.get('files', {}))
+
+	def dumps(self) -> bytes:
+		"""
+		Serializes the lock file with stable key order, so it diffs cleanly.
+
+		:returns:   The lock file content
+		:rtype:     bytes
+		"""
+		document = {
+			'version': LOCK_FILE_VERSION,
+			'options': self.options,
+			'files': self.files,
+		}
+
+		return (json.dumps(document, indent=4, sort_keys=True) + '\n').encode('utf-8')
+
+	def save(self, path: Path):
+		"""
+		Saves the lock file.
+
+		:param      path:  The path
+		:type       path:  Path
+		"""
+		with open(path, 'wb') as lock_file:
+			lock_file.write(self.dumps())
+
+
+class UpdateReport(NamedTuple):
+	"""
+	What `corn update` did with each generated file.
+	"""
+
+	created: List[str]
+	updated: List[str]
+	unchanged: List[str]
+	modified: List[str]
+	stale: List[str]
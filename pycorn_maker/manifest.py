@@ -0,0 +1,184 @@
+import json
+from pathlib import Path
+from typing import List, NamedTuple, Tuple
+from pycorn_maker.config import PROJECT_CHOICES, PROJECT_DEFAULTS
+from pycorn_maker.tools import SUPPORTED_TOOLS
+from pycorn_maker.validators import validate_project
+
+
+DEFAULTS = {
+	'cpp_standard': '17',
+	'cmake_version': '3.14',
+	'tools': [],
+}
+ENTRY_KEYS = ('name',) + tuple(DEFAULTS.keys()) + tuple(PROJECT_DEFAULTS.keys())
+
+
+class ManifestEntry(NamedTuple):
+	"""
+	One project described by a manifest.
+	"""
+
+	index: int
+	name: str
+	cpp_standard: str
+	cmake_version: str
+	tools: list
+	options: dict
+
+
+class ManifestError(NamedTuple):
+	"""
+	A manifest entry that failed validation.
+	"""
+
+	index: int
+	name: str
+	message: str
+
+
+def _load_toml(path: Path) -> dict:
+	"""
+	Loads a TOML document.
+
+	:param      path:  The path
+	:type       path:  Path
+
+	:returns:   The parsed document
+	:rtype:     dict
+	"""
+	try:
+		import tomllib
+	except ImportError:
+		try:
+			import tomli as tomllib
+		except ImportError:
+			raise ValueError("TOML manifests require Python 3.11+ or the 'tomli' package. Use a JSON manifest instead.") from None
+
+	with open(path, 'rb') as manifest_file:
+		return tomllib.load(manifest_file)
+
+
+def load_manifest(path: Path) -> List[dict]:
+	"""
+	Loads the raw project entries from a TOML or JSON manifest.
+
+	The manifest contains a ``projects`` array of tables and an optional
+	``defaults`` table applied to every entry. A JSON manifest may also be a
+	plain array of entries.
+
+	:param      path:  The manifest path
+	:type       path:  Path
+
+	:returns:   The raw entries with defaults applied
+	:rtype:     list
+	"""
+	path = Path(path)
+
+	if path.suffix == '.toml':
+		document = _load_toml(path)
+	elif path.suffix == '.json':
+		with open(path, 'r', encoding='utf-8') as manifest_file:
+			document = json.load(manifest_file)
+	else:
+		raise ValueError(f"Unsupported manifest format '{path.suffix}'. Use .toml or .json.")
+
+	if isinstance(document, list):
+		document = {'projects': document}
+
+	if not isinstance(document, dict) or not isinstance(document.get('projects'), list):
+		raise ValueError("Manifest must contain a 'projects' array.")
+
+	if not isinstance(document.get('defaults', {}), dict):
+		raise ValueError("Manifest 'defaults' must be a table.")
+
+	defaults = dict(DEFAULTS)
+	defaults.update(document.get('defaults', {}))
+
+	entries = []
+
+	for raw_entry in document['projects']:
+		entry = dict(defaults)
+
+		if isinstance(raw_entry, dict):
+			entry.update(raw_entry)
+		else:
+			entry['name'] = raw_entry
+
+		entries.append(entry)
+
+	return entries
+
+
+def _parse_entry(index: int, entry: dict) -> ManifestEntry:
+	"""
+	Normalizes and validates one raw manifest entry.
+
+	:param      index:  The entry position in the manifest
+	:type       index:  int
+	:param      entry:  The raw entry
+	:type       entry:  dict
+
+	:returns:   The validated entry
+	:rtype:     ManifestEntry
+	"""
+	unknown = sorted(set(entry) - set(ENTRY_KEYS))
+	if unknown:
+		raise ValueError(f"Unknown keys: {', '.join(unknown)}.")
+
+	name = entry.get('name')
+	if not isinstance(name, str):
+		raise ValueError("Missing or invalid 'name'.")
+
+	cpp_standard = entry['cpp_standard']
+	if isinstance(cpp_standard, int) and not isinstance(cpp_standard, bool):
+		cpp_standard = str(cpp_standard)
+
+	cmake_version = entry['cmake_version']
+	if not isinstance(cpp_standard, str) or not isinstance(cmake_version, str):
+		raise ValueError("'cpp_standard' and 'cmake_version' must be strings.")
+
+	tools = entry['tools']
+	if not isinstance(tools, list) or not all(isinstance(tool, str) for tool in tools):
+		raise ValueError("'tools' must be a list of strings.")
+
+	options = {key: value for key, value in entry.items() if key in PROJECT_DEFAULTS}
+	validate_project(name, cpp_standard, cmake_version, tools, SUPPORTED_TOOLS, options, PROJECT_DEFAULTS, PROJECT_CHOICES)
+
+	return ManifestEntry(index, name, cpp_standard, cmake_version, tools, options)
+
+
+def validate_manifest(entries: List[dict]) -> Tuple[List[ManifestEntry], List[ManifestError]]:
+	"""
+	Validates every manifest entry up front, without touching the disk.
+
+	Invalid entries are reported instead of raising, so one bad entry does
+	not prevent the rest of the batch from being generated.
+
+	:param      entries:  The raw entries
+	:type       entries:  list
+
+	:returns:   The valid entries and the errors
+	:rtype:     tuple
+	"""
+	valid = []
+	errors = []
+	seen = set()
+
+	for index, entry in enumerate(entries):
+		name = str(entry.get('name', f'#{index}'))
+
+		try:
+			parsed = _parse_entry(index, entry)
+		except ValueError as error:
+			errors.append(ManifestError(index, name, str(error)))
+			continue
+
+		if parsed.name in seen:
+			errors.append(ManifestError(index, name, "Duplicate project name."))
+			continue
+
+		seen.add(parsed.name)
+		valid.append(parsed)
+
+	return valid, errors
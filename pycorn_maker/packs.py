@@ -0,0 +1,359 @@
+import hashlib
+import json
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, NamedTuple, Optional
+
+
+INDEX_VERSION = 1
+INDEX_FILE_NAME = 'templates-index.json'
+# Directories of a pack that are never templates
+IGNORED_DIRS = {'.git', '.hg', '.svn', '__pycache__'}
+
+
+class PackFile(NamedTuple):
+	"""
+	One indexed file of a template pack. Size and mtime tell whether the
+	file changed without reading it; the hash is only recomputed then.
+	"""
+
+	size: int
+	mtime_ns: int
+	sha256: str
+
+
+def packs_dir() -> Path:
+	"""
+	Gets the directory holding the template packs: $CORN_TEMPLATES_DIR, then
+	$XDG_CONFIG_HOME/corn/templates, then ~/.config/corn/templates.
+
+	:returns:   The packs directory
+	:rtype:     Path
+	"""
+	if os.environ.get('CORN_TEMPLATES_DIR'):
+		return Path(os.environ['CORN_TEMPLATES_DIR'])
+
+	if os.environ.get('XDG_CONFIG_HOME'):
+		return Path(os.environ['XDG_CONFIG_HOME']) / 'corn' / 'templates'
+
+	return Path.home() / '.config' / 'corn' / 'templates'
+
+
+def index_path() -> Path:
+	"""
+	Gets the path of the pack index: $XDG_CACHE_HOME/corn or ~/.cache/corn.
+
+	:returns:   The index path
+	:rtype:     Path
+	"""
+	cache_home = Path(os.environ['XDG_CACHE_HOME']) if os.environ.get('XDG_CACHE_HOME') else Path.home() / '.cache'
+
+	return cache_home / 'corn' / INDEX_FILE_NAME
+
+
+def file_sha256(path: Path) -> str:
+	"""
+	Hashes a file.
+
+	:param      path:  The path
+	:type       path:  Path
+
+	:returns:   The hex digest
+	:rtype:     str
+	"""
+	with open(path, 'rb') as pack_file:
+		return hashlib.sha256(pack_file.read()).hexdigest()
+
+
+class TemplatePack:
+	"""
+	A directory of templates laid out like a generated project. A file
+	replaces the built-in template with the same destination, any other file
+	is added to the project. Files are rendered with the same placeholders as
+	the built-in templates and are only read when rendered.
+	"""
+
+	def __init__(self, name: str, root: Path, files: Dict[str, PackFile]):
+		"""
+		Constructs a new instance.
+
+		:param      name:   The pack name
+		:type       name:   str
+		:param      root:   The pack directory
+		:type       root:   Path
+		:param      files:  The indexed files, by path relative to the root
+		:type       files:  dict
+		"""
+		self.name = name
+		self.root = root
+		self.files = files
+
+	@property
+	def digest(self) -> str:
+		"""
+		A hash of the whole pack, which changes whenever any file does.
+
+		:returns:   The hex digest
+		:rtype:     str
+		"""
+		pack_hash = hashlib.sha256()
+
+		for path in sorted(self.files):
+			pack_hash.update(f'{path}\0{self.files[path].sha256}\n'.encode('utf-8'))
+
+		return pack_hash.hexdigest()
+
+	def destinations(self) -> List[PurePosixPath]:
+		"""
+		Lists the project paths the pack provides.
+
+		:returns:   The paths, relative to the project root
+		:rtype:     list
+		"""
+		return [PurePosixPath(path) for path in sorted(self.files)]
+
+	def source(self, destination: PurePosixPath) -> Optional[str]:
+		"""
+		Reads the template for a project path.
+
+		:param      destination:  The path, relative to the project root
+		:type       destination:  PurePosixPath
+
+		:returns:   The template source, or None if the pack has no such file
+		:rtype:     str
+		"""
+		relative = destination.as_posix()
+
+		if relative not in self.files:
+			return None
+
+		return _read_source(self.root / relative, self.files[relative].sha256)
+
+
+@lru_cache(maxsize=None)
+def _read_source(path: Path, sha256: str) -> str:
+	"""
+	Reads a pack file once per process; the hash keys the cache, so an
+	updated file is read again.
+
+	:param      path:    The path
+	:type       path:    Path
+	:param      sha256:  The indexed hash of the file
+	:type       sha256:  str
+
+	:returns:   The template source
+	:rtype:     str
+	"""
+	return path.read_text(encoding='utf-8')
+
+
+class PackIndex:
+	"""
+	The on-disk index of the template packs. Checking that a pack is current
+	only stats its directories and files; files are hashed again only when
+	their size or mtime changed, and never read otherwise.
+	"""
+
+	def __init__(self, root: Path = None, path: Path = None):
+		"""
+		Constructs a new instance.
+
+		:param      root:  The packs directory, see packs_dir()
+		:type       root:  Path
+		:param      path:  The index file, see index_path()
+		:type       path:  Path
+		"""
+		self.root = Path(root) if root else packs_dir()
+		self.path = Path(path) if path else index_path()
+		self.packs = self._load()
+		self.changed = False
+
+	def _load(self) -> dict:
+		"""
+		Reads the index file, discarding it when it is for another packs
+		directory or format.
+
+		:returns:   The indexed packs
+		:rtype:     dict
+		"""
+		try:
+			with open(self.path, 'r', encoding='utf-8') as index_file:
+				document = json.load(index_file)
+		except (OSError, ValueError):
+			return {}
+
+		if document.get('version') != INDEX_VERSION or document.get('root') != str(self.root):
+			return {}
+
+		return document.get('packs', {})
+
+	def save(self):
+		"""
+		Writes the index if a pack was rescanned. The file is replaced
+		atomically, so concurrent invocations never read half of it.
+		"""
+		if not self.changed:
+			return
+
+		self.path.parent.mkdir(parents=True, exist_ok=True)
+		document = {'version': INDEX_VERSION, 'root': str(self.root), 'packs': self.packs}
+		fd, temp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f'.{self.path.name}.', suffix='.tmp')
+
+		try:
+			with os.fdopen(fd, 'w', encoding='utf-8') as temp_file:
+				json.dump(document, temp_file)
+
+			os.replace(temp_path, self.path)
+		except BaseException:
+			os.unlink(temp_path)
+			raise
+
+		self.changed = False
+
+	def names(self) -> List[str]:
+		"""
+		Lists the available packs without looking inside them.
+
+		:returns:   The pack names
+		:rtype:     list
+		"""
+		if not self.root.is_dir():
+			return []
+
+		return sorted(entry.name for entry in os.scandir(self.root) if entry.is_dir() and not entry.name.startswith('.'))
+
+	def _is_current(self, entry: dict) -> bool:
+		"""
+		Checks an indexed pack against the disk with stat calls only.
+		Directory mtimes catch added, removed and renamed files; file sizes
+		and mtimes catch edits.
+
+		:param      entry:  The indexed pack
+		:type       entry:  dict
+
+		:returns:   True if nothing changed
+		:rtype:     bool
+		"""
+		pack_root = self.root / entry['name']
+
+		try:
+			for directory, mtime_ns in entry['dirs'].items():
+				if os.stat(pack_root / directory).st_mtime_ns != mtime_ns:
+					return False
+
+			for path, (size, mtime_ns, _) in entry['files'].items():
+				stat = os.stat(pack_root / path)
+
+				if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+					return False
+		except OSError:
+			return False
+
+		return True
+
+	def _scan(self, name: str, previous: Dict[str, list]) -> dict:
+		"""
+		Walks a pack directory, reusing the hashes of unchanged files.
+
+		:param      name:      The pack name
+		:type       name:      str
+		:param      previous:  The previously indexed files
+		:type       previous:  dict
+
+		:returns:   The index entry of the pack
+		:rtype:     dict
+		"""
+		pack_root = self.root / name
+		dirs = {}
+		files = {}
+
+		for directory, subdirs, names in os.walk(pack_root):
+			subdirs[:] = sorted(subdir for subdir in subdirs if subdir not in IGNORED_DIRS)
+			relative_dir = Path(directory).relative_to(pack_root).as_posix()
+			dirs[relative_dir] = os.stat(directory).st_mtime_ns
+
+			for file_name in names:
+				path = Path(directory) / file_name
+				relative = path.relative_to(pack_root).as_posix()
+				stat = os.stat(path)
+				known = previous.get(relative)
+
+				if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+					sha256 = known[2]
+				else:
+					sha256 = file_sha256(path)
+
+				files[relative] = [stat.st_size, stat.st_mtime_ns, sha256]
+
+		return {'name': name, 'dirs': dirs, 'files': files}
+
+	def get(self, name: str) -> TemplatePack:
+		"""
+		Gets a pack, rescanning it only if it changed since it was indexed.
+
+		:param      name:  The pack name
+		:type       name:  str
+
+		:returns:   The pack
+		:rtype:     TemplatePack
+
+		:raises     ValueError:  If there is no such pack
+		"""
+		if not (self.root / name).is_dir() or name.startswith('.'):
+			available = ', '.join(self.names()) or 'none'
+			raise ValueError(f"Unknown template pack '{name}' in '{self.root}'. Available packs: {available}.")
+
+		entry = self.packs.get(name)
+
+		if entry is None or not self._is_current(entry):
+			entry = self._scan(name, entry['files'] if entry else {})
+			self.packs[name] = entry
+			self.changed = True
+
+		files = {path: PackFile(*record) for path, record in entry['files'].items()}
+
+		return TemplatePack(name, self.root / name, files)
+
+
+def load_pack(name: str) -> TemplatePack:
+	"""
+	Loads one pack through the on-disk index, updating the index if needed.
+
+	:param      name:  The pack name
+	:type       name:  str
+
+	:returns:   The pack
+	:rtype:     TemplatePack
+
+	:raises     ValueError:  If there is no such pack
+	"""
+	index = PackIndex()
+	pack = index.get(name)
+
+	try:
+		index.save()
+	except OSError:
+		# A read-only cache only costs a rescan next time
+		pass
+
+	return pack
+
+
+def list_packs() -> List[TemplatePack]:
+	"""
+	Loads all packs through the on-disk index.
+
+	:returns:   The packs, by name
+	:rtype:     list
+	"""
+	index = PackIndex()
+	packs = [index.get(name) for name in index.names()]
+
+	try:
+		index.save()
+	except OSError:
+		pass
+
+	return packs
@@ -0,0 +1,138 @@
+import time
+from pathlib import PurePosixPath
+from typing import Dict, Iterable, List, NamedTuple
+from pycorn_maker.sinks import Sink
+
+
+class FileTiming(NamedTuple):
+	"""
+	Where the time of one generated file went.
+	"""
+
+	path: str
+	render_seconds: float
+	write_seconds: float
+	bytes: int
+
+
+class GenerationProfile(NamedTuple):
+	"""
+	Where the time of generating one project went.
+	"""
+
+	phases: Dict[str, float]
+	files: List[FileTiming]
+
+	@property
+	def total_seconds(self) -> float:
+		return sum(self.phases.values())
+
+	@property
+	def bytes(self) -> int:
+		return sum(timing.bytes for timing in self.files)
+
+	def slowest_files(self, limit: int = 0) -> List[FileTiming]:
+		"""
+		Sorts the files by render plus write time, slowest first.
+
+		:param      limit:  The number of files to keep, 0 for all
+		:type       limit:  int
+
+		:returns:   The files
+		:rtype:     list
+		"""
+		ranked = sorted(self.files, key=lambda timing: (-(timing.render_seconds + timing.write_seconds), timing.path))
+
+		return ranked[:limit] if limit else ranked
+
+	def as_dict(self) -> dict:
+		"""
+		Converts the profile to plain data for JSON output.
+
+		:returns:   The profile
+		:rtype:     dict
+		"""
+		return {
+			'total_seconds': self.total_seconds,
+			'bytes': self.bytes,
+			'phases': dict(self.phases),
+			'files': [timing._asdict() for timing in self.files],
+		}
+
+
+class ProfilingSink(Sink):
+	"""
+	Wraps a sink and times everything passing through it.
+
+	Projects render lazily, one file per sink write, so the time between the
+	end of one write and the start of the next is the render time of the
+	next file (including hashing it for the lock file).
+	"""
+
+	def __init__(self, sink: Sink):
+		"""
+		Constructs a new instance.
+
+		:param      sink:  The sink doing the actual output
+		:type       sink:  Sink
+		"""
+		self.sink = sink
+		self.phases = {'init': 0.0, 'directories': 0.0, 'render': 0.0, 'write': 0.0, 'close': 0.0}
+		self.files: List[FileTiming] = []
+		self._last = time.perf_counter()
+
+	def start(self, init_seconds: float = 0.0):
+		"""
+		Marks the start of the project write.
+
+		:param      init_seconds:  The time spent constructing the project
+		:type       init_seconds:  float
+		"""
+		self.phases['init'] = init_seconds
+		self._last = time.perf_counter()
+
+	def make_directories(self, directories: Iterable[PurePosixPath]):
+		start = time.perf_counter()
+		self.sink.make_directories(directories)
+		self._last = time.perf_counter()
+		self.phases['directories'] += self._last - start
+
+	def write(self, path: PurePosixPath, data: bytes):
+		self._timed(self.sink.write, path, data)
+
+	def write_shared(self, path: PurePosixPath, data: bytes):
+		self._timed(self.sink.write_shared, path, data)
+
+	def _timed(self, write, path: PurePosixPath, data: bytes):
+		"""
+		Times one write of the wrapped sink.
+
+		:param      write:  The sink method
+		:type       write:  callable
+		:param      path:   The path, relative to the project root
+		:type       path:   PurePosixPath
+		:param      data:   The content
+		:type       data:   bytes
+		"""
+		start = time.perf_counter()
+		write(path, data)
+		end = time.perf_counter()
+		timing = FileTiming(path.as_posix(), start - self._last, end - start, len(data))
+		self.files.append(timing)
+		self.phases['render'] += timing.render_seconds
+		self.phases['write'] += timing.write_seconds
+		self._last = end
+
+	def close(self):
+		start = time.perf_counter()
+		self.sink.close()
+		self.phases['close'] += time.perf_counter() - start
+
+	def profile(self) -> GenerationProfile:
+		"""
+		Gets the timings recorded so far.
+
+		:returns:   The profile
+		:rtype:     GenerationProfile
+		"""
+		return GenerationProfile(dict(self.phases), list(self.files))
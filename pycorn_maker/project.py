@@ -1,10 +1,109 @@
-import os
-from pathlib import Path
-from pycorn_maker.templates import TEMPLATES
-from pycorn_maker.cmake_modules import CMAKE_MODULES
-from pycorn_maker.utils import create_directory
-from pycorn_maker.validators import validate_project_name
-from pycorn_maker.tools import Tools
+import re
+from pathlib import Path, PurePosixPath
+from functools import lru_cache
+from itertools import chain
+from typing import Iterable, Iterator, List, Optional, Tuple
+from pycorn_maker.templates import TEMPLATES, TOOL_PRESETS, TOOL_TEMPLATES
+from pycorn_maker.cmake_modules import CMAKE_MODULES, TOOL_MODULES
+from pycorn_maker.config import PROJECT_CHOICES, PROJECT_DEFAULTS
+from pycorn_maker.engine import Template, compile_template, render_template
+from pycorn_maker.lockfile import LOCK_FILE_NAME, LockFile, UpdateReport, content_hash, file_hash
+from pycorn_maker.packs import load_pack
+from pycorn_maker.sinks import DiskSink, Sink, StoreSink
+from pycorn_maker.sources import DEFAULT_SOURCES, DEFAULT_TEST_SOURCES, test_template
+from pycorn_maker.validators import validate_project, validate_test_framework
+from pycorn_maker.tools import Tools, SUPPORTED_TOOLS
+
+
+def cmake_list(items: List[str]) -> str:
+	"""
+	Formats the items of a multi-line set() in cmake/sources.cmake.
+
+	:param      items:  The items
+	:type       items:  list
+
+	:returns:   One indented line per item
+	:rtype:     str
+	"""
+	return ''.join(f'    {item}\n' for item in items)
+
+
+def cmake_bool(value: bool) -> str:
+	"""
+	Formats a boolean for a CMake option() default.
+
+	:param      value:  The value
+	:type       value:  bool
+
+	:returns:   ON or OFF
+	:rtype:     str
+	"""
+	return 'ON' if value else 'OFF'
+
+
+def package_name(project_name: str) -> str:
+	"""
+	Converts a project name to a package name as vcpkg accepts it:
+	lowercase letters, digits and dashes.
+
+	:param      project_name:  The project name
+	:type       project_name:  str
+
+	:returns:   The package name
+	:rtype:     str
+	"""
+	return re.sub(r'[^a-z0-9]+', '-', project_name.lower()).strip('-') or 'project'
+
+
+def detect_test_framework(cpp_standard: str) -> str:
+	"""
+	Resolves the auto test framework: doctest when the project can use it
+	without network access, otherwise none.
+
+	:param      cpp_standard:  The cpp standard
+	:type       cpp_standard:  str
+
+	:returns:   The test framework
+	:rtype:     str
+	"""
+	from pycorn_maker.deps import test_framework_available
+
+	try:
+		validate_test_framework('doctest', cpp_standard)
+	except ValueError:
+		return 'none'
+
+	return 'doctest' if test_framework_available('doctest') else 'none'
+
+
+def setup_tests_args(test_framework: str, optional: bool) -> str:
+	"""
+	Formats the arguments of corn_setup_tests() in test/CMakeLists.txt.
+
+	:param      test_framework:  The test framework
+	:type       test_framework:  str
+	:param      optional:        Whether a missing framework only disables the tests
+	:type       optional:        bool
+
+	:returns:   The arguments
+	:rtype:     str
+	"""
+	return f'{test_framework} OPTIONAL' if optional and test_framework != 'none' else test_framework
+
+
+@lru_cache(maxsize=None)
+def invariant_content(template: Template) -> bytes:
+	"""
+	Encodes a template without placeholders. Parsed templates are cached, so
+	every project of a batch gets the same bytes object.
+
+	:param      template:  The parsed template
+	:type       template:  Template
+
+	:returns:   The content
+	:rtype:     bytes
+	"""
+	return template.render({}).encode('utf-8')
 
 
 class Project:
@@ -12,9 +111,11 @@ class Project:
 	This class describes a project.
 	"""
 
-	def __init__(self, project_name: str, cpp_standard: str, cmake_version: str, tools: list):
+	def __init__(self, project_name: str, cpp_standard: str, cmake_version: str, tools: list, output_dir: Path = Path('.'),
+				sources: Optional[List[str]] = None, test_sources: Optional[List[str]] = None, **options):
 		"""
-		Constructs a new instance.
+		Constructs a new instance. Nothing is written until the project is
+		rendered into a sink.
 
 		:param      project_name:   The project name
 		:type       project_name:   str
@@ -24,78 +125,380 @@ class Project:
 		:type       cmake_version:  str
 		:param      tools:          The tools
 		:type       tools:          list
+		:param      output_dir:     The directory the project is created in
+		:type       output_dir:     Path
+		:param      sources:        The library sources listed in cmake/sources.cmake
+		:type       sources:        list
+		:param      test_sources:   The test sources listed in cmake/sources.cmake
+		:type       test_sources:   list
+		:param      options:        Optional settings, see config.PROJECT_DEFAULTS
+		:type       options:        dict
 		"""
-		validate_project_name(project_name)
+		validate_project(project_name, cpp_standard, cmake_version, tools, SUPPORTED_TOOLS, options, PROJECT_DEFAULTS, PROJECT_CHOICES)
 		self.project_name = project_name
 		self.cpp_standard = cpp_standard
 		self.cmake_version = cmake_version
 		self.tools = Tools(tools)
-		self.base_dir = Path(project_name)
-		self.cmake_dir = self.base_dir / 'cmake'
-		self.src_dir = self.base_dir / 'src'
-		self.test_dir = self.base_dir / 'tests'
+		settings = dict(PROJECT_DEFAULTS, **options)
+
+		# The lock file records what auto picked, so updates do not switch frameworks
+		if settings['test_framework'] == 'auto':
+			settings['test_framework'] = detect_test_framework(cpp_standard)
+			settings['test_framework_optional'] = settings['test_framework'] != 'none'
+
+		self.layout = settings['layout']
+		self.test_framework = settings['test_framework']
+		self.pack = load_pack(settings['pack']) if settings['pack'] else None
+		self.sources = list(DEFAULT_SOURCES if sources is None else sources)
+
+		self.test_sources = list(DEFAULT_TEST_SOURCES if test_sources is None else test_sources)
+		self.options = {
+			'project_name': project_name,
+			'cpp_standard': cpp_standard,
+			'cmake_version': cmake_version,
+			'tools': list(tools),
+			'sources': self.sources,
+			'test_sources': self.test_sources,
+			**settings,
+		}
+		self.context = {
+			'project_name': project_name,
+			'cpp_standard': cpp_standard,
+			'cmake_version': cmake_version,
+			'compiler_cache': ';'.join(self.tools.compiler_caches),
+			'unity_build': cmake_bool(settings['unity_build']),
+			'unity_batch_size': str(settings['unity_batch_size']),
+			'pch': cmake_bool(settings['pch']),
+			'linker': settings['linker'],
+			'opt_profile': settings['opt_profile'],
+			'test_framework': self.test_framework,
+			'test_framework_args': setup_tests_args(self.test_framework, settings['test_framework_optional']),
+			'sources': cmake_list(self.sources),
+			'test_sources': cmake_list(self.test_sources),
+			'package_name': package_name(project_name),
+			'tool_configure_presets': ''.join(TOOL_PRESETS[tool][0] for tool in TOOL_PRESETS if tool in tools),
+			'tool_build_presets': ''.join(TOOL_PRESETS[tool][1] for tool in TOOL_PRESETS if tool in tools),
+		}
+		self.files_created = []
+		self.base_dir = Path(output_dir) / project_name
+		self.cmake_dir = PurePosixPath('cmake')
+		self.src_dir = PurePosixPath('src')
+		self.test_dir = PurePosixPath('test')
 		self.modules_dir = self.cmake_dir / 'modules'
-		self.include_dir = self.base_dir / 'include'
+		self.include_dir = PurePosixPath('include')
+		self.tools_dir = PurePosixPath('tools')
 
-		create_directory(self.base_dir)
-		create_directory(self.cmake_dir)
-		create_directory(self.src_dir)
-		create_directory(self.modules_dir)
-		create_directory(self.test_dir)
-		create_directory(self.include_dir)
+		if self.pack:
+			self._check_pack()
 
-	def create_files(self):
+	def _check_pack(self):
 		"""
-		Creates files.
+		Checks that every template of the pack only uses known placeholders,
+		so a broken pack fails before anything is written.
+
+		:raises     ValueError:  If a template uses an unknown placeholder
 		"""
-		self._create_library_or_executable()
+		for destination in self.pack.destinations():
+			template_name = f'{self.pack.name}:{destination}'
+			missing = compile_template(self.pack.source(destination), template_name).placeholders.difference(self.context)
 
-		self.tools.configure_tools(self.base_dir)
+			if missing:
+				raise ValueError(f"Unknown template keys in '{template_name}': {', '.join(sorted(missing))}")
 
-	def _create_basic_templates(self):
+	def directories(self) -> List[PurePosixPath]:
 		"""
-		Creates basic templates.
+		Gets the project directories, relative to the project root.
+
+		:returns:   The directories
+		:rtype:     list
 		"""
-		self._copy_template('CMakeLists.txt', self.base_dir / 'CMakeLists.txt')
-		self._copy_template('README.md', self.base_dir / 'README.md')
-		self._copy_template('BUILDING.md', self.base_dir / 'BUILDING.md')
-		self._copy_template('CMakePresets.json', self.base_dir / 'CMakePresets.json')
-		self._copy_template('CMakeUserPresets.json', self.base_dir / 'CMakeUserPresets.json')
-		self._copy_template('.clang-format', self.base_dir / '.clang-format')
-		self._copy_template('.clang-tidy', self.base_dir / '.clang-tidy')
-		self._copy_template('build.sh', self.base_dir / 'build.sh')
-		self._copy_template('format-code.py', self.base_dir / 'format-code.py')
+		return [
+			PurePosixPath('.'),
+			self.cmake_dir,
+			self.src_dir,
+			self.modules_dir,
+			self.test_dir,
+			self.include_dir,
+			self.tools_dir,
+		]
+
+	def _module_enabled(self, name: str) -> bool:
+		"""
+		Checks whether a CMake module is generated. Tool-specific modules are
+		only generated when one of their tools is selected.
+
+		:param      name:  The module name
+		:type       name:  str
+
+		:returns:   True if the module is generated
+		:rtype:     bool
+		"""
+		owners = [tool for tool, modules in TOOL_MODULES.items() if name in modules]
+
+		return not owners or any(tool in self.tools.tools for tool in owners)
+
+	def _templates(self) -> Iterator[Tuple[str, PurePosixPath, dict]]:
+		"""
+		Lists the templates to render: name, destination and template table.
+		"""
+		if self.layout == 'lib+app':
+			yield 'CMakeLists-lib+app.txt', PurePosixPath('CMakeLists.txt'), TEMPLATES
+		else:
+			yield 'CMakeLists.txt', PurePosixPath('CMakeLists.txt'), TEMPLATES
+
+		yield 'test-CMakeLists.txt', self.test_dir / 'CMakeLists.txt', TEMPLATES
+
+		for name in ('README.md', 'BUILDING.md', 'CMakePresets.json', 'CMakeUserPresets.json',
+					'.clang-format', '.clang-tidy', 'build.sh', 'format-code.py'):
+			yield name, PurePosixPath(name), TEMPLATES
+
+		yield 'sources.cmake', self.cmake_dir / 'sources.cmake', TEMPLATES
 
 		for name in CMAKE_MODULES.keys():
-			self._copy_template(name, self.modules_dir / name, templates=CMAKE_MODULES)
+			if self._module_enabled(name):
+				yield name, self.modules_dir / name, CMAKE_MODULES
 
-	def _create_library_or_executable(self):
+		for tool, templates in TOOL_TEMPLATES.items():
+			if tool in self.tools.tools:
+				for name, destination in templates:
+					yield name, PurePosixPath(destination), TEMPLATES
+
+	def _seed_templates(self) -> Iterator[Tuple[str, PurePosixPath]]:
 		"""
-		Creates a library or executable.
+		Lists the seed templates: name and destination.
 		"""
-		self._create_basic_templates()
-		self._copy_template('my_library.hpp', self.base_dir / 'include' / 'my_library.hpp')
-		self._copy_template('main.cpp', self.base_dir / 'src' / 'main.cpp')
+		yield 'my_library.hpp', self.include_dir / 'my_library.hpp'
+		yield 'main.cpp', self.src_dir / 'main.cpp'
+		yield 'my_library.cpp', self.src_dir / 'my_library.cpp'
+		yield 'pch.hpp', self.src_dir / 'pch.hpp'
+
+		test_seed = self.test_dir / 'my_library_test.cpp'
+
+		# Projects that dropped the example test from their sources do not get it back
+		if test_seed.as_posix() in self.test_sources:
+			yield test_template('my_library_test.cpp', self.test_framework), test_seed
 
-	def _copy_template(self, template_name: str, destination: Path, templates = TEMPLATES):
+	def _template_source(self, template_name: str, destination: PurePosixPath, templates: dict) -> Tuple[Optional[str], str]:
 		"""
-		Copy template
+		Gets the template for a destination: the template pack's file when the
+		pack has one, otherwise the built-in template.
 
-		:param      template_name:  The template name
+		:param      template_name:  The built-in template name
 		:type       template_name:  str
-		:param      destination:    The destination
-		:type       destination:    Path
+		:param      destination:    The path, relative to the project root
+		:type       destination:    PurePosixPath
+		:param      templates:      The built-in template table
+		:type       templates:      dict
+
+		:returns:   The template source, or None, and the name for error messages
+		:rtype:     tuple
+		"""
+		if self.pack:
+			template_content = self.pack.source(destination)
+
+			if template_content is not None:
+				return template_content, f'{self.pack.name}:{destination}'
+
+		return templates.get(template_name), template_name
+
+	def add_sources(self, sources: Iterable[str], test_sources: Iterable[str] = ()):
+		"""
+		Lists more library and test sources in cmake/sources.cmake.
+
+		:param      sources:       The source paths, relative to the project root
+		:type       sources:       iterable
+		:param      test_sources:  The test source paths, relative to the project root
+		:type       test_sources:  iterable
+		"""
+		for source in sources:
+			if source not in self.sources:
+				self.sources.append(source)
+
+		for source in test_sources:
+			if source not in self.test_sources:
+				self.test_sources.append(source)
+
+		self.context['sources'] = cmake_list(self.sources)
+		self.context['test_sources'] = cmake_list(self.test_sources)
+
+	def render(self) -> Iterator[Tuple[PurePosixPath, bytes]]:
+		"""
+		Renders the project lazily, without touching the disk.
+
+		:returns:   Pairs of path relative to the project root and content
+		:rtype:     iterator
+		"""
+		for destination, data, _ in self._render():
+			yield destination, data
+
+	def _render_template(self, source: str, name: str) -> Tuple[bytes, bool]:
+		"""
+		Renders one template. A template without placeholders renders the same
+		for every project, so it is encoded once per process.
+
+		:param      source:  The template source
+		:type       source:  str
+		:param      name:    The template name used in error messages
+		:type       name:    str
+
+		:returns:   The content and whether it is invariant
+		:rtype:     tuple
+		"""
+		template = compile_template(source, name)
+
+		if not template.placeholders:
+			return invariant_content(template), True
+
+		return template.render(self.context).encode('utf-8'), False
+
+	def _render(self) -> Iterator[Tuple[PurePosixPath, bytes, bool]]:
+		"""
+		Renders the project lazily, flagging the files whose content is the
+		same for every project.
+
+		:returns:   Path relative to the project root, content and invariance
+		:rtype:     iterator
+		"""
+		rendered = set()
+
+		for template_name, destination, templates in self._templates():
+			template_content, template_name = self._template_source(template_name, destination, templates)
+
+			if template_content:
+				rendered.add(destination)
+				yield (destination, *self._render_template(template_content, template_name))
+
+		for destination, content in self.tools.render():
+			rendered.add(destination)
+			template_content, template_name = self._template_source(None, destination, {})
+
+			if template_content:
+				yield (destination, *self._render_template(template_content, template_name))
+			else:
+				yield destination, content.encode('utf-8'), True
+
+		if self.pack:
+			seeds = {destination for _, destination in self._seed_templates()}
+
+			for destination in self.pack.destinations():
+				if destination not in rendered and destination not in seeds:
+					template_name = f'{self.pack.name}:{destination}'
+					yield (destination, *self._render_template(self.pack.source(destination), template_name))
+
+	def seeds(self) -> Iterator[Tuple[PurePosixPath, bytes]]:
 		"""
-		template_content = templates.get(template_name)
+		Renders the seed files: starter code that belongs to the user once it
+		exists. Seeds are only ever created, never updated, and are not
+		recorded in the lock file.
 
-		if template_content:
-			content = template_content.replace('{{project_name}}', self.project_name).replace('{{cpp_standard}}', self.cpp_standard).replace('{{cmake_version}}', self.cmake_version)
+		:returns:   Pairs of path relative to the project root and content
+		:rtype:     iterator
+		"""
+		for name, destination in self._seed_templates():
+			template_content, template_name = self._template_source(name, destination, TEMPLATES)
+			yield destination, render_template(template_content, self.context, template_name).encode('utf-8')
 
-			with open(destination, 'w', encoding='utf-8') as dest_file:
-				dest_file.write(content)
+	def write(self, sink: Sink):
+		"""
+		Renders the project into a sink, followed by its lock file.
 
-	def run(self):
+		:param      sink:  The sink
+		:type       sink:  Sink
+		"""
+		hashes = {}
+		sink.make_directories(self.directories())
+
+		for path, data, invariant in self._render():
+			if invariant:
+				sink.write_shared(path, data)
+			else:
+				sink.write(path, data)
+
+			hashes[path.as_posix()] = content_hash(data)
+			self.files_created.append(path)
+
+		# Seeds are edited by the user, so they are never shared
+		for path, data in self.seeds():
+			sink.write(path, data)
+			self.files_created.append(path)
+
+		sink.write(PurePosixPath(LOCK_FILE_NAME), LockFile(self.options, hashes).dumps())
+
+	def run(self, store: Optional[Path] = None, link_mode: str = 'auto'):
 		"""
 		Run project creation
+
+		:param      store:      A content-addressed store to link the invariant
+		                        files from, see StoreSink; None writes them
+		:type       store:      Path
+		:param      link_mode:  How to link from the store, see LINK_MODES
+		:type       link_mode:  str
+		"""
+		sink = StoreSink(self.base_dir, store, link_mode) if store else DiskSink(self.base_dir)
+
+		with sink:
+			self.write(sink)
+
+	def update(self, seeds: Iterable[Tuple[PurePosixPath, bytes]] = ()) -> UpdateReport:
 		"""
-		self.create_files()
+		Regenerates an existing project in place.
+
+		Only files whose rendered content changed are rewritten, so untouched
+		files keep their mtimes and do not trigger CMake reconfigures or
+		rebuilds. Files edited by the user since generation are reported and
+		left alone. Seed files are only created when they are missing.
+
+		:param      seeds:  Extra seed files, e.g. from `corn add-source`
+		:type       seeds:  iterable
+
+		:returns:   The update report
+		:rtype:     UpdateReport
+		"""
+		lock_path = self.base_dir / LOCK_FILE_NAME
+		previous_lock = LockFile.load(lock_path) if lock_path.exists() else LockFile({}, {})
+		report = UpdateReport([], [], [], [], [])
+		rendered = set()
+		hashes = {}
+
+		with DiskSink(self.base_dir) as sink:
+			sink.make_directories(self.directories())
+
+			for path, data in self.render():
+				relative = path.as_posix()
+				digest = content_hash(data)
+				on_disk = file_hash(self.base_dir / path)
+				locked = previous_lock.files.get(relative)
+				rendered.add(relative)
+				hashes[relative] = digest
+
+				if on_disk == digest:
+					report.unchanged.append(relative)
+					continue
+
+				if on_disk is None:
+					report.created.append(relative)
+				elif on_disk == locked:
+					report.updated.append(relative)
+				else:
+					report.modified.append(relative)
+
+					if locked is None:
+						del hashes[relative]
+					else:
+						hashes[relative] = locked
+
+					continue
+
+				sink.write(path, data)
+				self.files_created.append(path)
+
+			for path, data in chain(self.seeds(), seeds):
+				if not (self.base_dir / path).exists():
+					sink.write(path, data)
+					self.files_created.append(path)
+					report.created.append(path.as_posix())
+
+		report.stale.extend(sorted(set(previous_lock.files) - rendered))
+		LockFile(self.options, hashes).save(lock_path)
+
+		return report
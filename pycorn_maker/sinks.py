@@ -0,0 +1,392 @@
+import errno
+import hashlib
+import io
+import os
+import tempfile
+import time
+import uuid
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Dict, Iterable, Set, Tuple
+
+try:
+	import fcntl
+except ImportError:
+	# Windows: no reflinks
+	fcntl = None
+
+
+ARCHIVE_FORMATS = ('tar.gz', 'zip')
+# The Linux ioctl that clones a file's extents: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+LINK_MODES = ('auto', 'reflink', 'hardlink')
+# The methods StoreSink tries in order; a plain copy is the last resort
+LINK_METHODS = {
+	'auto': ('reflink', 'hardlink'),
+	'reflink': ('reflink',),
+	'hardlink': ('hardlink',),
+}
+
+# Blobs already in a store, shared by the sinks of one process. Invariant
+# files are the same bytes object in every project, so the lookup does not
+# even hash them again.
+_stored_blobs: Dict[Tuple[Path, bytes], Path] = {}
+# Link methods that failed for a store and output directory pair, so later
+# projects do not retry them for every file
+_failed_methods: Set[Tuple[Path, Path, str]] = set()
+
+
+def _read_umask() -> int:
+	"""
+	Reads the process umask, so atomically written files get the same
+	permissions as files created with open().
+
+	:returns:   The umask
+	:rtype:     int
+	"""
+	mask = os.umask(0)
+	os.umask(mask)
+
+	return mask
+
+
+# Read once at import: changing the umask is process-wide and would race
+# with the writer threads of `corn create-many --executor thread`.
+UMASK = _read_umask()
+
+
+class Sink:
+	"""
+	Base class for generator outputs.
+
+	A sink receives the project directories once, then every rendered file
+	as a relative path and its bytes. Sinks are context managers; leaving
+	the context closes them.
+	"""
+
+	def make_directories(self, directories: Iterable[PurePosixPath]):
+		"""
+		Creates the project directories.
+
+		:param      directories:  The directories, relative to the project root
+		:type       directories:  iterable
+		"""
+
+	def write(self, path: PurePosixPath, data: bytes):
+		"""
+		Writes one file.
+
+		:param      path:  The path, relative to the project root
+		:type       path:  PurePosixPath
+		:param      data:  The content
+		:type       data:  bytes
+		"""
+		raise NotImplementedError
+
+	def write_shared(self, path: PurePosixPath, data: bytes):
+		"""
+		Writes one file whose content is the same in every project, so a sink
+		may share it between projects. Writes it like any other file by
+		default.
+
+		:param      path:  The path, relative to the project root
+		:type       path:  PurePosixPath
+		:param      data:  The content
+		:type       data:  bytes
+		"""
+		self.write(path, data)
+
+	def close(self):
+		"""
+		Finishes the output.
+		"""
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+
+class DiskSink(Sink):
+	"""
+	Writes files to disk atomically: each file goes to a temporary file in
+	the target directory and is renamed over the destination, so readers
+	(and CMake) never see a half-written file.
+	"""
+
+	def __init__(self, root: Path):
+		"""
+		Constructs a new instance.
+
+		:param      root:  The project root
+		:type       root:  Path
+		"""
+		self.root = Path(root)
+		self._created = set()
+
+	def make_directories(self, directories: Iterable[PurePosixPath]):
+		# Parents sort before children, so each directory costs one mkdir.
+		for directory in sorted(set(directories), key=lambda directory: len(directory.parts)):
+			path = self.root / directory
+			path.mkdir(parents=True, exist_ok=True)
+			self._created.add(path)
+
+	def _destination(self, path: PurePosixPath) -> Path:
+		"""
+		Gets the absolute path of a file, creating its directory if needed.
+
+		:param      path:  The path, relative to the project root
+		:type       path:  PurePosixPath
+
+		:returns:   The absolute path
+		:rtype:     Path
+		"""
+		destination = self.root / path
+
+		if destination.parent not in self._created:
+			destination.parent.mkdir(parents=True, exist_ok=True)
+			self._created.add(destination.parent)
+
+		return destination
+
+	def write(self, path: PurePosixPath, data: bytes):
+		destination = self._destination(path)
+		fd, temp_path = tempfile.mkstemp(dir=destination.parent, prefix=f'.{destination.name}.', suffix='.tmp')
+
+		try:
+			with os.fdopen(fd, 'wb') as temp_file:
+				temp_file.write(data)
+
+			os.chmod(temp_path, 0o666 & ~UMASK)
+			os.replace(temp_path, destination)
+		except BaseException:
+			os.unlink(temp_path)
+			raise
+
+
+class StoreSink(DiskSink):
+	"""
+	A DiskSink for mass generation. Files that are the same in every project
+	are written once to a content-addressed store and materialized from it:
+	with a reflink (a copy-on-write clone) where the filesystem supports it,
+	else with a hardlink, else with a plain copy.
+
+	Hardlinked files share one inode with the store, so the store keeps them
+	read-only: an in-place edit fails instead of changing every project.
+	Editors that save by renaming, and `corn update`, replace the link.
+	"""
+
+	def __init__(self, root: Path, store: Path, link_mode: str = 'auto'):
+		"""
+		Constructs a new instance.
+
+		:param      root:       The project root
+		:type       root:       Path
+		:param      store:      The store directory, on the same filesystem as
+		                        root for reflinks and hardlinks
+		:type       store:      Path
+		:param      link_mode:  auto: reflink, hardlink or copy; reflink or
+		                        hardlink: that method or a copy
+		:type       link_mode:  str
+		"""
+		if link_mode not in LINK_MODES:
+			raise ValueError(f"Unsupported link mode '{link_mode}'. Use one of: {', '.join(LINK_MODES)}.")
+
+		super().__init__(root)
+		self.store = Path(store)
+		self.methods = LINK_METHODS[link_mode]
+		self.stats = {'reflink': 0, 'hardlink': 0, 'copy': 0}
+
+	def _blob(self, data: bytes) -> Path:
+		"""
+		Gets the store path of a content, writing it on first use.
+
+		:param      data:  The content
+		:type       data:  bytes
+
+		:returns:   The blob path
+		:rtype:     Path
+		"""
+		key = (self.store, data)
+		blob = _stored_blobs.get(key)
+
+		if blob is not None:
+			return blob
+
+		digest = hashlib.sha256(data).hexdigest()
+		blob = self.store / digest[:2] / digest
+
+		if not blob.exists():
+			blob.parent.mkdir(parents=True, exist_ok=True)
+			fd, temp_path = tempfile.mkstemp(dir=blob.parent, prefix=f'.{digest}.', suffix='.tmp')
+
+			try:
+				with os.fdopen(fd, 'wb') as temp_file:
+					temp_file.write(data)
+
+				os.chmod(temp_path, 0o444 & ~UMASK)
+				os.replace(temp_path, blob)
+			except BaseException:
+				os.unlink(temp_path)
+				raise
+
+		_stored_blobs[key] = blob
+
+		return blob
+
+	def _reflink(self, blob: Path, destination: Path) -> str:
+		"""
+		Clones a blob into a temporary file next to the destination.
+
+		:returns:   The temporary path
+		:rtype:     str
+
+		:raises     OSError:  If the filesystem cannot clone
+		"""
+		if fcntl is None:
+			raise OSError(errno.EOPNOTSUPP, 'reflinks need fcntl')
+
+		fd, temp_path = tempfile.mkstemp(dir=destination.parent, prefix=f'.{destination.name}.', suffix='.tmp')
+
+		try:
+			with open(blob, 'rb') as blob_file:
+				fcntl.ioctl(fd, FICLONE, blob_file.fileno())
+
+			os.chmod(temp_path, 0o666 & ~UMASK)
+		except BaseException:
+			os.close(fd)
+			os.unlink(temp_path)
+			raise
+
+		os.close(fd)
+
+		return temp_path
+
+	def _hardlink(self, blob: Path, destination: Path) -> str:
+		"""
+		Links a blob to a temporary name next to the destination.
+
+		:returns:   The temporary path
+		:rtype:     str
+
+		:raises     OSError:  If the filesystem cannot link the blob
+		"""
+		temp_path = str(destination.parent / f'.{destination.name}.{uuid.uuid4().hex}.tmp')
+		os.link(blob, temp_path)
+
+		return temp_path
+
+	def write_shared(self, path: PurePosixPath, data: bytes):
+		destination = self._destination(path)
+		blob = self._blob(data)
+
+		for method in self.methods:
+			failed_key = (self.store, self.root.parent, method)
+
+			if failed_key in _failed_methods:
+				continue
+
+			try:
+				temp_path = getattr(self, f'_{method}')(blob, destination)
+			except OSError as error:
+				# Too many links to this blob says nothing about the filesystem
+				if error.errno != errno.EMLINK:
+					_failed_methods.add(failed_key)
+
+				continue
+
+			os.replace(temp_path, destination)
+			self.stats[method] += 1
+			return
+
+		self.write(path, data)
+		self.stats['copy'] += 1
+
+
+class MemorySink(Sink):
+	"""
+	Keeps the rendered project in memory, mainly for tests and previews.
+	"""
+
+	def __init__(self):
+		self.directories = set()
+		self.files: Dict[PurePosixPath, bytes] = {}
+
+	def make_directories(self, directories: Iterable[PurePosixPath]):
+		self.directories.update(directories)
+
+	def write(self, path: PurePosixPath, data: bytes):
+		self.files[path] = data
+
+
+class ArchiveSink(Sink):
+	"""
+	Streams the project into a tar.gz or zip archive. The output does not
+	need to be seekable, so it can be a pipe such as stdout.
+	"""
+
+	def __init__(self, fileobj: BinaryIO, archive_format: str, prefix: str):
+		"""
+		Constructs a new instance.
+
+		:param      fileobj:         The binary output stream
+		:type       fileobj:         BinaryIO
+		:param      archive_format:  The archive format: tar.gz or zip
+		:type       archive_format:  str
+		:param      prefix:          The top-level directory inside the archive
+		:type       prefix:          str
+		"""
+		if archive_format not in ARCHIVE_FORMATS:
+			raise ValueError(f"Unsupported archive format '{archive_format}'. Use one of: {', '.join(ARCHIVE_FORMATS)}.")
+
+		# Imported here, so creating a project on disk does not load them
+		import tarfile
+		import zipfile
+
+		self.archive_format = archive_format
+		self.prefix = PurePosixPath(prefix)
+		self.mtime = time.time()
+
+		if archive_format == 'zip':
+			self._archive = zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED)
+		else:
+			self._archive = tarfile.open(fileobj=fileobj, mode='w|gz')
+
+	def make_directories(self, directories: Iterable[PurePosixPath]):
+		import tarfile
+		import zipfile
+
+		for directory in sorted(set(directories)):
+			name = (self.prefix / directory).as_posix() + '/'
+
+			if self.archive_format == 'zip':
+				info = zipfile.ZipInfo(name, time.localtime(self.mtime)[:6])
+				info.external_attr = (0o40755 << 16) | 0x10
+				self._archive.writestr(info, b'')
+			else:
+				info = tarfile.TarInfo(name)
+				info.type = tarfile.DIRTYPE
+				info.mode = 0o755
+				info.mtime = self.mtime
+				self._archive.addfile(info)
+
+	def write(self, path: PurePosixPath, data: bytes):
+		import tarfile
+		import zipfile
+
+		name = (self.prefix / path).as_posix()
+
+		if self.archive_format == 'zip':
+			info = zipfile.ZipInfo(name, time.localtime(self.mtime)[:6])
+			info.external_attr = 0o644 << 16
+			info.compress_type = zipfile.ZIP_DEFLATED
+			self._archive.writestr(info, data)
+		else:
+			info = tarfile.TarInfo(name)
+			info.size = len(data)
+			info.mode = 0o644
+			info.mtime = self.mtime
+			self._archive.addfile(info, io.BytesIO(data))
+
+	def close(self):
+		self._archive.close()
@@ -0,0 +1,162 @@
+import re
+from pathlib import PurePosixPath
+from typing import List, Tuple
+from pycorn_maker.engine import render_template
+from pycorn_maker.templates import TEMPLATES
+from pycorn_maker.validators import validate_class_name, validate_source_name
+
+
+SOURCE_DIR = PurePosixPath('src')
+INCLUDE_DIR = PurePosixPath('include')
+TEST_DIR = PurePosixPath('test')
+SOURCE_SUFFIX = '.cpp'
+HEADER_SUFFIX = '.hpp'
+
+# The library sources listed in cmake/sources.cmake of a new project.
+# src/main.cpp is not listed: it belongs to the executable only.
+DEFAULT_SOURCES = ('src/my_library.cpp',)
+# The test sources of a new project, one test executable each
+DEFAULT_TEST_SOURCES = ('test/my_library_test.cpp',)
+
+
+def test_template(name: str, test_framework: str) -> str:
+	"""
+	Gets the template of a test source for a test framework, e.g.
+	test-doctest.cpp for test.cpp. Without a framework, tests are plain
+	programs whose exit code is the result.
+
+	:param      name:            The template name for test framework none
+	:type       name:            str
+	:param      test_framework:  The test framework, see config.PROJECT_CHOICES
+	:type       test_framework:  str
+
+	:returns:   The template name
+	:rtype:     str
+	"""
+	if test_framework == 'none':
+		return name
+
+	stem, suffix = name.rsplit('.', 1)
+
+	return f'{stem}-{test_framework}.{suffix}'
+
+
+def source_pair(name: str) -> Tuple[PurePosixPath, PurePosixPath]:
+	"""
+	Gets the source and header paths for a source name such as `net/socket`.
+
+	:param      name:  The name, relative to src/, with or without a suffix
+	:type       name:  str
+
+	:returns:   The source and header paths, relative to the project root
+	:rtype:     tuple
+	"""
+	validate_source_name(name)
+	relative = PurePosixPath(name)
+
+	if relative.parts[0] == SOURCE_DIR.name:
+		relative = PurePosixPath(*relative.parts[1:])
+
+	if relative.suffix in (SOURCE_SUFFIX, HEADER_SUFFIX):
+		relative = relative.with_suffix('')
+
+	return SOURCE_DIR / f'{relative}{SOURCE_SUFFIX}', INCLUDE_DIR / f'{relative}{HEADER_SUFFIX}'
+
+
+def class_file_name(class_name: str) -> str:
+	"""
+	Converts a class name to the snake_case file name used by the project.
+
+	:param      class_name:  The class name, e.g. HttpClient
+	:type       class_name:  str
+
+	:returns:   The file name without a suffix, e.g. http_client
+	:rtype:     str
+	"""
+	name = re.sub(r'([A-Z]+)([A-Z][a-z])', r'\1_\2', class_name)
+
+	return re.sub(r'([a-z0-9])([A-Z])', r'\1_\2', name).lower()
+
+
+def _render_pair(project_name: str, name: str, kind: str, class_name: str = '') -> List[Tuple[PurePosixPath, bytes]]:
+	"""
+	Renders the seed files of a new source/header pair.
+
+	:param      project_name:  The project name
+	:type       project_name:  str
+	:param      name:          The source name
+	:type       name:          str
+	:param      kind:          The template prefix: source or class
+	:type       kind:          str
+	:param      class_name:    The class name, for class templates
+	:type       class_name:    str
+
+	:returns:   Pairs of path relative to the project root and content
+	:rtype:     list
+	"""
+	source, header = source_pair(name)
+	context = {
+		'project_name': project_name,
+		'class_name': class_name,
+		'header': header.relative_to(INCLUDE_DIR).as_posix(),
+	}
+
+	return [
+		(header, render_template(TEMPLATES[f'{kind}.hpp'], context, f'{kind}.hpp').encode('utf-8')),
+		(source, render_template(TEMPLATES[f'{kind}.cpp'], context, f'{kind}.cpp').encode('utf-8')),
+	]
+
+
+def render_source(project_name: str, name: str) -> List[Tuple[PurePosixPath, bytes]]:
+	"""
+	Renders an empty source file and its header.
+
+	:param      project_name:  The project name
+	:type       project_name:  str
+	:param      name:          The source name, e.g. net/socket
+	:type       name:          str
+
+	:returns:   Pairs of path relative to the project root and content
+	:rtype:     list
+	"""
+	return _render_pair(project_name, name, 'source')
+
+
+def render_class(project_name: str, class_name: str) -> List[Tuple[PurePosixPath, bytes]]:
+	"""
+	Renders a class declaration and its definition.
+
+	:param      project_name:  The project name
+	:type       project_name:  str
+	:param      class_name:    The class name
+	:type       class_name:    str
+
+	:returns:   Pairs of path relative to the project root and content
+	:rtype:     list
+	"""
+	validate_class_name(class_name)
+
+	return _render_pair(project_name, class_file_name(class_name), 'class', class_name)
+
+
+def render_module(project_name: str, name: str, test_framework: str = 'none') -> List[Tuple[PurePosixPath, bytes]]:
+	"""
+	Renders a library module: an empty source file, its header and a test.
+
+	:param      project_name:    The project name
+	:type       project_name:    str
+	:param      name:            The module name, e.g. net/socket
+	:type       name:            str
+	:param      test_framework:  The test framework of the project
+	:type       test_framework:  str
+
+	:returns:   Pairs of path relative to the project root and content
+	:rtype:     list
+	"""
+	seeds = _render_pair(project_name, name, 'source')
+	source, header = source_pair(name)
+	test = TEST_DIR / source.relative_to(SOURCE_DIR).with_name(f'{source.stem}_test{SOURCE_SUFFIX}')
+	context = {'header': header.relative_to(INCLUDE_DIR).as_posix()}
+	template_name = test_template('test.cpp', test_framework)
+
+	return seeds + [(test, render_template(TEMPLATES[template_name], context, template_name).encode('utf-8'))]
@@ -4,18 +4,32 @@ include(cmake/modules/prelude.cmake)
 
 project({{project_name}} LANGUAGES CXX)
 
+if(NOT CMAKE_BUILD_TYPE AND NOT CMAKE_CONFIGURATION_TYPES)
+  set(CMAKE_BUILD_TYPE RelWithDebInfo CACHE STRING "Build type" FORCE)
+endif()
+
 include(cmake/modules/project-is-top-level.cmake)
 include(cmake/modules/variables.cmake)
+include(cmake/modules/compiler-cache.cmake OPTIONAL)
+include(cmake/modules/unity-pch.cmake)
+include(cmake/modules/linker.cmake)
+include(cmake/modules/lto-pgo.cmake)
+include(cmake/modules/optimization.cmake)
+include(cmake/modules/build-profile.cmake)
+include(cmake/modules/tidy.cmake OPTIONAL)
 
 include_directories(include)
 
 set(CMAKE_CXX_STANDARD {{cpp_standard}})
 set(CMAKE_CXX_STANDARD_REQUIRED TRUE)
 
-set(CMAKE_CXX_FLAGS "${CMAKE_CXX_FLAGS} -Wall -Wextra -pedantic -O2")
+set(CMAKE_CXX_FLAGS "${CMAKE_CXX_FLAGS} -Wall -Wextra -pedantic")
+
+include(cmake/sources.cmake)
+add_executable(${PROJECT_NAME} src/main.cpp ${{{project_name}}_SOURCES})
+enable_unity_pch(${PROJECT_NAME})
 
-file(GLOB_RECURSE SOURCES src/*.cpp)
-add_executable(${PROJECT_NAME} ${SOURCES})
+include(cmake/modules/benchmark.cmake OPTIONAL)
 
 # ---- Developer mode ----
 
@@ -30,6 +44,205 @@ endif()
 
 install(TARGETS ${PROJECT_NAME} DESTINATION bin)
 install(DIRECTORY include/ DESTINATION include)
+
+include(cmake/modules/dev-mode.cmake)
+""",
+	"CMakeLists-lib+app.txt": """cmake_minimum_required(VERSION {{cmake_version}})
+include(cmake/modules/prelude.cmake)
+
+project({{project_name}} VERSION 0.1.0 LANGUAGES CXX)
+
+if(NOT CMAKE_BUILD_TYPE AND NOT CMAKE_CONFIGURATION_TYPES)
+  set(CMAKE_BUILD_TYPE RelWithDebInfo CACHE STRING "Build type" FORCE)
+endif()
+
+include(cmake/modules/project-is-top-level.cmake)
+include(cmake/modules/variables.cmake)
+include(cmake/modules/compiler-cache.cmake OPTIONAL)
+include(cmake/modules/unity-pch.cmake)
+include(cmake/modules/linker.cmake)
+include(cmake/modules/lto-pgo.cmake)
+include(cmake/modules/optimization.cmake)
+include(cmake/modules/build-profile.cmake)
+include(cmake/modules/tidy.cmake OPTIONAL)
+
+set(CMAKE_CXX_STANDARD {{cpp_standard}})
+set(CMAKE_CXX_STANDARD_REQUIRED TRUE)
+
+set(CMAKE_CXX_FLAGS "${CMAKE_CXX_FLAGS} -Wall -Wextra -pedantic")
+
+include(cmake/sources.cmake)
+
+# ---- Library ----
+
+# Every source is compiled once, into this library. The executable, the
+# tests and the benchmarks all link it instead of compiling the sources again
+add_library({{project_name}}_{{project_name}} ${{{project_name}}_SOURCES})
+add_library({{project_name}}::{{project_name}} ALIAS {{project_name}}_{{project_name}})
+
+set_target_properties(
+    {{project_name}}_{{project_name}} PROPERTIES
+    VERSION "${PROJECT_VERSION}"
+    SOVERSION "${PROJECT_VERSION_MAJOR}"
+    EXPORT_NAME {{project_name}}
+    OUTPUT_NAME {{project_name}}
+)
+
+target_include_directories(
+    {{project_name}}_{{project_name}} ${warning_guard}
+    PUBLIC
+    "$<BUILD_INTERFACE:${PROJECT_SOURCE_DIR}/include>"
+)
+
+target_compile_features({{project_name}}_{{project_name}} PUBLIC cxx_std_{{cpp_standard}})
+enable_unity_pch({{project_name}}_{{project_name}})
+
+# ---- Executable ----
+
+add_executable({{project_name}}_exe src/main.cpp)
+add_executable({{project_name}}::exe ALIAS {{project_name}}_exe)
+
+set_property(TARGET {{project_name}}_exe PROPERTY OUTPUT_NAME {{project_name}})
+target_link_libraries({{project_name}}_exe PRIVATE {{project_name}}::{{project_name}})
+
+include(cmake/modules/benchmark.cmake OPTIONAL)
+
+# ---- Install rules ----
+
+if(NOT CMAKE_SKIP_INSTALL_RULES)
+  include(cmake/modules/install-rules.cmake)
+endif()
+
+# ---- Developer mode ----
+
+if(NOT {{project_name}}_DEVELOPER_MODE)
+  return()
+elseif(NOT PROJECT_IS_TOP_LEVEL)
+  message(
+      AUTHOR_WARNING
+      "Developer mode is intended for developers of {{project_name}}"
+  )
+endif()
+
+include(cmake/modules/dev-mode.cmake)
+""",
+	"test-CMakeLists.txt": """# ---- Tests ----
+
+# One executable per test source listed in cmake/sources.cmake. With a test
+# framework every test case is a CTest test of its own, so `ctest -j` and
+# `build.sh test --shard i/n` split the work by case. The functions are in
+# cmake/modules/test-framework.cmake
+if(NOT {{project_name}}_TEST_SOURCES)
+  return()
+endif()
+
+corn_setup_tests({{test_framework_args}})
+if(NOT CORN_TEST_FRAMEWORK)
+  return()
+endif()
+
+set(
+    {{project_name}}_HEAVY_TESTS ""
+    CACHE STRING "Test sources whose cases each reserve {{project_name}}_HEAVY_TEST_CPUS cores"
+)
+set(
+    {{project_name}}_HEAVY_TEST_CPUS 4
+    CACHE STRING "Cores reserved by each case of {{project_name}}_HEAVY_TESTS"
+)
+
+# The lib+app layout compiles the sources once, into its library. The app
+# layout has no library, so the tests get one of their own
+if(TARGET {{project_name}}::{{project_name}})
+  set(test_library {{project_name}}::{{project_name}})
+elseif({{project_name}}_SOURCES)
+  set(test_library {{project_name}}_test_sources)
+  set(sources "")
+  foreach(source IN LISTS {{project_name}}_SOURCES)
+    list(APPEND sources "${PROJECT_SOURCE_DIR}/${source}")
+  endforeach()
+  add_library(${test_library} STATIC ${sources})
+  target_include_directories(${test_library} PUBLIC "${PROJECT_SOURCE_DIR}/include")
+  enable_unity_pch(${test_library})
+else()
+  set(test_library "")
+endif()
+
+# Targets are named after the path below test/, so test/net/strings_test.cpp
+# and test/util/strings_test.cpp do not clash
+foreach(source IN LISTS {{project_name}}_TEST_SOURCES)
+  file(RELATIVE_PATH relative "${CMAKE_CURRENT_SOURCE_DIR}" "${PROJECT_SOURCE_DIR}/${source}")
+  get_filename_component(directory "${relative}" DIRECTORY)
+  get_filename_component(name "${relative}" NAME_WE)
+  if(directory)
+    string(REPLACE "/" "_" directory "${directory}")
+    set(name "${directory}_${name}")
+  endif()
+  set(cpus 1)
+  if(source IN_LIST {{project_name}}_HEAVY_TESTS)
+    set(cpus "${{{project_name}}_HEAVY_TEST_CPUS}")
+  endif()
+  corn_add_test(
+      "{{project_name}}_${name}" "${PROJECT_SOURCE_DIR}/${source}"
+      LIBRARY ${test_library}
+      CPUS ${cpus}
+  )
+endforeach()
+
+add_folders(Test)
+""",
+	"test.cpp": """#include "{{header}}"
+
+// A non-zero exit code fails the test
+int main() {
+	return 0;
+}
+""",
+	"my_library_test.cpp": """#include "my_library.hpp"
+
+// A non-zero exit code fails the test
+int main() {
+	return {{project_name}}::do_something(2) == 4 ? 0 : 1;
+}
+""",
+	"test-doctest.cpp": """#include <doctest/doctest.h>
+
+#include "{{header}}"
+
+TEST_CASE("{{header}}") {
+}
+""",
+	"test-catch2.cpp": """#include <catch2/catch_test_macros.hpp>
+
+#include "{{header}}"
+
+TEST_CASE("{{header}}") {
+}
+""",
+	"my_library_test-doctest.cpp": """#include <doctest/doctest.h>
+
+#include "my_library.hpp"
+
+// Every TEST_CASE is a CTest test of its own
+TEST_CASE("do_something doubles positive values") {
+	CHECK({{project_name}}::do_something(2) == 4);
+}
+
+TEST_CASE("do_something doubles negative values") {
+	CHECK({{project_name}}::do_something(-3) == -6);
+}
+""",
+	"my_library_test-catch2.cpp": """#include <catch2/catch_test_macros.hpp>
+
+#include "my_library.hpp"
+
+// Every TEST_CASE is a CTest test of its own
+TEST_CASE("do_something doubles positive values") {
+	CHECK({{project_name}}::do_something(2) == 4);
+}
+
+TEST_CASE("do_something doubles negative values") {
+	CHECK({{project_name}}::do_something(-3) == -6);
+}
 """,
 	"README.md": """# {{project_name}}
 
@@ -65,26 +278,298 @@ int main() {
 	std::cout << "Hello, {{project_name}}!" << std::endl;
 	return 0;
 }
+""",
+	"pch.hpp": """#pragma once
+
+// Precompiled header for {{project_name}}, used when {{project_name}}_PCH is ON.
+// List the heavy headers most translation units include; add third-party
+// headers here too. Every change to this file rebuilds all sources.
+
+#include <algorithm>
+#include <array>
+#include <cstddef>
+#include <cstdint>
+#include <functional>
+#include <iostream>
+#include <map>
+#include <memory>
+#include <sstream>
+#include <stdexcept>
+#include <string>
+#include <unordered_map>
+#include <utility>
+#include <vector>
+
+#if __cplusplus >= 201703L
+#include <optional>
+#include <string_view>
+#include <variant>
+#endif
+""",
+	"sources.cmake": """# Generated by corn: the sources of {{project_name}}, relative to the project
+# root. `corn add-source`, `corn add-class` and `corn add-module` add to these
+# lists. Listing sources explicitly keeps configure cheap and deterministic.
+set(
+    {{project_name}}_SOURCES
+{{sources}})
+
+set(
+    {{project_name}}_TEST_SOURCES
+{{test_sources}})
+""",
+	"source.hpp": """#pragma once
+
+namespace {{project_name}} {
+}
+""",
+	"source.cpp": """#include "{{header}}"
+
+namespace {{project_name}} {
+}
+""",
+	"class.hpp": """#pragma once
+
+namespace {{project_name}} {
+	class {{class_name}} {
+	  public:
+		{{class_name}}();
+	};
+}
+""",
+	"class.cpp": """#include "{{header}}"
+
+namespace {{project_name}} {
+	{{class_name}}::{{class_name}}() = default;
+}
 """,
 	"my_library.hpp": """#pragma once
 
-namespace {{project_name}} {{
-	void do_something();
-}}
+namespace {{project_name}} {
+	// Example library function, replace it with your own code
+	int do_something(int value);
+}
 
+""",
+	"my_library.cpp": """#include "my_library.hpp"
+
+namespace {{project_name}} {
+	int do_something(int value) {
+		return value * 2;
+	}
+}
+""",
+	"bench_my_library.cpp": """#include <benchmark/benchmark.h>
+
+#include "my_library.hpp"
+
+static void BM_do_something(benchmark::State& state) {
+	const auto value = static_cast<int>(state.range(0));
+
+	for (auto _ : state) {
+		benchmark::DoNotOptimize({{project_name}}::do_something(value));
+	}
+}
+BENCHMARK(BM_do_something)->Arg(1)->Arg(1 << 10);
+
+BENCHMARK_MAIN();
+""",
+	"compare-benchmarks.py": """#!/usr/bin/env python3
+# Compare Google Benchmark JSON results against a stored baseline
+import argparse
+import json
+import os
+import shutil
+import sys
+
+RED = '\\033[31m'
+GREEN = '\\033[32m'
+YELLOW = '\\033[33m'
+NC = '\\033[0m'
+
+TIME_UNITS = {'ns': 1.0, 'us': 1e3, 'ms': 1e6, 's': 1e9}
+
+
+def load_times(path):
+	\"\"\"Map benchmark name to real time in nanoseconds.\"\"\"
+	with open(path, encoding='utf-8') as file:
+		document = json.load(file)
+
+	times = {}
+	for entry in document.get('benchmarks', []):
+		# With repetitions, compare the median aggregate only
+		if entry.get('run_type') == 'aggregate' and entry.get('aggregate_name') != 'median':
+			continue
+		name = entry.get('run_name', entry['name'])
+		times[name] = entry['real_time'] * TIME_UNITS[entry.get('time_unit', 'ns')]
+
+	return times
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Compare benchmark results against a baseline')
+	parser.add_argument('results', help='JSON written by --benchmark_out')
+	parser.add_argument('baseline', help='baseline JSON')
+	parser.add_argument('--threshold', type=float, default=5.0, help='allowed slowdown in percent')
+	parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+	args = parser.parse_args()
+
+	if args.save:
+		shutil.copyfile(args.results, args.baseline)
+		print(f'{GREEN}Saved baseline: {args.baseline}{NC}')
+		return 0
+
+	if not os.path.isfile(args.baseline):
+		print(f'{YELLOW}No baseline at {args.baseline}, run with --save to create one{NC}')
+		return 0
+
+	results = load_times(args.results)
+	baseline = load_times(args.baseline)
+	regressions = 0
+
+	print(f"{'benchmark':<40} {'baseline':>12} {'current':>12} {'change':>9}")
+	for name, current in sorted(results.items()):
+		if name not in baseline:
+			print(f'{name:<40} {"-":>12} {current:>10.1f}ns {"new":>9}')
+			continue
+
+		change = (current - baseline[name]) / baseline[name] * 100
+		color = NC
+		if change > args.threshold:
+			color = RED
+			regressions += 1
+		elif change < -args.threshold:
+			color = GREEN
+		print(f'{color}{name:<40} {baseline[name]:>10.1f}ns {current:>10.1f}ns {change:>+8.1f}%{NC}')
+
+	if regressions:
+		print(f'{RED}{regressions} benchmark(s) regressed by more than {args.threshold}%{NC}')
+		return 1
+
+	print(f'{GREEN}No regressions above {args.threshold}%{NC}')
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
 """,
 "CMakePresets.json": """{
     "version": 3,
     "cmakeMinimumRequired": {
         "major": 3,
-        "minor": 10,
+        "minor": 21,
         "patch": 0
     },
     "configurePresets": [
+        {
+            "name": "base",
+            "hidden": true,
+            "generator": "Ninja",
+            "binaryDir": "${sourceDir}/build/${presetName}",
+            "cacheVariables": {
+                "{{project_name}}_PGO_DIR": "${sourceDir}/build/pgo-profile"
+            }
+        },
+        {
+            "name": "default",
+            "inherits": "base"
+        },
+{{tool_configure_presets}}        {
+            "name": "release-lto",
+            "displayName": "Release with link-time optimization",
+            "inherits": "base",
+            "cacheVariables": {
+                "CMAKE_BUILD_TYPE": "Release",
+                "{{project_name}}_ENABLE_IPO": "ON"
+            }
+        },
+        {
+            "name": "coverage",
+            "displayName": "Instrumented developer build for the coverage targets",
+            "inherits": "base",
+            "cacheVariables": {
+                "CMAKE_BUILD_TYPE": "Debug",
+                "{{project_name}}_DEVELOPER_MODE": "ON",
+                "ENABLE_COVERAGE": "ON"
+            }
+        },
+        {
+            "name": "build-profile",
+            "displayName": "Record compile time traces for corn build-report",
+            "inherits": "base",
+            "cacheVariables": {
+                "{{project_name}}_ENABLE_BUILD_PROFILE": "ON"
+            }
+        },
+        {
+            "name": "pgo-generate",
+            "displayName": "PGO stage 1: instrumented build",
+            "inherits": "base",
+            "cacheVariables": {
+                "CMAKE_BUILD_TYPE": "Release",
+                "{{project_name}}_PGO": "GENERATE"
+            }
+        },
+        {
+            "name": "pgo-use",
+            "displayName": "PGO stage 2: optimized with the collected profile",
+            "inherits": "base",
+            "cacheVariables": {
+                "CMAKE_BUILD_TYPE": "Release",
+                "{{project_name}}_ENABLE_IPO": "ON",
+                "{{project_name}}_PGO": "USE"
+            }
+        }
+    ],
+    "buildPresets": [
         {
             "name": "default",
-            "hidden": false,
-            "generator": "Ninja"
+            "configurePreset": "default"
+        },
+{{tool_build_presets}}        {
+            "name": "release-lto",
+            "configurePreset": "release-lto"
+        },
+        {
+            "name": "coverage",
+            "configurePreset": "coverage"
+        },
+        {
+            "name": "build-profile",
+            "configurePreset": "build-profile"
+        },
+        {
+            "name": "pgo-generate",
+            "configurePreset": "pgo-generate"
+        },
+        {
+            "name": "pgo-use",
+            "configurePreset": "pgo-use",
+            "cleanFirst": true
+        }
+    ],
+    "testPresets": [
+        {
+            "name": "default",
+            "displayName": "Tests of a developer build, as configured by build.sh",
+            "configurePreset": "default",
+            "output": {
+                "outputOnFailure": true
+            },
+            "execution": {
+                "noTestsAction": "error",
+                "resourceSpecFile": "${sourceDir}/build/${presetName}/ctest-resources.json"
+            }
+        },
+        {
+            "name": "coverage",
+            "configurePreset": "coverage",
+            "output": {
+                "outputOnFailure": true
+            },
+            "execution": {
+                "noTestsAction": "error",
+                "resourceSpecFile": "${sourceDir}/build/${presetName}/ctest-resources.json"
+            }
         }
     ]
 }
@@ -98,7 +583,7 @@ namespace {{project_name}} {{
 IndentWidth: 4
 ColumnLimit: 120
 """,
-    ".clang-tidy": """Checks: '-*,clang-analyzer-*"
+    ".clang-tidy": """Checks: '-*,clang-analyzer-*'
 WarningsAsErrors: '*'
 DiagnosticsFormat: 'clang'
 """,
@@ -116,7 +601,16 @@ NC='\033[0m' # No Color
 
 # Project information
 PROJECT_NAME="{{project_name}}"
-BUILD_DIR="build"
+PRESET="${PRESET:-default}"
+BUILD_DIR="build/${PRESET}"
+STAGE_DIR="build/stage"
+JOBS="${JOBS:-$(nproc 2>/dev/null || getconf _NPROCESSORS_ONLN)}"
+
+# The presets use Ninja; fall back to Makefiles where it is not installed
+GENERATOR_ARGS=()
+if ! command -v ninja >/dev/null 2>&1; then
+	GENERATOR_ARGS=(-G "Unix Makefiles")
+fi
 
 # Functions
 function print_header() {
@@ -145,15 +639,164 @@ function print_error() {
 	echo -e "${currdate} ${RED}[ ✗ ] ${1}${NC}"
 }
 
+function now() {
+	date +%s.%N
+}
+
+function elapsed() {
+	awk -v start="$1" -v end="$2" 'BEGIN { printf "%.2f", end - start }'
+}
+
+# Installs the package manager dependencies. Conan binaries are restored from
+# and saved to archives in ~/.cache/corn/conan; the vcpkg preset caches its
+# binaries in ~/.cache/corn/vcpkg. Both are shared by all projects, so clean
+# build trees reuse them without network access
+DEPS_CACHE="$HOME/.cache/corn"
+
+function install_deps() {
+	if [ -f vcpkg.json ]; then
+		mkdir -p "$DEPS_CACHE/vcpkg"
+	fi
+
+	if [ ! -f conanfile.py ]; then
+		return 0
+	fi
+
+	local archives="$DEPS_CACHE/conan"
+	local stamp="build/conan-deps/restored.stamp"
+	mkdir -p "$archives" build/conan-deps
+
+	if [ build/conan-deps/graph.json -nt conanfile.py ] && [ -f build/conan-deps/conan_toolchain.cmake ]; then
+		print_success "Conan dependencies are up to date."
+		return 0
+	fi
+
+	# Restore what this and other projects saved since the last install
+	for archive in "$archives"/*.tgz; do
+		if [ -f "$archive" ] && [ "$archive" -nt "$stamp" ]; then
+			print_step "Restoring Conan binaries from $archive..."
+			conan cache restore "$archive" >/dev/null || return 1
+		fi
+	done
+
+	print_step "Installing Conan dependencies..."
+	conan install . --build=missing -s build_type=Release --format=json > build/conan-deps/graph.json || return 1
+	conan list --graph=build/conan-deps/graph.json --format=json > build/conan-deps/packages.json || return 1
+	conan cache save --list=build/conan-deps/packages.json --file="$archives/${PROJECT_NAME}.tgz" >/dev/null || return 1
+	touch "$stamp"
+	print_success "Conan binaries saved to $archives/${PROJECT_NAME}.tgz."
+}
+
 currdate=$(date +"%Y-%m-%d %H:%M:%S")
 clear
 echo -e "{{project_name}} build @ ${currdate}\n"
 
 if [ "$1" == "help" ]; then
-	echo "Usage: build.sh <doxygen/format>"
+	echo "Usage: build.sh [BUILD_SHARED_LIBS]        configure, build and stage an install"
+	echo "       build.sh <doxygen/format>           run the tool, then build"
+	echo "       build.sh clean                      remove the build directories"
+	echo "       build.sh pgo <training-command> [args...]"
+	echo "       build.sh bench [--save-baseline]"
+	echo "       build.sh deps                       install the Conan/vcpkg dependencies"
+	echo "       build.sh test [--shard i/n]         build, then run the tests (every n-th, from the i-th)"
+	echo ""
+	echo "Environment: PRESET (default: default), JOBS (default: nproc),"
+	echo "             DESTDIR (default: build/stage, set it empty to install into the prefix)"
+	exit
+elif [ "$1" == "clean" ]; then
+	print_header "Cleaning up previous builds"
+	if [ -d build ]; then
+		print_step "Removing build directory..."
+		rm -rf build
+		print_success "Removed build directory."
+	else
+		print_success "No previous build found."
+	fi
+	exit
+elif [ "$1" == "deps" ]; then
+	print_header "Installing dependencies"
+	install_deps
+	exit $?
+elif [ "$1" == "test" ]; then
+	# Run after the build below. Shard i of n runs tests i, i+n, i+2n... so
+	# n CI runners split the tests without coordinating
+	RUN_TESTS=1
+	TEST_ARGS=()
+	if [ "$2" == "--shard" ]; then
+		if ! [[ "$3" =~ ^([0-9]+)/([0-9]+)$ ]] || [ "${BASH_REMATCH[1]}" -lt 1 ] || [ "${BASH_REMATCH[1]}" -gt "${BASH_REMATCH[2]}" ]; then
+			print_error "Usage: build.sh test --shard i/n, with 1 <= i <= n"
+			exit 1
+		fi
+		TEST_ARGS=(-I "${BASH_REMATCH[1]},,${BASH_REMATCH[2]}")
+	fi
+elif [ "$1" == "bench" ]; then
+	if [ ! -d benchmarks ]; then
+		print_error "No benchmarks/ directory, create the project with --tools benchmark"
+		exit 1
+	fi
+
+	BENCH_DIR="build/bench"
+	BENCH_BASELINE="${BENCH_BASELINE:-benchmarks/baseline.json}"
+	BENCH_THRESHOLD="${BENCH_THRESHOLD:-5}"
+
+	print_header "Building benchmarks"
+	cmake -S . -B "$BENCH_DIR" -DCMAKE_BUILD_TYPE=Release && cmake --build "$BENCH_DIR" --target {{project_name}}_benchmarks -j "$JOBS"
+	if [ $? -ne 0 ]; then
+		print_error "Benchmark build failed."
+		exit 1
+	fi
+
+	print_header "Running benchmarks"
+	"$BENCH_DIR/{{project_name}}_benchmarks" --benchmark_out="$BENCH_DIR/benchmark-results.json" --benchmark_out_format=json
+	if [ $? -ne 0 ]; then
+		print_error "Benchmarks failed."
+		exit 1
+	fi
+
+	if [ "$2" == "--save-baseline" ]; then
+		python3 benchmarks/compare.py "$BENCH_DIR/benchmark-results.json" "$BENCH_BASELINE" --save
+	else
+		print_header "Comparing against $BENCH_BASELINE (threshold ${BENCH_THRESHOLD}%)"
+		python3 benchmarks/compare.py "$BENCH_DIR/benchmark-results.json" "$BENCH_BASELINE" --threshold "$BENCH_THRESHOLD"
+	fi
+	exit $?
+elif [ "$1" == "pgo" ]; then
+	shift
+	if [ $# -eq 0 ]; then
+		print_error "Usage: build.sh pgo <training-command> [args...]"
+		exit 1
+	fi
+
+	print_header "PGO stage 1: instrumented build"
+	rm -rf build/pgo-profile
+	cmake --preset pgo-generate "${GENERATOR_ARGS[@]}" && cmake --build --preset pgo-generate -j "$JOBS"
+	if [ $? -ne 0 ]; then
+		print_error "Instrumented build failed."
+		exit 1
+	fi
+	print_success "Instrumented binaries are in build/pgo-generate."
+
+	print_header "PGO stage 2: training run"
+	print_step "Running: $*"
+	"$@"
+	if [ $? -ne 0 ]; then
+		print_error "Training run failed."
+		exit 1
+	fi
+	print_success "Profile collected in build/pgo-profile."
+
+	print_header "PGO stage 3: optimized build"
+	# The objects do not depend on the profile, so a kept build tree would
+	# not be rebuilt for a new one: the pgo-use build preset cleans first
+	cmake --preset pgo-use "${GENERATOR_ARGS[@]}" && cmake --build --preset pgo-use --clean-first -j "$JOBS"
+	if [ $? -ne 0 ]; then
+		print_error "Optimized build failed."
+		exit 1
+	fi
+	print_success "Optimized binaries are in build/pgo-use."
 	exit
 elif [ "$1" == "doxygen" ]; then
-	print_header "Generate docs with doxygem"
+	print_header "Generate docs with doxygen"
 	print_step "Generating..."
 	doxygen
 	print_success "Docs generation complete."
@@ -164,188 +807,653 @@ elif [ "$1" == "format" ]; then
 	print_success "Code formatting complete."
 fi
 
-print_header "Cleaning up previous build"
-if [ -d "$BUILD_DIR" ]; then
-	print_step "Removing $BUILD_DIR directory..."
-	rm -rf "$BUILD_DIR"
-	print_success "Removed $BUILD_DIR directory."
-else
-	print_success "No previous build found."
-fi
-
-if [ "$1" == "format" ]; then
-	# Formatting code
-	print_header "Formatting code"
-	print_step "Format and cleaning code..."
-	./format-code.py
-	print_success "Code formatted."
+if [ "$PRESET" == "conan" ] || [ "$PRESET" == "vcpkg" ]; then
+	print_header "Installing dependencies"
+	install_deps
+	if [ $? -ne 0 ]; then
+		print_error "Dependency installation failed."
+		exit 1
+	fi
 fi
 
-# Create build directory
-print_header "Creating build directory"
-print_step "Creating $BUILD_DIR directory..."
-mkdir -p "$BUILD_DIR"
-print_success "Created $BUILD_DIR directory."
-
-# Configure the project
+# Configure the project. The build directory is kept between runs, so this
+# and the build below are incremental; use `build.sh clean` to start over
 print_header "Configuring the project"
-print_step "Running CMake in $BUILD_DIR..."
-cd "$BUILD_DIR"
-
+print_step "Running CMake preset '$PRESET' in $BUILD_DIR..."
+CONFIGURE_ARGS=(-D{{project_name}}_DEVELOPER_MODE=ON)
 if [ "$1" == "BUILD_SHARED_LIBS" ]; then
-	cmake .. -DBUILD_SHARED_LIBS=ON -D{{project_name}}_DEVELOPER_MODE=ON
-else
-	cmake .. -D{{project_name}}_DEVELOPER_MODE=ON
+	CONFIGURE_ARGS+=(-DBUILD_SHARED_LIBS=ON)
 fi
 
+configure_start=$(now)
+cmake --preset "$PRESET" "${GENERATOR_ARGS[@]}" "${CONFIGURE_ARGS[@]}"
 if [ $? -eq 0 ]; then
 	print_success "CMake configuration completed successfully."
 else
 	print_error "CMake configuration failed."
 	exit 1
 fi
+configure_end=$(now)
 
 # Build the project
 print_header "Building the project"
-print_step "Building the project in $BUILD_DIR..."
-make
+print_step "Building the project in $BUILD_DIR with $JOBS jobs..."
+cmake --build "$BUILD_DIR" -j "$JOBS"
 if [ $? -eq 0 ]; then
 	print_success "Project build completed successfully."
 else
 	print_error "Project build failed."
 	exit 1
 fi
+build_end=$(now)
 
-# Install the project
+if [ -n "$RUN_TESTS" ]; then
+	print_header "Running the tests"
+	# The resource spec keeps CPU-heavy tests from oversubscribing the cores.
+	# No registered tests, e.g. without the test framework, is a failure
+	RESOURCE_ARGS=()
+	if [ -f "$BUILD_DIR/ctest-resources.json" ]; then
+		RESOURCE_ARGS=(--resource-spec-file "$PWD/$BUILD_DIR/ctest-resources.json")
+	fi
+	(cd "$BUILD_DIR" && ctest -j "$JOBS" --output-on-failure --no-tests=error "${RESOURCE_ARGS[@]}" "${TEST_ARGS[@]}")
+	if [ $? -eq 0 ]; then
+		print_success "All tests passed."
+	else
+		print_error "Tests failed."
+		exit 1
+	fi
+	printf "%-10s %8ss\\n" "build" "$(elapsed "$configure_end" "$build_end")"
+	printf "%-10s %8ss\\n" "test" "$(elapsed "$build_end" "$(now)")"
+	exit
+fi
+
+# Install the project into a staging directory; no root needed
+export DESTDIR="${DESTDIR-$PWD/$STAGE_DIR}"
 print_header "Installing the project"
-print_step "Installing the project..."
-sudo make install
+print_step "Installing the project into ${DESTDIR:-the install prefix}..."
+cmake --install "$BUILD_DIR"
 if [ $? -eq 0 ]; then
 	print_success "Project installation completed successfully."
 else
 	print_error "Project installation failed."
 	exit 1
 fi
+install_end=$(now)
+
+COMPILER_CACHE_PROGRAM=$(grep -s "^COMPILER_CACHE_PROGRAM:" "$BUILD_DIR/CMakeCache.txt" | cut -d= -f2-)
+if [ -n "$COMPILER_CACHE_PROGRAM" ]; then
+	print_header "Compiler cache statistics"
+	"$COMPILER_CACHE_PROGRAM" --show-stats
+fi
 
 print_header "Build completed successfully"
 echo -e "${CYAN}The ${PROJECT_NAME} library has been built and installed.${NC}"
-echo "Build dir: build/"
+echo "Build dir: $BUILD_DIR/"
+echo "Install dir: ${DESTDIR:-install prefix}"
+echo ""
+printf "%-10s %8ss\\n" "configure" "$(elapsed "$configure_start" "$configure_end")"
+printf "%-10s %8ss\\n" "build" "$(elapsed "$configure_end" "$build_end")"
+printf "%-10s %8ss\\n" "install" "$(elapsed "$build_end" "$install_end")"
+printf "%-10s %8ss\\n" "total" "$(elapsed "$configure_start" "$install_end")"
 ''',
-'format-code.py': '''
-#!/usr/bin/env python3
-# Python program to format C/C++ files using clang-format 
+'format-code.py': '''#!/usr/bin/env python3
+# Format C/C++ sources of {{project_name}}: codespell, clang-tidy, clang-format
+# and tab indentation. Files are processed in batches on a process pool, and
+# files unchanged since the last run are skipped using a hash cache.
+# clang-tidy also fixes the headers a batch includes, so its fixes are
+# exported per batch and applied once with clang-apply-replacements.
+import argparse
+import hashlib
+import json
 import os
-import sys
+import shutil
 import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+RED = '\\033[31m'
+GREEN = '\\033[32m'
+YELLOW = '\\033[33m'
+BOLD = '\\033[1m'
+NC = '\\033[0m'
+
+CPP_EXTENSIONS = ('.cxx', '.cpp', '.c', '.hxx', '.hh', '.cc', '.hpp', '.h')
+IGNORED_DIRS = {'build', '.git', 'cmake', 'docs', '.cache'}
+CONFIG_FILES = ('.clang-format', '.clang-tidy', '.codespellrc', __file__)
+CACHE_FILE = os.path.join('.cache', 'format-code.json')
+TAB_SIZE = 4
+
+
+def find_compile_commands():
+	"""Find a compilation database for clang-tidy."""
+	for directory in ('build', os.path.join('build', 'default')):
+		if os.path.isfile(os.path.join(directory, 'compile_commands.json')):
+			return directory
+	return None
 
-# Define color codes for output
-RED = '\033[31m'
-GREEN = '\033[32m'
-YELLOW = '\033[33m'
-NC = '\033[0m'  # No Color
-BOLD = '\033[1m'  # No Color
 
-# File Extension filter. You can add new extension 
-cpp_extensions = (".cxx",".cpp",".c", ".hxx", ".hh", ".cc", ".hpp") 
-IGNORED_DIRS = ['build', '.git', 'cmake', 'docs']
+def build_tools():
+	"""Return the (name, command) pairs to run, in order; None means built-in."""
+	compile_commands = find_compile_commands()
+	tidy = ['clang-tidy', '--quiet']
+	if compile_commands:
+		tidy += ['-p', compile_commands]
 
-CLANG_FORMAT = 'clang-format'
-SPACETABS = './space-tabs.sh'
+	tools = [
+		('codespell', ['codespell', '-w']),
+		('clang-tidy', tidy),
+		('clang-format', ['clang-format', '-i', '-style=file']),
+	]
+	available = [(name, command) for name, command in tools if shutil.which(command[0])]
 
-print(f'libnumerixpp code-formatter: {CLANG_FORMAT}; Extensions: {" ".join(cpp_extensions)}')
+	for name, command in tools:
+		if (name, command) not in available:
+			print(f'{YELLOW}{name} not found, skipping it{NC}')
 
+	return available + [('tabs', None)]
 
-def print_usage():
-	"""Print the usage instructions."""
-	print(f"{YELLOW}Usage: convert_tabs(file_path, tab_size, conversion_type){NC}")
-	print(f"<conversion_type>: 'spaces' or 'tabs'")
 
+def unexpand(text, tab_size=TAB_SIZE):
+	"""Convert leading spaces to tabs, like `unexpand -t 4`."""
+	lines = []
+	for line in text.splitlines(keepends=True):
+		stripped = line.lstrip(' \\t')
+		indent = line[:len(line) - len(stripped)]
+		column = 0
+		for char in indent:
+			column = (column // tab_size + 1) * tab_size if char == '\\t' else column + 1
+		lines.append('\\t' * (column // tab_size) + ' ' * (column % tab_size) + stripped)
+	return ''.join(lines)
 
-def print_error(message):
-	"""Print error messages."""
-	print(f"{RED}Error: {message}{NC}")
 
+def convert_tabs(files):
+	for path in files:
+		with open(path, encoding='utf-8', newline='') as file:
+			text = file.read()
+		converted = unexpand(text)
+		if converted != text:
+			with open(path, 'w', encoding='utf-8', newline='') as file:
+				file.write(converted)
 
-def validate_positive_integer(value):
-	"""Validate if the value is a positive integer."""
+
+def format_batch(batch, tools, fixes_dir=None):
+	"""Run every tool over one batch of files, returning per-tool timings, the failures and the failed paths.
+
+	With fixes_dir, clang-tidy exports its fixes there instead of applying them."""
+	timings = {}
+	failures = []
+
+	for name, command in tools:
+		start = time.perf_counter()
+		fixes = None
+		if command is None:
+			convert_tabs(batch)
+		else:
+			if fixes_dir and name == 'clang-tidy':
+				# Batches are disjoint, so their paths name the fixes file
+				fixes = os.path.join(fixes_dir, hashlib.sha256('\\0'.join(batch).encode('utf-8')).hexdigest() + '.yaml')
+				command = command + ['--export-fixes', fixes]
+			result = subprocess.run(command + batch, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+			# codespell exits with 65 when it fixed something
+			if result.returncode not in (0, 65):
+				failures.append((name, result.returncode, result.stdout))
+				# Like --fix, do not apply the fixes of a failed run
+				if fixes and os.path.exists(fixes):
+					os.remove(fixes)
+		timings[name] = time.perf_counter() - start
+
+	# A tool reports for the whole batch, so any failure taints all its files
+	return timings, failures, batch if failures else []
+
+
+def apply_fixes(fixes_dir, files):
+	"""Apply the exported clang-tidy fixes once, merging the edits batches made to shared headers."""
+	start = time.perf_counter()
+	failures = []
+	result = subprocess.run(['clang-apply-replacements', fixes_dir], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+	if result.returncode != 0:
+		failures.append(('clang-apply-replacements', result.returncode, result.stdout))
+	return {'clang-tidy': time.perf_counter() - start}, failures, files if failures else []
+
+
+def file_hash(path, salt):
+	digest = hashlib.sha256(salt)
+	with open(path, 'rb') as file:
+		digest.update(file.read())
+	return digest.hexdigest()
+
+
+def config_salt():
+	"""Hash of the tool configuration, so config changes invalidate the cache."""
+	digest = hashlib.sha256()
+	for path in CONFIG_FILES:
+		if os.path.isfile(path):
+			with open(path, 'rb') as file:
+				digest.update(file.read())
+	return digest.digest()
+
+
+def collect_files(paths):
+	files = []
+	for path in paths:
+		if os.path.isfile(path):
+			files.append(os.path.normpath(path))
+			continue
+		for root, dirs, names in os.walk(path):
+			dirs[:] = sorted(d for d in dirs if d not in IGNORED_DIRS)
+			files.extend(os.path.normpath(os.path.join(root, name)) for name in sorted(names) if name.endswith(CPP_EXTENSIONS))
+	return files
+
+
+def load_cache():
 	try:
-		int_value = int(value)
-		if int_value < 1:
-			raise ValueError
-		return int_value
-	except ValueError:
-		print_error("Tab size must be a positive integer.")
+		with open(CACHE_FILE, encoding='utf-8') as file:
+			return json.load(file)
+	except (OSError, ValueError):
+		return {}
+
+
+def save_cache(cache):
+	os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+	with open(CACHE_FILE, 'w', encoding='utf-8') as file:
+		json.dump(cache, file, indent=1, sort_keys=True)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Format C/C++ sources in parallel')
+	parser.add_argument('paths', nargs='*', default=['.'], help='files or directories (default: .)')
+	parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='parallel workers')
+	parser.add_argument('--batch-size', type=int, default=32, help='files passed to a tool at once')
+	parser.add_argument('--no-cache', action='store_true', help='format every file, ignoring the cache')
+	args = parser.parse_args()
+
+	start = time.perf_counter()
+	salt = config_salt()
+	cache = {} if args.no_cache else load_cache()
+	files = collect_files(args.paths)
+	changed = [path for path in files if cache.get(path) != file_hash(path, salt)]
+
+	print(f'{BOLD}{{project_name}} code-formatter: {len(changed)} of {len(files)} files changed since the last run{NC}')
+
+	tools = build_tools()
+	batch_size = max(1, min(args.batch_size, -(-len(changed) // max(1, args.jobs))))
+	batches = [changed[index:index + batch_size] for index in range(0, len(changed), batch_size)]
+	totals = {name: 0.0 for name, _ in tools}
+	failed = 0
+	failed_paths = set()
+	results = []
+
+	# clang-tidy splits the run in two stages of parallel batches: concurrent
+	# --fix runs would edit the headers the batches share at the same time
+	tidy_index = next((index for index, (name, _) in enumerate(tools) if name == 'clang-tidy'), None)
+	before_tidy = tools if tidy_index is None else tools[:tidy_index]
+	after_tidy = [] if tidy_index is None else tools[tidy_index + 1:]
+
+	if batches:
+		with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(batches)))) as pool, \\
+				tempfile.TemporaryDirectory() as fixes_dir:
+			results.extend(pool.map(format_batch, batches, repeat(before_tidy)))
+			if tidy_index is not None:
+				if shutil.which('clang-apply-replacements'):
+					results.extend(pool.map(format_batch, batches, repeat(tools[tidy_index:tidy_index + 1]), repeat(fixes_dir)))
+					results.append(apply_fixes(fixes_dir, changed))
+				else:
+					print(f'{YELLOW}clang-apply-replacements not found, running clang-tidy serially{NC}')
+					name, command = tools[tidy_index]
+					results.append(format_batch(changed, [(name, command + ['--fix'])]))
+			results.extend(pool.map(format_batch, batches, repeat(after_tidy)))
+
+	for timings, failures, paths in results:
+		for name, seconds in timings.items():
+			totals[name] += seconds
+		for name, returncode, output in failures:
+			failed += 1
+			print(f'{RED}{name} returned {returncode}{NC}\\n{output}')
+		failed_paths.update(paths)
+
+	# Files of failed batches are not cached, so the next run checks them again
+	for path in changed:
+		if path not in failed_paths:
+			cache[path] = file_hash(path, salt)
+	cache = {path: digest for path, digest in cache.items() if os.path.isfile(path)}
+	save_cache(cache)
+
+	print(f'\\n{BOLD}{"tool":<14}{"time [s]":>10}{NC}  (summed over {len(batches)} batches)')
+	for name, seconds in totals.items():
+		print(f'{name:<14}{seconds:>10.2f}')
+	print(f'{"wall":<14}{time.perf_counter() - start:>10.2f}')
+
+	if failed:
+		print(f'{RED}{failed} tool run(s) failed{NC}')
+		return 1
+
+	print(f'{GREEN}Formatting completed successfully: {len(changed)} files{NC}')
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
+''',
+'run-tidy.py': '''#!/usr/bin/env python3
+# Run clang-tidy over the translation units of {{project_name}} in parallel.
+# Results are cached per translation unit, keyed on its compile command and
+# the content of the source and every header it includes, so unchanged
+# translation units are not checked again.
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+RED = '\\033[31m'
+GREEN = '\\033[32m'
+BOLD = '\\033[1m'
+NC = '\\033[0m'
+
+CACHE_VERSION = 1
+# Flags that write files or depfiles; dropped when listing the includes
+DROPPED_FLAGS = ('-c', '-MD', '-MMD')
+DROPPED_FLAGS_WITH_VALUE = ('-o', '-MF', '-MT', '-MQ')
+
+
+def is_unity_source(path):
+	"""Whether a source is a batch generated by a CMake unity build."""
+	return os.path.basename(os.path.dirname(path)) == 'Unity' and os.path.basename(path).startswith('unity_')
+
+
+def load_compile_commands(build_dir, source_dir):
+	"""Return the compile commands of the project's own sources and the number of unity batches."""
+	with open(os.path.join(build_dir, 'compile_commands.json'), encoding='utf-8') as file:
+		entries = json.load(file)
+
+	build_dir = os.path.realpath(build_dir) + os.sep
+	source_dir = os.path.realpath(source_dir) + os.sep
+	commands = {}
+	unity_sources = 0
+
+	for entry in entries:
+		path = os.path.realpath(os.path.join(entry['directory'], entry['file']))
+		# Skip fetched dependencies and generated sources
+		if path.startswith(source_dir) and not path.startswith(build_dir):
+			arguments = entry.get('arguments') or shlex.split(entry['command'])
+			commands[path] = (entry['directory'], arguments)
+		elif path.startswith(build_dir) and is_unity_source(path):
+			unity_sources += 1
+
+	return commands, unity_sources
+
+
+def dependency_command(arguments):
+	"""Turn a compile command into one printing the included project headers."""
+	command = []
+	skip = False
+	for argument in arguments:
+		if skip:
+			skip = False
+		elif argument in DROPPED_FLAGS_WITH_VALUE:
+			skip = True
+		elif argument not in DROPPED_FLAGS and not argument.startswith(DROPPED_FLAGS_WITH_VALUE):
+			command.append(argument)
+	return command + ['-MM']
+
+
+def list_dependencies(directory, arguments):
+	"""List the files a translation unit reads, or None if that failed."""
+	result = subprocess.run(dependency_command(arguments), cwd=directory, stdout=subprocess.PIPE,
+							stderr=subprocess.DEVNULL, text=True)
+	if result.returncode != 0:
 		return None
 
+	rule = result.stdout.replace('\\\\\\n', ' ').split(':', 1)[-1]
+	files = shlex.split(rule.replace('\\\\ ', '\\0'))
+	return [os.path.realpath(os.path.join(directory, name.replace('\\0', ' '))) for name in files]
 
-def file_exists(file_path):
-	"""Check if the file exists."""
-	if not os.path.isfile(file_path):
-		print_error(f"File not found: {file_path}")
-		return False
-	return True
 
+def translation_unit_key(path, directory, arguments, salt):
+	"""Hash everything a clang-tidy result depends on; return it with the headers."""
+	digest = hashlib.sha256(salt)
+	digest.update(json.dumps([directory, arguments]).encode('utf-8'))
 
-def convert_tabs(file_path, tab_size, conversion_type):
-	"""Convert tabs to spaces or spaces to tabs based on conversion type."""
-	try:
-		if conversion_type == "spaces":
-			print(f"{BOLD}Converting tabs to spaces...{NC}")
-			subprocess.run(["expand", "-t", str(tab_size), file_path], stdout=open(f"{file_path}.tmp", "w"))
-		elif conversion_type == "tabs":
-			print(f"{BOLD}Converting spaces to tabs...{NC}")
-			subprocess.run(["unexpand", "-t", str(tab_size), file_path], stdout=open(f"{file_path}.tmp", "w"))
-		else:
-			print_error(f"Invalid conversion type: {conversion_type}. Use 'spaces' or 'tabs'.")
-			return
+	dependencies = list_dependencies(directory, arguments)
+	if dependencies is None:
+		# Without the include list a result can not be reused safely
+		return None, []
+
+	dependencies = sorted(set(dependencies) - {path})
+	for dependency in [path] + dependencies:
+		digest.update(dependency.encode('utf-8'))
+		try:
+			with open(dependency, 'rb') as file:
+				digest.update(hashlib.sha256(file.read()).digest())
+		except OSError:
+			return None, dependencies
+
+	return digest.hexdigest(), dependencies
+
+
+def check(job):
+	"""Check one translation unit, reusing the cached result when possible."""
+	path, directory, arguments, options, salt, cached = job
+	start = time.perf_counter()
+	key, dependencies = translation_unit_key(path, directory, arguments, salt)
 
-		os.replace(f"{file_path}.tmp", file_path)
-		print(f"{GREEN}Conversion completed successfully: {file_path}{NC}")
-	except Exception as e:
-		print_error(f"Conversion failed: {str(e)}")
+	if key is not None and cached and cached.get('key') == key:
+		return path, cached, True, time.perf_counter() - start
 
+	result = subprocess.run(
+		[options['clang_tidy'], '-p', options['build_dir'], '--quiet'] + options['extra_args'] + [path],
+		stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+	)
+	record = {'key': key, 'dependencies': dependencies, 'returncode': result.returncode, 'output': result.stdout}
+	return path, record, False, time.perf_counter() - start
 
-def convert_file(file_path, tab_size, conversion_type):
-	"""Main function to manage conversion."""
-	tab_size = validate_positive_integer(tab_size)
-	if tab_size is None:
-		return
-	
-	if not file_exists(file_path):
-		return
 
-	convert_tabs(file_path, tab_size, conversion_type)
-	
+def config_salt(source_dir, clang_tidy, extra_args):
+	"""Hash the clang-tidy binary and configuration, so changes invalidate the cache."""
+	digest = hashlib.sha256(str(CACHE_VERSION).encode('utf-8'))
+	version = subprocess.run([clang_tidy, '--version'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+	digest.update(version.stdout)
+	digest.update(json.dumps(extra_args).encode('utf-8'))
+	config = os.path.join(source_dir, '.clang-tidy')
+	if os.path.isfile(config):
+		with open(config, 'rb') as file:
+			digest.update(file.read())
+	return digest.digest()
+
+
+def changed_files(source_dir, ref):
+	"""Files changed relative to a git ref, including uncommitted and untracked ones."""
+	def git(*args):
+		result = subprocess.run(['git', '-C', source_dir] + list(args), stdout=subprocess.PIPE,
+								stderr=subprocess.PIPE, text=True)
+		if result.returncode != 0:
+			sys.exit(f'{RED}git {" ".join(args)} failed: {result.stderr.strip()}{NC}')
+		return result.stdout
+
+	top_level = git('rev-parse', '--show-toplevel').strip()
+	base = git('merge-base', ref, 'HEAD').strip()
+	names = git('diff', '--name-only', base).splitlines()
+	names += git('ls-files', '--others', '--exclude-standard', '--full-name').splitlines()
+	return {os.path.realpath(os.path.join(top_level, name)) for name in names}
+
+
+def load_cache(path):
+	try:
+		with open(path, encoding='utf-8') as file:
+			cache = json.load(file)
+	except (OSError, ValueError):
+		return {}
+	return cache.get('units', {}) if cache.get('version') == CACHE_VERSION else {}
+
+
+def save_cache(path, units):
+	temp_path = path + '.tmp'
+	with open(temp_path, 'w', encoding='utf-8') as file:
+		json.dump({'version': CACHE_VERSION, 'units': units}, file, indent=1, sort_keys=True)
+	os.replace(temp_path, path)
+
 
 def main():
-	# Set the current working directory for scanning c/c++ sources (including 
-	# header files) and apply the clang formatting 
-	# Please note "-style" is for standard style options 
-	# and "-i" is in-place editing 
-
-	if len(sys.argv) > 1:
-		print(f"{BOLD}Format {sys.argv[1]}{NC}")
-		os.system(f'codespell -w {sys.argv[1]}')
-		os.system(f'clang-tidy --fix {sys.argv[1]}')
-		os.system(f"{CLANG_FORMAT} -i -style=file {sys.argv[1]}")
-		print(f"{GREEN}Formatting completed successfully: {sys.argv[1]}{NC}")
-		convert_file(f'{sys.argv[1]}', "4", "tabs")
-		return
-	
-	for root, dirs, files in os.walk(os.getcwd()):
-		if len(set(root.split('/')).intersection(IGNORED_DIRS)) > 0:
-			continue
-		for file in files: 
-			if file.endswith(cpp_extensions):
-				print(f"{BOLD}Format {file}: {root}/{file}{NC}")
-				os.system(f'codespell -w {root}/{file}')
-				os.system(f'clang-tidy --fix {root}/{file}')
-				os.system(f"{CLANG_FORMAT} -i -style=file {root}/{file}")
-				print(f"{GREEN}Formatting completed successfully: {root}/{file}{NC}")
-				convert_file(f'{root}/{file}', "4", "tabs")
+	parser = argparse.ArgumentParser(description='Run clang-tidy in parallel with a per translation unit cache')
+	parser.add_argument('-p', '--build-dir', default='build', help='directory with compile_commands.json')
+	parser.add_argument('--source-dir', default='.', help='project source directory (default: .)')
+	parser.add_argument('--clang-tidy', default='clang-tidy', help='clang-tidy executable')
+	parser.add_argument('-j', '--jobs', type=int, default=0, help='parallel workers, 0 for one per core')
+	parser.add_argument('--changed', metavar='REF', help='only check files changed relative to this git ref')
+	parser.add_argument('--cache', help='cache file (default: <build-dir>/tidy-cache.json)')
+	parser.add_argument('--no-cache', action='store_true', help='check every translation unit, ignoring the cache')
+	parser.add_argument('extra_args', nargs='*', help='extra clang-tidy arguments, after --')
+	args = parser.parse_args()
+
+	start = time.perf_counter()
+	cache_path = args.cache or os.path.join(args.build_dir, 'tidy-cache.json')
+	try:
+		commands, unity_sources = load_compile_commands(args.build_dir, args.source_dir)
+	except OSError as error:
+		sys.exit(f'{RED}{error}. Configure the project first; CMAKE_EXPORT_COMPILE_COMMANDS must be ON.{NC}')
+
+	# The sources of a unity batch are not in the compile database, so they
+	# would silently go unchecked
+	if unity_sources:
+		sys.exit(f'{RED}{args.build_dir}/compile_commands.json has {unity_sources} unity build batch(es) instead of '
+				f'their sources. Configure a build dir with {{project_name}}_UNITY_BUILD and every '
+				f'UNITY_BUILD_<target> OFF for clang-tidy; the tidy target does this by itself.{NC}')
+
+	cache = {} if args.no_cache else load_cache(cache_path)
+	salt = config_salt(args.source_dir, args.clang_tidy, args.extra_args)
+	options = {'clang_tidy': args.clang_tidy, 'build_dir': args.build_dir, 'extra_args': args.extra_args}
+
+	paths = sorted(commands)
+	if args.changed:
+		changed = changed_files(args.source_dir, args.changed)
+		# A translation unit is also affected by the headers it included last time
+		paths = [path for path in paths
+				if path in changed or changed.intersection(cache.get(path, {}).get('dependencies', ()))]
+
+	print(f'{BOLD}{{project_name}} clang-tidy: {len(paths)} of {len(commands)} translation units{NC}')
+
+	jobs = [(path, *commands[path], options, salt, cache.get(path)) for path in paths]
+	workers = max(1, min(args.jobs or os.cpu_count() or 1, len(jobs)))
+	failed = 0
+	reused = 0
+
+	if jobs:
+		with ProcessPoolExecutor(max_workers=workers) as pool:
+			for path, record, from_cache, seconds in pool.map(check, jobs):
+				reused += from_cache
+				if record['key'] is not None:
+					cache[path] = record
+				if record['returncode'] != 0:
+					failed += 1
+				if record['output'].strip():
+					print(f'{os.path.relpath(path)} ({"cached" if from_cache else f"{seconds:.2f}s"})\\n{record["output"]}')
+
+	save_cache(cache_path, {path: record for path, record in cache.items() if path in commands})
+
+	print(f'{len(jobs) - reused} checked, {reused} from cache in {time.perf_counter() - start:.2f}s')
+
+	if failed:
+		print(f'{RED}clang-tidy failed on {failed} translation unit(s){NC}')
+		return 1
+
+	print(f'{GREEN}clang-tidy found no problems{NC}')
+	return 0
 
 
 if __name__ == '__main__':
-	main()
+	sys.exit(main())
 ''',
-}
\ No newline at end of file
+'conanfile.py': '''# Conan 2 recipe for the dependencies of {{project_name}}.
+# `./build.sh deps` installs them and saves the binaries to a local archive
+# cache; configure with the conan preset afterwards.
+from conan import ConanFile
+from conan.tools.cmake import CMakeDeps, CMakeToolchain
+
+
+class Recipe(ConanFile):
+	# Conan references must be lowercase
+	name = '{{package_name}}'
+	version = '0.1.0'
+	settings = 'os', 'compiler', 'build_type', 'arch'
+
+	def requirements(self):
+		# self.requires('fmt/10.2.1')
+		pass
+
+	def layout(self):
+		# The conan preset reads the toolchain from here
+		self.folders.generators = 'build/conan-deps'
+
+	def generate(self):
+		toolchain = CMakeToolchain(self)
+		# CMakeUserPresets.json belongs to the project, not to Conan
+		toolchain.user_presets_path = False
+		toolchain.generate()
+		CMakeDeps(self).generate()
+''',
+'vcpkg.json': """{
+    "$schema": "https://raw.githubusercontent.com/microsoft/vcpkg-tool/main/docs/vcpkg.schema.json",
+    "name": "{{package_name}}",
+    "version-string": "0.1.0",
+    "dependencies": []
+}
+""",
+}
+
+# Extra files generated only when the given tool is selected
+TOOL_TEMPLATES = {
+	'conan': (
+		('conanfile.py', 'conanfile.py'),
+	),
+	'vcpkg': (
+		('vcpkg.json', 'vcpkg.json'),
+	),
+	'benchmark': (
+		('bench_my_library.cpp', 'benchmarks/bench_my_library.cpp'),
+		('compare-benchmarks.py', 'benchmarks/compare.py'),
+	),
+	'clang-tidy': (
+		('run-tidy.py', 'tools/run-tidy.py'),
+	),
+}
+
+# Configure and build presets added to CMakePresets.json for the package
+# managers. Binaries go to a file cache under ~/.cache/corn shared by all
+# projects, so clean build trees reuse them offline.
+TOOL_PRESETS = {
+	'conan': ("""        {
+            "name": "conan",
+            "displayName": "Dependencies from conanfile.py, run ./build.sh deps first",
+            "inherits": "base",
+            "toolchainFile": "${sourceDir}/build/conan-deps/conan_toolchain.cmake",
+            "cacheVariables": {
+                "CMAKE_BUILD_TYPE": "Release"
+            }
+        },
+""", """        {
+            "name": "conan",
+            "configurePreset": "conan"
+        },
+"""),
+	'vcpkg': ("""        {
+            "name": "vcpkg",
+            "displayName": "Dependencies from vcpkg.json, needs VCPKG_ROOT",
+            "inherits": "base",
+            "toolchainFile": "$env{VCPKG_ROOT}/scripts/buildsystems/vcpkg.cmake",
+            "environment": {
+                "VCPKG_BINARY_SOURCES": "clear;files,$env{HOME}/.cache/corn/vcpkg,readwrite"
+            }
+        },
+""", """        {
+            "name": "vcpkg",
+            "configurePreset": "vcpkg"
+        },
+"""),
+}
@@ -1,5 +1,21 @@
-import os
-from pathlib import Path
+from pathlib import PurePosixPath
+
+
+SUPPORTED_TOOLS = (
+	'clang-tidy',
+	'cppcheck',
+	'doxygen',
+	'lcov',
+	'clang-format',
+	'codespell',
+	'conan',
+	'vcpkg',
+	'ccache',
+	'sccache',
+	'benchmark',
+)
+
+COMPILER_CACHES = ('ccache', 'sccache')
 
 
 class Tools:
@@ -8,39 +24,46 @@ class Tools:
 	def __init__(self, tools):
 		self.tools = tools
 
-	def configure_tools(self, base_dir: Path):
-		"""Конфигурирует выбранные инструменты для проекта."""
-		tools_dir = base_dir / 'tools'
-		os.makedirs(tools_dir, exist_ok=True)
+	@property
+	def compiler_caches(self):
+		"""Выбранные кэши компилятора в порядке предпочтения."""
+		return [tool for tool in self.tools if tool in COMPILER_CACHES]
+
+	def render(self):
+		"""
+		Генерирует конфигурацию выбранных инструментов.
+
+		Возвращает пары (путь относительно корня проекта, содержимое) и сам
+		ничего не пишет на диск.
+		"""
+		tools_dir = PurePosixPath('tools')
 
 		if "clang-tidy" in self.tools:
-			with open(tools_dir / '.clang-tidy', 'w', encoding='utf-8') as f:
-				f.write("Checks: '-*,clang-analyzer-*'\nWarningsAsErrors: '*'\n")
+			yield tools_dir / '.clang-tidy', "Checks: '-*,clang-analyzer-*'\nWarningsAsErrors: '*'\n"
 		
 		if "cppcheck" in self.tools:
-			with open(tools_dir / 'cppcheck.cfg', 'w', encoding='utf-8') as f:
-				f.write("enable=all\n")
+			yield tools_dir / 'cppcheck.cfg', "enable=all\n"
 		
 		if "doxygen" in self.tools:
-			with open(tools_dir / 'Doxyfile', 'w', encoding='utf-8') as f:
-				f.write("PROJECT_NAME = {project_name}\nOUTPUT_DIRECTORY = docs\n")
+			yield tools_dir / 'Doxyfile', "PROJECT_NAME = {project_name}\nOUTPUT_DIRECTORY = docs\n"
 		
 		if "lcov" in self.tools:
-			with open(tools_dir / '.lcovrc', 'w', encoding='utf-8') as f:
-				f.write("genhtml --output-directory coverage\n")
+			yield tools_dir / 'lcovrc', (
+				"# Passed to lcov and genhtml with --config-file by the coverage targets\n"
+				"lcov_branch_coverage = 1\n"
+				"genhtml_branch_coverage = 1\n"
+				"genhtml_legend = 1\n"
+				"lcov_excl_br_line = LCOV_EXCL_BR_LINE|assert\\(\n"
+			)
+			yield PurePosixPath('gcovr.cfg'), (
+				"# Read by gcovr from the project root; the coverage targets pass the filters\n"
+				"exclude-throw-branches = yes\n"
+				"exclude-unreachable-branches = yes\n"
+				"exclude-directories = _deps\n"
+			)
 		
 		if "clang-format" in self.tools:
-			with open(tools_dir / '.clang-format', 'w', encoding='utf-8') as f:
-				f.write("BasedOnStyle: Google\nIndentWidth: 4\n")
+			yield tools_dir / '.clang-format', "BasedOnStyle: Google\nIndentWidth: 4\n"
 		
 		if "codespell" in self.tools:
-			with open(tools_dir / '.codespellrc', 'w', encoding='utf-8') as f:
-				f.write("# Codespell configuration\n")
-
-		if "conan" in self.tools:
-			with open(base_dir / 'conanfile.py', 'w', encoding='utf-8') as f:
-				f.write("from conans import ConanFile\n\nclass MyConan(ConanFile):\n    name = '{project_name}'\n")
-		
-		if "vcpkg" in self.tools:
-			with open(base_dir / 'vcpkg.json', 'w', encoding='utf-8') as f:
-				f.write("{\n    'version': 3,\n    'dependencies': []\n}\n")
\ No newline at end of file
+			yield tools_dir / '.codespellrc', "# Codespell configuration\n"
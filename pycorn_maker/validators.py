@@ -1,7 +1,96 @@
 import re
 
 
+CPP_STANDARDS = ('98', '03', '11', '14', '17', '20', '23', '26')
+MIN_CMAKE_VERSION = (3, 14)
+# The oldest C++ standard each test framework compiles with
+TEST_FRAMEWORK_STANDARDS = {'doctest': '11', 'catch2': '14'}
+
+
 def validate_project_name(project_name: str):
 	"""Проверяет, что имя проекта допустимо."""
 	if not re.match(r'^[a-zA-Z_][a-zA-Z0-9_]*$', project_name):
 		raise ValueError("Invalid project name. Must start with a letter or underscore and contain only letters, digits, and underscores.")
+
+
+def validate_cpp_standard(cpp_standard: str):
+	"""Проверяет, что стандарт C++ поддерживается CMake."""
+	if cpp_standard not in CPP_STANDARDS:
+		raise ValueError(f"Invalid C++ standard '{cpp_standard}'. Must be one of: {', '.join(CPP_STANDARDS)}.")
+
+
+def validate_cmake_version(cmake_version: str):
+	"""Проверяет, что версия CMake имеет вид X.Y[.Z] и не ниже минимальной."""
+	match = re.match(r'^(\d+)\.(\d+)(\.\d+)?$', cmake_version)
+	if not match:
+		raise ValueError(f"Invalid CMake version '{cmake_version}'. Must look like 3.14 or 3.14.0.")
+
+	if (int(match.group(1)), int(match.group(2))) < MIN_CMAKE_VERSION:
+		minimum = '.'.join(map(str, MIN_CMAKE_VERSION))
+		raise ValueError(f"Invalid CMake version '{cmake_version}'. Must be at least {minimum}.")
+
+
+def validate_tools(tools, supported_tools):
+	"""Проверяет, что все выбранные инструменты поддерживаются."""
+	unknown = [tool for tool in tools if tool not in supported_tools]
+	if unknown:
+		raise ValueError(f"Unknown tools: {', '.join(unknown)}. Supported tools: {', '.join(supported_tools)}.")
+
+
+def validate_options(options: dict, defaults: dict, choices=None):
+	"""Проверяет дополнительные параметры проекта: имена, типы и допустимые значения."""
+	unknown = sorted(set(options) - set(defaults))
+	if unknown:
+		raise ValueError(f"Unknown options: {', '.join(unknown)}.")
+
+	for name, value in options.items():
+		expected = type(defaults[name])
+		if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+			raise ValueError(f"Invalid value for '{name}': expected {expected.__name__}, got {value!r}.")
+
+		allowed = (choices or {}).get(name)
+		if allowed is not None and value not in allowed:
+			raise ValueError(f"Invalid value for '{name}': {value!r}. Must be one of: {', '.join(allowed)}.")
+
+	if options.get('unity_batch_size', 0) < 0:
+		raise ValueError("Invalid value for 'unity_batch_size': must not be negative.")
+
+	if options.get('pack'):
+		validate_pack_name(options['pack'])
+
+
+def validate_test_framework(test_framework: str, cpp_standard: str):
+	"""Проверяет, что фреймворк тестов поддерживает выбранный стандарт C++."""
+	minimum = TEST_FRAMEWORK_STANDARDS.get(test_framework)
+	if minimum and CPP_STANDARDS.index(cpp_standard) < CPP_STANDARDS.index(minimum):
+		raise ValueError(f"Test framework '{test_framework}' needs C++{minimum} or newer. Use test framework 'none' for C++{cpp_standard}.")
+
+
+def validate_project(project_name: str, cpp_standard: str, cmake_version: str, tools, supported_tools, options=None, defaults=None,
+					choices=None):
+	"""Проверяет все параметры проекта перед генерацией."""
+	validate_project_name(project_name)
+	validate_cpp_standard(cpp_standard)
+	validate_cmake_version(cmake_version)
+	validate_tools(tools, supported_tools)
+	validate_options(options or {}, defaults or {}, choices)
+	validate_test_framework(dict(defaults or {}, **(options or {})).get('test_framework', 'none'), cpp_standard)
+
+
+def validate_source_name(name: str):
+	"""Проверяет, что имя исходного файла задает относительный путь внутри проекта."""
+	parts = name.split('/')
+	if not name or name.startswith('/') or any(not re.match(r'^[a-zA-Z0-9_][a-zA-Z0-9_.-]*$', part) for part in parts):
+		raise ValueError(f"Invalid source name '{name}'. Must be a relative path of letters, digits, '_', '-' and '.'.")
+
+
+def validate_class_name(class_name: str):
+	"""Проверяет, что имя класса является идентификатором C++."""
+	if not re.match(r'^[a-zA-Z_][a-zA-Z0-9_]*$', class_name):
+		raise ValueError(f"Invalid class name '{class_name}'. Must be a C++ identifier.")
+
+
+def validate_pack_name(name: str):
+	"""Проверяет, что имя набора шаблонов является именем каталога, а не путем."""
+	if not re.match(r'^[a-zA-Z0-9_][a-zA-Z0-9_.-]*$', name):
+		raise ValueError(f"Invalid template pack name '{name}'. Must be a directory name of letters, digits, '_', '-' and '.'.")